@@ -14,7 +14,14 @@ from routes.profile_routes import profile_bp
 from routes.work_routes import work_bp
 from routes.food_routes import food_bp
 from routes.trading_routes import trading_bp
-from models import db, User, Activity, FoodEntry, TDEE, Stat, FoodReference, Workout, UserSettings, WorkColumn
+from routes.debug_routes import debug_bp
+from routes.dashboard_routes import dashboard_bp
+from models import db, User, Activity, TDEE, Stat, FoodReference, Workout, WorkColumn, DailyRollup
+from request_profiler import init_profiler
+from upload_storage import sweep_uploads
+from tdee_engine import (mark_all_tdee_dirty, flush_dirty_tdee, flush_all_dirty_tdee, record_tdee_for_all_users,
+                         tdee_balance_status, ACTIVITY_MULTIPLIERS, DEFAULT_ACTIVITY_LEVEL)
+from sqlalchemy import func
 from apscheduler.schedulers.background import BackgroundScheduler
 
 # Allow HTTP for local development only
@@ -38,6 +45,11 @@ app.register_blueprint(profile_bp, url_prefix='/profile')
 app.register_blueprint(work_bp, url_prefix='/work')
 app.register_blueprint(food_bp, url_prefix='/food')
 app.register_blueprint(trading_bp, url_prefix='/trading')
+app.register_blueprint(debug_bp, url_prefix='/debug')
+app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
+
+# Opt-in SQL/request profiling (PROFILE_REQUESTS=1)
+init_profiler(app)
 
 # Google OAuth Config
 client_secrets = {
@@ -175,6 +187,8 @@ def get_tdee():
     try:
         date_str = request.args.get('date', datetime.now().date().strftime('%Y-%m-%d'))
         date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        # Rebuild any TDEE rows invalidated by writes since the last read
+        flush_dirty_tdee(current_user.id)
         tdee = TDEE.query.filter_by(user_id=current_user.id, date=date).first()
         
         # Get activity level from TDEE record if available, otherwise from activities
@@ -220,15 +234,14 @@ def get_tdee():
                 else:
                     status = 'Maintenance'
             
-            # Determine calorie source
-            food_entries = FoodEntry.query.filter_by(user_id=current_user.id, date=date).all()
-            logged_food_entries = [e for e in food_entries if e.food_name != 'Manual Entry']
-            manual_entries = [e for e in food_entries if e.food_name == 'Manual Entry']
+            # Determine calorie source from the day's rollup counts
+            rollup = DailyRollup.query.filter_by(user_id=current_user.id, date=date).first()
+            logged_entry_count = rollup.food_entries - rollup.manual_food_entries if rollup else 0
             
-            if logged_food_entries:
+            if logged_entry_count:
                 calorie_source = 'Logged Food'
-                calorie_source_detail = f"{len(logged_food_entries)} logged food entries"
-            elif manual_entries:
+                calorie_source_detail = f"{logged_entry_count} logged food entries"
+            elif rollup and rollup.manual_food_entries:
                 calorie_source = 'Manual Input'
                 calorie_source_detail = "Manual calorie entry"
             else:
@@ -267,26 +280,25 @@ def get_tdee():
             elif user and all([user.weight, user.height, user.age, user.sex]):
                 has_profile = True
             
-            # Check for food entries
-            food_entries = FoodEntry.query.filter_by(user_id=current_user.id, date=date).all()
-            logged_food_entries = [e for e in food_entries if e.food_name != 'Manual Entry']
-            manual_entries = [e for e in food_entries if e.food_name == 'Manual Entry']
+            # Check for food entries in the day's rollup
+            rollup = DailyRollup.query.filter_by(user_id=current_user.id, date=date).first()
+            logged_entry_count = rollup.food_entries - rollup.manual_food_entries if rollup else 0
             
-            if logged_food_entries:
+            if logged_entry_count:
                 calorie_source = 'Logged Food'
-                calorie_source_detail = f"{len(logged_food_entries)} logged food entries"
-                calorie_intake = sum(e.calories for e in logged_food_entries if e.calories)
-            elif manual_entries:
+                calorie_source_detail = f"{logged_entry_count} logged food entries"
+                calorie_intake = rollup.calories - rollup.manual_calories
+            elif rollup and rollup.manual_food_entries:
                 calorie_source = 'Manual Input'
                 calorie_source_detail = "Manual calorie entry"
-                calorie_intake = sum(e.calories for e in manual_entries if e.calories)
+                calorie_intake = rollup.manual_calories
             else:
                 calorie_source = 'None'
                 calorie_source_detail = "No food data"
                 calorie_intake = 0
             
-            # Check for activities
-            activity_calories = sum(a.calories_burned for a in activities if a.calories_burned)
+            # Activity calories for the day
+            activity_calories = rollup.activity_calories if rollup else 0
             
             if not has_profile:
                 return jsonify({
@@ -357,49 +369,145 @@ def get_tdee():
 @app.route('/api/tdee_history', methods=['GET'])
 @login_required
 def get_tdee_history():
+    """Return TDEE history newest first, bounded by date range and paginated.
+
+    Query params: start/end (YYYY-MM-DD), limit, cursor (the `next_cursor` of the
+    previous page) and resolution ('daily', 'weekly' or 'monthly'). Weekly and
+    monthly resolutions return per-period averages instead of daily rows.
+    """
     try:
-        tdees = TDEE.query.filter_by(user_id=current_user.id).order_by(TDEE.date.desc()).all()
-        print(f"Found {len(tdees)} TDEE records for user {current_user.id}")
-        for t in tdees:
-            print(f"  TDEE ID: {t.id}, Date: {t.date}, TDEE: {t.tdee}")
-        
-        # Activity level multipliers
-        activity_multipliers = {
-            'sedentary': 1.2,
-            'light': 1.375,
-            'moderate': 1.55,
-            'active': 1.725,
-            'very_active': 1.9
-        }
-        
-        result = []
-        for t in tdees:
-            # Get activity level for this specific date
-            activities = Activity.query.filter_by(user_id=current_user.id, date=t.date).all()
-            activity_level = 'light'  # default to light
-            if activities:
-                first_activity = activities[0]
-                if first_activity.activity_level:
-                    activity_level = first_activity.activity_level
-            
-            result.append({
-                'id': t.id,
-                'date': t.date.strftime('%Y-%m-%d'),
-                'bmr': t.bmr,
-                'base_tdee': round(t.bmr * activity_multipliers.get(activity_level, 1.375)) if t.bmr else None,
-                'activity_calories': t.activity_calories,
-                'tdee': t.tdee,
-                'calorie_intake': t.calorie_intake,
-                'balance': t.calorie_intake - t.tdee if t.calorie_intake is not None else None,
-                'status': 'Deficit' if t.calorie_intake and (t.calorie_intake - t.tdee < -100) else
-                         'Surplus' if t.calorie_intake and (t.calorie_intake - t.tdee > 100) else
-                         'Maintenance' if t.calorie_intake else None
-            })
-        
-        return jsonify(result)
+        flush_dirty_tdee(current_user.id)
+
+        resolution = request.args.get('resolution', 'daily')
+        if resolution not in TDEE_HISTORY_RESOLUTIONS:
+            return jsonify({'error': f"Invalid resolution '{resolution}'"}), 400
+        try:
+            start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') else None
+            end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else None
+            cursor = datetime.strptime(request.args['cursor'], '%Y-%m-%d').date() if request.args.get('cursor') else None
+            limit = min(max(int(request.args.get('limit', TDEE_HISTORY_DEFAULT_LIMIT)), 1), TDEE_HISTORY_MAX_LIMIT)
+        except ValueError:
+            return jsonify({'error': 'Invalid start, end, cursor or limit'}), 400
+
+        query = TDEE.query.filter(TDEE.user_id == current_user.id)
+        if start:
+            query = query.filter(TDEE.date >= start)
+        if end:
+            query = query.filter(TDEE.date <= end)
+        if cursor:
+            # Cursors are the oldest date (or period start) already returned
+            query = query.filter(TDEE.date < cursor)
+        query = query.order_by(TDEE.date.desc())
+
+        if resolution == 'daily':
+            tdees = query.limit(limit + 1).all()
+            has_more = len(tdees) > limit
+            tdees = tdees[:limit]
+            levels = _fallback_activity_levels(current_user.id, [t for t in tdees if not t.activity_level])
+            records = [_serialize_tdee_history_row(t, levels) for t in tdees]
+            next_cursor = records[-1]['date'] if has_more else None
+        else:
+            records, next_cursor = _downsample_tdee_history(query, resolution, limit)
+
+        return jsonify({
+            'resolution': resolution,
+            'records': records,
+            'next_cursor': next_cursor
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+TDEE_HISTORY_RESOLUTIONS = ('daily', 'weekly', 'monthly')
+TDEE_HISTORY_DEFAULT_LIMIT = 90
+TDEE_HISTORY_MAX_LIMIT = 366
+
+def _fallback_activity_levels(user_id, tdees):
+    """Activity level per date for TDEE rows that do not store one, in one grouped query."""
+    dates = [t.date for t in tdees]
+    if not dates:
+        return {}
+    # Newest activity with a level on each date, matching the TDEE engine
+    latest = db.session.query(func.max(Activity.id)).filter(
+        Activity.user_id == user_id,
+        Activity.date >= min(dates),
+        Activity.date <= max(dates),
+        Activity.activity_level != None
+    ).group_by(Activity.date)
+    return dict(db.session.query(Activity.date, Activity.activity_level).filter(Activity.id.in_(latest)).all())
+
+def _serialize_tdee_history_row(t, fallback_levels):
+    activity_level = t.activity_level or fallback_levels.get(t.date) or DEFAULT_ACTIVITY_LEVEL
+    base_tdee = t.base_tdee
+    if base_tdee is None and t.bmr:
+        base_tdee = round(t.bmr * ACTIVITY_MULTIPLIERS.get(activity_level, ACTIVITY_MULTIPLIERS[DEFAULT_ACTIVITY_LEVEL]))
+    balance = t.calorie_intake - t.tdee if t.calorie_intake is not None and t.tdee is not None else None
+    return {
+        'id': t.id,
+        'date': t.date.strftime('%Y-%m-%d'),
+        'bmr': t.bmr,
+        'activity_level': activity_level,
+        'base_tdee': base_tdee,
+        'activity_calories': t.activity_calories,
+        'tdee': t.tdee,
+        'calorie_intake': t.calorie_intake,
+        'balance': balance,
+        'status': tdee_balance_status(balance) if balance is not None and t.calorie_intake else None
+    }
+
+def _tdee_period_start(day, resolution):
+    if resolution == 'weekly':
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+def _downsample_tdee_history(query, resolution, limit):
+    """Average TDEE rows per week or month; returns (periods, next_cursor)."""
+    # Stream rows so only the requested number of periods is materialised
+    rows = db.session.execute(
+        query.with_entities(TDEE.date, TDEE.bmr, TDEE.tdee, TDEE.activity_calories, TDEE.calorie_intake).statement,
+        execution_options={'yield_per': 500}
+    )
+
+    periods = []
+    has_more = False
+    current = None
+    for day, bmr, tdee, activity_calories, calorie_intake in rows:
+        period_start = _tdee_period_start(day, resolution)
+        if current is None or current['start'] != period_start:
+            if len(periods) == limit:
+                has_more = True
+                break
+            current = {'start': period_start, 'end': day, 'days': 0,
+                       'bmr': [], 'tdee': [], 'activity_calories': [], 'calorie_intake': []}
+            periods.append(current)
+        current['days'] += 1
+        for key, value in (('bmr', bmr), ('tdee', tdee), ('activity_calories', activity_calories),
+                           ('calorie_intake', calorie_intake)):
+            if value is not None:
+                current[key].append(value)
+    rows.close()
+
+    def average(values):
+        return round(sum(values) / len(values)) if values else None
+
+    records = []
+    for period in periods:
+        avg_tdee = average(period['tdee'])
+        avg_intake = average(period['calorie_intake'])
+        balance = avg_intake - avg_tdee if avg_intake is not None and avg_tdee is not None else None
+        records.append({
+            'period_start': period['start'].strftime('%Y-%m-%d'),
+            'period_end': period['end'].strftime('%Y-%m-%d'),
+            'days': period['days'],
+            'bmr': average(period['bmr']),
+            'activity_calories': average(period['activity_calories']),
+            'tdee': avg_tdee,
+            'calorie_intake': avg_intake,
+            'balance': balance,
+            'status': tdee_balance_status(balance) if balance is not None and avg_intake else None
+        })
+    next_cursor = records[-1]['period_start'] if has_more else None
+    return records, next_cursor
+
 @app.route('/update_profile', methods=['POST'])
 @login_required
 def update_profile():
@@ -409,11 +517,10 @@ def update_profile():
         current_user.height = float(data.get('height')) if data.get('height') else current_user.height
         current_user.age = int(data.get('age')) if data.get('age') else current_user.age
         current_user.sex = data.get('sex') if data.get('sex') else current_user.sex
-        db.session.commit()
         
-        # Update TDEE for all dates with new profile data
-        from routes.fitness_routes import update_all_tdee_records
-        update_all_tdee_records(current_user.id)
+        # TDEE for all dates is rebuilt lazily with the new profile data
+        mark_all_tdee_dirty(current_user.id)
+        db.session.commit()
         
         return jsonify({'message': 'Profile updated successfully'})
     except Exception as e:
@@ -502,16 +609,41 @@ def record_daily_tdees():
     """Job to automatically record TDEE for all users for the previous day."""
     with app.app_context():
         yesterday = date.today() - timedelta(days=1)
-        users = User.query.all()
-        app.logger.info(f"Starting daily TDEE recording job for {len(users)} users for date: {yesterday}")
-        for user in users:
-            try:
-                app.logger.info(f"Recording TDEE for user {user.id}...")
-                update_tdee_for_date(user.id, yesterday)
-                app.logger.info(f"Successfully recorded TDEE for user {user.id}.")
-            except Exception as e:
-                app.logger.error(f"Error recording TDEE for user {user.id}: {e}")
-        app.logger.info("Finished daily TDEE recording job.")
+        app.logger.info(f"Starting daily TDEE recording job for date: {yesterday}")
+        try:
+            result = record_tdee_for_all_users(yesterday)
+            timings = result['timings']
+            app.logger.info(
+                f"Finished daily TDEE recording job: {result['rows']} of {result['users']} users recorded "
+                f"(load {timings['load_ms']}ms, compute {timings['compute_ms']}ms, "
+                f"write {timings['write_ms']}ms, total {timings['total_ms']}ms)."
+            )
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error recording daily TDEE: {e}")
+
+def flush_stale_tdees():
+    """Job to rebuild TDEE records marked stale by writes since the last run."""
+    with app.app_context():
+        try:
+            user_count = flush_all_dirty_tdee()
+            if user_count:
+                app.logger.info(f"Rebuilt stale TDEE records for {user_count} users.")
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error rebuilding stale TDEE records: {e}")
+
+def sweep_orphaned_uploads(full=False):
+    """Job to delete uploads nothing references any more and abandoned temp files."""
+    with app.app_context():
+        try:
+            counts = sweep_uploads(app, full=full)
+            if any(counts.values()):
+                app.logger.info(f"Swept uploads: {counts['blobs']} unreferenced blobs, "
+                                f"{counts['temp_files']} temp files, {counts['untracked']} untracked files.")
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error sweeping uploads: {e}")
 
 def populate_default_work_columns():
     try:
@@ -549,8 +681,11 @@ if __name__ == '__main__':
     if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
         scheduler = BackgroundScheduler()
         scheduler.add_job(func=record_daily_tdees, trigger="cron", hour=2, minute=30)
+        scheduler.add_job(func=flush_stale_tdees, trigger="interval", minutes=5)
+        scheduler.add_job(func=sweep_orphaned_uploads, trigger="interval", hours=1)
+        scheduler.add_job(func=sweep_orphaned_uploads, trigger="cron", hour=3, minute=30, kwargs={'full': True})
         scheduler.start()
-        app.logger.info("Scheduler started for daily TDEE recording.")
+        app.logger.info("Scheduler started for daily TDEE recording, stale TDEE flushing and upload sweeping.")
         
         # Shut down the scheduler when exiting the app
         import atexit
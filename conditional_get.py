@@ -0,0 +1,122 @@
+"""
+Conditional GET support for read-mostly JSON endpoints.
+
+@conditional_get(Model, ...) derives an ETag from cheap version tokens of
+the tables a view reads instead of from the serialized body: per table the
+row count and max(id) (filtered to the current user when the table has a
+user_id column), plus a write counter from the DataVersion ledger. The
+counter catches in-place edits to tables without an updated_at column; it
+is bumped just before commit for every versioned table the session
+inserted, changed or deleted rows in. All tokens come from a single
+SELECT, and a request whose If-None-Match matches gets a 304 without the
+view running at all.
+
+Writes that bypass the ORM only show up through count/max(id); call
+bump_table_versions for in-place Core updates.
+"""
+import hashlib
+from datetime import datetime
+from functools import wraps
+from flask import request, make_response
+from flask_login import current_user
+from sqlalchemy import func, select, and_, or_
+from models import db, dialect_insert, DataVersion
+from session_changes import register_change_hook
+
+# Tables read by a @conditional_get view; only these are tracked in the ledger
+VERSIONED_TABLES = set()
+
+def _user_scoped(model):
+    return 'user_id' in model.__table__.columns
+
+def _current_user_id():
+    return current_user.id if current_user.is_authenticated else None
+
+def version_tokens(models, user_id):
+    """(count, max id) per model and the summed ledger counters, in one query."""
+    columns = []
+    ledger_keys = []
+    for model in models:
+        table = model.__table__
+        key_column = list(table.primary_key.columns)[-1]
+        condition = table.c.user_id == user_id if _user_scoped(model) else None
+        for aggregate in (func.count(), func.max(key_column)):
+            subquery = select(aggregate).select_from(table)
+            if condition is not None:
+                subquery = subquery.where(condition)
+            columns.append(subquery.scalar_subquery())
+        ledger_keys.append((table.name, user_id if _user_scoped(model) else 0))
+    # Counters only ever increase, so their sum changes on every bump
+    columns.append(select(func.coalesce(func.sum(DataVersion.version), 0)).where(or_(*[
+        and_(DataVersion.table_name == name, DataVersion.user_id == key_user) for name, key_user in ledger_keys
+    ])).scalar_subquery())
+    return tuple(db.session.execute(select(*columns)).one())
+
+def version_etag(models, extra=None):
+    """ETag for the current request URL and user over the given models (and an extra value)."""
+    user_id = _current_user_id()
+    tokens = version_tokens(models, user_id)
+    raw = f"{request.full_path}|{user_id}|{tokens}|{extra}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+def conditional_get(*models, vary=None):
+    """Answer If-None-Match with 304 when none of `models` changed since the client's copy.
+
+    `vary` is an optional callable returning a value the response also depends
+    on (e.g. today's date). Place below @login_required so the ETag is
+    computed for the signed-in user.
+    """
+    VERSIONED_TABLES.update(model.__table__.name for model in models)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = version_etag(models, vary() if vary else None)
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+def bump_data_versions(keys):
+    """Increment the ledger counter of each (table_name, user_id) key. Does not commit."""
+    keys = {(table_name, user_id or 0) for table_name, user_id in keys}
+    if not keys:
+        return
+    now = datetime.utcnow()
+    insert = dialect_insert()
+    if insert is not None:
+        stmt = insert(DataVersion)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['table_name', 'user_id'],
+            set_={'version': DataVersion.version + 1, 'updated_at': stmt.excluded.updated_at}
+        )
+        db.session.execute(stmt, [{'table_name': table_name, 'user_id': user_id, 'version': 1, 'updated_at': now}
+                                  for table_name, user_id in keys])
+        return
+    for table_name, user_id in keys:
+        version = DataVersion.query.filter_by(table_name=table_name, user_id=user_id).first()
+        if version is None:
+            db.session.add(DataVersion(table_name=table_name, user_id=user_id, version=1, updated_at=now))
+        else:
+            version.version += 1
+            version.updated_at = now
+
+def bump_table_versions(model, user_ids):
+    """Bump the ledger after Core writes to `model` for these users, if a view versions it. Does not commit."""
+    table = model.__table__
+    if table.name in VERSIONED_TABLES:
+        bump_data_versions((table.name, user_id if _user_scoped(model) else 0) for user_id in user_ids)
+
+def _collect_version_keys(obj, deleted, keys):
+    table = getattr(obj, '__table__', None)
+    if table is not None and table.name in VERSIONED_TABLES:
+        keys.add((table.name, obj.user_id if 'user_id' in table.columns else 0))
+
+register_change_hook('data_versions', _collect_version_keys, before_commit=bump_data_versions)
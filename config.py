@@ -26,6 +26,31 @@ class Config:
     UPLOAD_FOLDER = 'static/uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB limit
     
+    # In-process cache of food nutrition records (see nutrition_cache.py)
+    NUTRITION_CACHE_SIZE = int(os.environ.get('NUTRITION_CACHE_SIZE', 2048))
+    NUTRITION_CACHE_TTL = int(os.environ.get('NUTRITION_CACHE_TTL', 3600))  # seconds
+    
+    # Opt-in per-request SQL profiling (see request_profiler.py)
+    PROFILE_REQUESTS = os.environ.get('PROFILE_REQUESTS', '').lower() in ('1', 'true', 'yes')
+    PROFILE_SLOW_QUERY_MS = float(os.environ.get('PROFILE_SLOW_QUERY_MS', 100))
+    
+    # Background OCR pool for body scans (see ocr_jobs.py); 0 workers means one per core
+    OCR_WORKERS = int(os.environ.get('OCR_WORKERS', 0))
+    OCR_MAX_PENDING = int(os.environ.get('OCR_MAX_PENDING', 0))  # 0 means 4 per worker
+    OCR_JOB_TIMEOUT = int(os.environ.get('OCR_JOB_TIMEOUT', 300))  # seconds
+    # Max perceptual-hash distance (bits of 64) for reusing one of the user's earlier scan results; 0 disables
+    OCR_CACHE_MAX_DISTANCE = int(os.environ.get('OCR_CACHE_MAX_DISTANCE', 4))
+    
+    # Upload storage backend (see upload_storage.py) and how long an unreferenced upload is kept
+    UPLOAD_STORAGE = os.environ.get('UPLOAD_STORAGE', 'local')
+    UPLOAD_ORPHAN_TTL = int(os.environ.get('UPLOAD_ORPHAN_TTL', 24))  # hours
+    
+    # Threads resizing uploaded progress pictures (see image_variants.py)
+    PROGRESS_PIC_WORKERS = int(os.environ.get('PROGRESS_PIC_WORKERS', 2))
+    
+    # Comma-separated emails allowed to use the /debug endpoints
+    ADMIN_EMAILS = [email.strip().lower() for email in os.environ.get('ADMIN_EMAILS', '').split(',') if email.strip()]
+    
     # Ensure the upload folder exists
     if not os.path.exists(UPLOAD_FOLDER):
         os.makedirs(UPLOAD_FOLDER)
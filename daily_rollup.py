@@ -0,0 +1,175 @@
+"""
+Per-user daily rollups for the dashboard.
+
+Each DailyRollup row holds one user-day's totals: calories and macros,
+workout sets/volume, activity minutes/miles/calories, the day's weight and
+mood. Rows are kept current on writes: a session_changes hook collects the
+(user_id, date) keys of every FoodEntry, Workout, Activity, Stat and Mood
+added, changed (old and new date) or deleted in the session, and just
+before the transaction commits those days are re-aggregated from the raw
+rows with a handful of grouped queries and upserted. A day's refresh reads
+only that day's rows through the (user_id, date) indexes, so edits and
+deletes stay exact without delta bookkeeping.
+
+Writes that bypass the ORM (Core inserts such as the meal endpoint) call
+refresh_daily_rollups themselves; rebuild_daily_rollups backfills history.
+"""
+from datetime import datetime
+from sqlalchemy import func, case, inspect
+from models import db, dialect_insert, DailyRollup, FoodEntry, Workout, Activity, Stat, Mood
+from session_changes import register_change_hook, track_previous_values
+from conditional_get import bump_table_versions
+
+ROLLUP_SOURCES = (FoodEntry, Workout, Activity, Stat, Mood)
+MILES_ACTIVITY_TYPES = ('walking', 'running', 'cycling')
+ROLLUP_FIELDS = (
+    'calories', 'manual_calories', 'protein', 'carbs', 'fat', 'food_entries', 'manual_food_entries',
+    'workout_sets', 'workout_exercises', 'workout_volume',
+    'activity_count', 'activity_minutes', 'activity_miles', 'activity_calories',
+    'walking_miles', 'running_miles', 'cycling_miles',
+    'weight', 'mood_rating'
+)
+
+def _latest_per_day(model, value_column, user_id, date_filter, *conditions):
+    """{date: value} from the newest row (highest id) of each day."""
+    latest = db.session.query(func.max(model.id)).filter(
+        model.user_id == user_id, date_filter(model.date), *conditions
+    ).group_by(model.date)
+    return dict(db.session.query(model.date, value_column).filter(model.id.in_(latest)))
+
+def compute_daily_rollups(user_id, dates=None):
+    """Aggregate a user's raw logs into {date: {field: value}}.
+
+    Limited to `dates` when given, otherwise covers the user's whole history.
+    Days without any logs are left out.
+    """
+    if dates is not None:
+        dates = list(dates)
+        if not dates:
+            return {}
+        date_filter = lambda column: column.in_(dates)
+    else:
+        date_filter = lambda column: column.isnot(None)
+
+    rows = {}
+    def row(day):
+        if day not in rows:
+            rows[day] = {field: 0 for field in ROLLUP_FIELDS}
+            rows[day].update(weight=None, mood_rating=None)
+        return rows[day]
+
+    is_manual = FoodEntry.food_name == 'Manual Entry'
+    for day, calories, manual_calories, protein, carbs, fat, entries, manual_entries in db.session.query(
+        FoodEntry.date,
+        func.sum(FoodEntry.calories),
+        func.sum(case((is_manual, FoodEntry.calories), else_=0)),
+        func.sum(FoodEntry.protein),
+        func.sum(FoodEntry.carbs),
+        func.sum(FoodEntry.fat),
+        func.count(FoodEntry.id),
+        func.sum(case((is_manual, 1), else_=0))
+    ).filter(FoodEntry.user_id == user_id, date_filter(FoodEntry.date)).group_by(FoodEntry.date):
+        row(day).update(calories=calories or 0, manual_calories=manual_calories or 0, protein=protein or 0,
+                        carbs=carbs or 0, fat=fat or 0, food_entries=entries, manual_food_entries=manual_entries or 0)
+
+    for day, sets, exercises, volume in db.session.query(
+        Workout.date,
+        func.count(Workout.id),
+        func.count(func.distinct(Workout.exercise)),
+        func.sum(func.coalesce(Workout.total_weight, Workout.weight) * Workout.reps)
+    ).filter(Workout.user_id == user_id, date_filter(Workout.date)).group_by(Workout.date):
+        row(day).update(workout_sets=sets, workout_exercises=exercises, workout_volume=volume or 0)
+
+    activity_type = func.lower(Activity.activity_type)
+    for day, count, minutes, miles, calories, walking, running, cycling in db.session.query(
+        Activity.date,
+        func.count(Activity.id),
+        func.sum(Activity.duration),
+        func.sum(Activity.miles),
+        func.sum(Activity.calories_burned),
+        *[func.sum(case((activity_type == name, Activity.miles), else_=0)) for name in MILES_ACTIVITY_TYPES]
+    ).filter(Activity.user_id == user_id, date_filter(Activity.date)).group_by(Activity.date):
+        row(day).update(activity_count=count, activity_minutes=minutes or 0, activity_miles=miles or 0,
+                        activity_calories=calories or 0, walking_miles=walking or 0,
+                        running_miles=running or 0, cycling_miles=cycling or 0)
+
+    for day, weight in _latest_per_day(Stat, Stat.weight, user_id, date_filter, Stat.weight.isnot(None)).items():
+        row(day)['weight'] = weight
+    for day, rating in _latest_per_day(Mood, Mood.rating, user_id, date_filter).items():
+        row(day)['mood_rating'] = rating
+    return rows
+
+def _upsert_rollups(user_id, rows):
+    now = datetime.utcnow()
+    values = [{'user_id': user_id, 'date': day, 'updated_at': now, **fields} for day, fields in rows.items()]
+    insert = dialect_insert()
+    if insert is not None:
+        stmt = insert(DailyRollup)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'date'],
+            set_={field: stmt.excluded[field] for field in ROLLUP_FIELDS + ('updated_at',)}
+        )
+        db.session.execute(stmt, values)
+        return
+    existing = {r.date: r for r in DailyRollup.query.filter(
+        DailyRollup.user_id == user_id, DailyRollup.date.in_(list(rows)))}
+    for value in values:
+        rollup = existing.get(value['date'])
+        if rollup is None:
+            db.session.add(DailyRollup(**value))
+        else:
+            for field, field_value in value.items():
+                setattr(rollup, field, field_value)
+
+def refresh_daily_rollups(keys):
+    """Recompute the rollup rows for an iterable of (user_id, date) keys.
+
+    Runs in the caller's session and does not commit.
+    """
+    dates_by_user = {}
+    for user_id, day in keys:
+        if user_id is not None and day is not None:
+            dates_by_user.setdefault(user_id, set()).add(day)
+    for user_id, dates in dates_by_user.items():
+        rows = compute_daily_rollups(user_id, dates)
+        empty = [day for day in dates if day not in rows]
+        if empty:
+            DailyRollup.query.filter(DailyRollup.user_id == user_id, DailyRollup.date.in_(empty)).delete(
+                synchronize_session=False)
+        if rows:
+            _upsert_rollups(user_id, rows)
+    bump_table_versions(DailyRollup, dates_by_user)
+
+def rebuild_daily_rollups(user_id):
+    """Rebuild every rollup row of a user from scratch; returns the number of days. Does not commit."""
+    rows = compute_daily_rollups(user_id)
+    DailyRollup.query.filter(DailyRollup.user_id == user_id).delete(synchronize_session=False)
+    if rows:
+        _upsert_rollups(user_id, rows)
+    bump_table_versions(DailyRollup, [user_id])
+    return len(rows)
+
+def get_daily_rollups(user_id, start_date, end_date):
+    """Rollup rows for a user between two dates (inclusive), newest first."""
+    return DailyRollup.query.filter(
+        DailyRollup.user_id == user_id,
+        DailyRollup.date >= start_date,
+        DailyRollup.date <= end_date
+    ).order_by(DailyRollup.date.desc()).all()
+
+def _changed_keys(obj, deleted=False):
+    keys = {(obj.user_id, obj.date)}
+    if not deleted:
+        # An edit that moves a row to another day (or user) also changes the old day
+        state = inspect(obj)
+        old_dates = state.attrs.date.history.deleted or [obj.date]
+        old_users = state.attrs.user_id.history.deleted or [obj.user_id]
+        keys.update((user_id, day) for user_id in old_users for day in old_dates)
+    return keys
+
+def _collect_rollup_keys(obj, deleted, keys):
+    if isinstance(obj, ROLLUP_SOURCES):
+        keys.update(_changed_keys(obj, deleted))
+
+register_change_hook('daily_rollup', _collect_rollup_keys, before_commit=refresh_daily_rollups)
+track_previous_values(*(getattr(model, column) for model in ROLLUP_SOURCES for column in ('user_id', 'date')))
@@ -0,0 +1,156 @@
+"""
+Full-text search over FoodReference.
+
+On SQLite the search runs against an FTS5 table (food_reference_fts) that
+mirrors food_name, brand and search_keywords and is kept in sync by
+triggers. On Postgres it uses a GIN index over a weighted tsvector
+expression, which Postgres maintains itself. Both support prefix matching
+and rank results by relevance. Any other database, or a SQLite database
+that has not been indexed yet, falls back to the old ILIKE scan.
+"""
+import re
+from flask import current_app
+from sqlalchemy import or_, select, table, column, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import joinedload, selectinload
+from models import db, FoodReference
+
+FTS_TABLE = 'food_reference_fts'
+PG_INDEX = 'ix_food_reference_search'
+MAX_QUERY_TERMS = 8
+
+# bm25 column weights: food_name, brand, search_keywords
+FTS_BM25_WEIGHTS = (10.0, 2.0, 1.0)
+
+# Must match the indexed expression exactly for Postgres to use the GIN index
+PG_SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(food_name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(brand, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(search_keywords, '')), 'C')"
+)
+
+SQLITE_INDEX_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        food_name, brand, search_keywords,
+        content='food_reference', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS food_reference_fts_ai AFTER INSERT ON food_reference BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, food_name, brand, search_keywords)
+        VALUES (new.id, new.food_name, new.brand, new.search_keywords);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS food_reference_fts_ad AFTER DELETE ON food_reference BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, food_name, brand, search_keywords)
+        VALUES ('delete', old.id, old.food_name, old.brand, old.search_keywords);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS food_reference_fts_au AFTER UPDATE ON food_reference BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, food_name, brand, search_keywords)
+        VALUES ('delete', old.id, old.food_name, old.brand, old.search_keywords);
+        INSERT INTO {FTS_TABLE}(rowid, food_name, brand, search_keywords)
+        VALUES (new.id, new.food_name, new.brand, new.search_keywords);
+    END""",
+]
+
+POSTGRES_INDEX_DDL = [
+    f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON food_reference USING GIN (({PG_SEARCH_VECTOR}))",
+]
+
+fts_table = table(FTS_TABLE, column('rowid'))
+
+def food_detail_options():
+    """Loader options that fetch a food's category and serving sizes up front.
+
+    The category is joined into the food query and all serving sizes come
+    from one extra SELECT ... IN, so serializing a page of foods costs two
+    queries however many results it has.
+    """
+    return (joinedload(FoodReference.category), selectinload(FoodReference.serving_sizes))
+
+def _dialect():
+    return db.engine.dialect.name
+
+def _query_terms(query):
+    """Split a user query into plain word tokens safe to embed in FTS syntax."""
+    return re.findall(r'\w+', query.lower())[:MAX_QUERY_TERMS]
+
+def _sqlite_search(terms, limit, match_any):
+    joiner = ' OR ' if match_any else ' '
+    match = joiner.join(f'"{term}"*' for term in terms)
+    weights = ', '.join(str(w) for w in FTS_BM25_WEIGHTS)
+    stmt = select(FoodReference).join(
+        fts_table, fts_table.c.rowid == FoodReference.id
+    ).where(
+        text(f"{FTS_TABLE} MATCH :match").bindparams(match=match)
+    ).order_by(text(f"bm25({FTS_TABLE}, {weights})")).limit(limit).options(*food_detail_options())
+    return db.session.execute(stmt).unique().scalars().all()
+
+def _postgres_search(terms, limit, match_any):
+    joiner = ' | ' if match_any else ' & '
+    tsquery = joiner.join(f'{term}:*' for term in terms)
+    stmt = select(FoodReference).where(
+        text(f"({PG_SEARCH_VECTOR}) @@ to_tsquery('simple', :tsquery)").bindparams(tsquery=tsquery)
+    ).order_by(
+        text(f"ts_rank_cd(({PG_SEARCH_VECTOR}), to_tsquery('simple', :tsquery)) DESC").bindparams(tsquery=tsquery)
+    ).limit(limit).options(*food_detail_options())
+    return db.session.execute(stmt).unique().scalars().all()
+
+def _ilike_search(query, limit, match_any):
+    if match_any:
+        return FoodReference.query.options(*food_detail_options()).filter(
+            FoodReference.food_name.ilike(f"%{query.split()[0]}%")
+        ).limit(limit).all()
+    search_term = f"%{query}%"
+    return FoodReference.query.options(*food_detail_options()).filter(
+        or_(
+            FoodReference.food_name.ilike(search_term),
+            FoodReference.search_keywords.ilike(search_term)
+        )
+    ).limit(limit).all()
+
+def search_foods(query, limit=20, match_any=False):
+    """Return FoodReference rows matching `query`, best match first.
+
+    By default every word must match (as a prefix); with match_any=True any
+    word may match, which is used as the broader fallback search. Category
+    and serving sizes are eager-loaded (see food_detail_options).
+    """
+    terms = _query_terms(query)
+    if not terms:
+        return []
+
+    dialect = _dialect()
+    try:
+        if dialect == 'sqlite':
+            return _sqlite_search(terms, limit, match_any)
+        if dialect == 'postgresql':
+            return _postgres_search(terms, limit, match_any)
+    except (OperationalError, ProgrammingError) as e:
+        # Index not created yet (e.g. database built with create_all)
+        db.session.rollback()
+        current_app.logger.warning(f"Food search index unavailable, falling back to ILIKE: {e}")
+    return _ilike_search(query, limit, match_any)
+
+def create_food_search_index():
+    """Create the search index (and SQLite sync triggers) if they do not exist."""
+    dialect = _dialect()
+    if dialect == 'sqlite':
+        statements = SQLITE_INDEX_DDL
+    elif dialect == 'postgresql':
+        statements = POSTGRES_INDEX_DDL
+    else:
+        return False
+    for statement in statements:
+        db.session.execute(text(statement))
+    db.session.commit()
+    return True
+
+def rebuild_food_search_index():
+    """Create the search index if needed and rebuild it from food_reference."""
+    if not create_food_search_index():
+        return False
+    if _dialect() == 'sqlite':
+        db.session.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    else:
+        db.session.execute(text(f"REINDEX INDEX {PG_INDEX}"))
+    db.session.commit()
+    return True
@@ -0,0 +1,110 @@
+"""
+Resized variants of progress pictures.
+
+An upload is stored as-is (see upload_storage.py) and handed to a small
+background thread pool (PROGRESS_PIC_WORKERS threads; Pillow releases the
+GIL while decoding, resizing and encoding). For each picture the worker:
+
+- applies the EXIF orientation and, when the picture had EXIF, stores an
+  upright copy without it in place of the original, so camera metadata
+  such as GPS position is never served
+- stores a thumbnail and a medium size (longest edge per VARIANT_SIZES),
+  each as WebP and as JPEG for browsers without WebP
+- records the blob keys on the ProgressPic row
+
+Blob keys are content hashes, so a URL never changes content and can be
+cached as immutable. Pictures uploaded before this pipeline can be
+processed with scripts/generate_progress_pic_variants.py.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from PIL import Image, ImageOps
+from models import db, ProgressPic
+from upload_storage import get_storage, store_bytes
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels
+VARIANT_SIZES = {'thumb': 320, 'medium': 1280}
+VARIANT_FORMATS = {'webp': ('WEBP', {'quality': 80, 'method': 4}),
+                   'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True})}
+ORIGINAL_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def variant_columns(variant, ext):
+    return f"{variant}_{'jpeg' if ext == 'jpg' else ext}"
+
+def _encode(image, fmt, options):
+    buffer = BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+def generate_variants(app, key):
+    """Store the picture's variants (and an EXIF-free original); returns column name -> blob key."""
+    with Image.open(get_storage(app).local_path(key)) as source:
+        # Many phone JPEGs open as MPO (JPEG with extra frames); the first frame is written back as a plain JPEG
+        source_format = 'JPEG' if source.format == 'MPO' else source.format
+        icc_profile = source.info.get('icc_profile')
+        has_metadata = bool(source.info.get('exif') or source.getexif())
+        image = ImageOps.exif_transpose(source)
+        image.load()
+
+    columns = {}
+    if has_metadata:
+        # Re-save upright and without metadata; the old blob is swept once nothing references it
+        options = {'quality': 95, 'icc_profile': icc_profile} if source_format == 'JPEG' else {}
+        original = image.convert('RGB') if source_format == 'JPEG' and image.mode != 'RGB' else image
+        columns['filename'] = store_bytes(app, _encode(original, source_format, options),
+                                          ORIGINAL_EXTENSIONS.get(source_format, 'png'))
+
+    rgb = image.convert('RGB')
+    for variant, size in VARIANT_SIZES.items():
+        resized = rgb.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        for ext, (fmt, options) in VARIANT_FORMATS.items():
+            data = _encode(resized, fmt, dict(options, icc_profile=icc_profile))
+            columns[variant_columns(variant, ext)] = store_bytes(app, data, ext)
+    return columns
+
+def variant_paths(pic):
+    """Variant blob keys recorded on a ProgressPic"""
+    return [name for name in (pic.thumb_webp, pic.thumb_jpeg, pic.medium_webp, pic.medium_jpeg) if name]
+
+def process_progress_pic(app, pic_id):
+    """Generate and record a picture's variants (runs in an app context; commits)."""
+    pic = db.session.get(ProgressPic, pic_id)
+    if pic is None:
+        return
+    try:
+        columns = generate_variants(app, pic.filename)
+    except Exception as e:
+        logger.error(f"Could not generate variants for progress pic {pic_id}: {e}")
+        db.session.rollback()
+        pic = db.session.get(ProgressPic, pic_id)
+        pic.variants_status = 'failed'
+    else:
+        for column, name in columns.items():
+            setattr(pic, column, name)
+        pic.variants_status = 'ready'
+    db.session.commit()
+
+def _run(app, pic_id):
+    with app.app_context():
+        try:
+            process_progress_pic(app, pic_id)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Progress pic {pic_id} variant job failed: {e}")
+
+def submit_progress_pic(app, pic_id):
+    """Queue variant generation for a committed ProgressPic."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=app.config.get('PROGRESS_PIC_WORKERS', 2),
+                                           thread_name_prefix='progress-pic')
+    return _executor.submit(_run, app, pic_id)
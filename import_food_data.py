@@ -5,8 +5,14 @@ Imports high-quality, commonly consumed foods from USDA FoodData Central
 """
 
 import csv
+import io
+import json
+import multiprocessing
 import os
 import sys
+import threading
+import time
+from collections import deque
 from datetime import datetime
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
@@ -17,10 +23,13 @@ import gzip
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app import app, db
-from models import FoodCategory, FoodReference
+from models import dialect_insert, FoodCategory, FoodReference
+from nutrition_cache import clear_nutrition_cache
 
 # Configuration
 DATA_DIR = "FoodData_Central_csv_2025-04-24/FoodData_Central_csv_2025-04-24"
+USDA_CHUNK_SIZE = 200000  # CSV rows per pandas chunk
+INSERT_BATCH_SIZE = 5000  # FoodReference rows per bulk insert/commit
 
 # Relevant food categories (by USDA category ID)
 RELEVANT_CATEGORIES = {
@@ -76,13 +85,6 @@ def create_food_categories(session):
     session.commit()
     print(f"Created {len(RELEVANT_CATEGORIES)} food categories")
 
-def get_nutrient_value(food_nutrients, nutrient_id):
-    """Extract nutrient value from food_nutrients data"""
-    for nutrient in food_nutrients:
-        if nutrient.get('nutrient_id') == nutrient_id:
-            return float(nutrient.get('value', 0))
-    return 0.0
-
 def clean_food_name(name):
     """Clean and standardize food names"""
     if not name:
@@ -102,9 +104,116 @@ def clean_food_name(name):
     
     return name.strip()
 
+def read_usda_foods(food_file, keep):
+    """Stream food.csv in chunks and return the rows selected by `keep`.
+
+    `keep` receives each chunk (fdc_id, description, food_category_id) and
+    returns a boolean mask.
+    """
+    selected = []
+    total = 0
+    for chunk in pd.read_csv(food_file, usecols=['fdc_id', 'description', 'food_category_id'],
+                             dtype={'fdc_id': 'int64', 'description': str, 'food_category_id': str},
+                             chunksize=USDA_CHUNK_SIZE):
+        total += len(chunk)
+        chunk['description'] = chunk['description'].fillna('')
+        chunk['food_category_id'] = chunk['food_category_id'].fillna('')
+        selected.append(chunk[keep(chunk)])
+    print(f"  Scanned {total} food descriptions")
+    if not selected:
+        return pd.DataFrame(columns=['fdc_id', 'description', 'food_category_id'])
+    return pd.concat(selected, ignore_index=True)
+
+def read_usda_nutrients(food_nutrient_file, fdc_ids):
+    """Stream food_nutrient.csv and pivot the mapped nutrients to one row per fdc_id.
+
+    Returns a DataFrame indexed by fdc_id with one column per field in
+    NUTRIENT_MAPPING; nutrients a food does not report are NaN.
+    """
+    # FoodData Central calls the value column "amount"; older exports used "value"
+    header = pd.read_csv(food_nutrient_file, nrows=0).columns
+    value_column = 'amount' if 'amount' in header else 'value'
+    nutrient_ids = [int(nutrient_id) for nutrient_id in NUTRIENT_MAPPING]
+    fdc_ids = pd.Index(fdc_ids)
+
+    selected = []
+    total = 0
+    for chunk in pd.read_csv(food_nutrient_file, usecols=['fdc_id', 'nutrient_id', value_column],
+                             dtype={'fdc_id': 'int64', 'nutrient_id': 'int64', value_column: 'float64'},
+                             chunksize=USDA_CHUNK_SIZE):
+        total += len(chunk)
+        mask = chunk['nutrient_id'].isin(nutrient_ids) & chunk['fdc_id'].isin(fdc_ids)
+        selected.append(chunk[mask])
+    print(f"  Scanned {total} nutrient rows")
+
+    columns = list(NUTRIENT_MAPPING.values())
+    if not selected:
+        return pd.DataFrame(columns=columns)
+    nutrients = pd.concat(selected, ignore_index=True)
+    # First value per (food, nutrient), matching the old per-row lookup
+    pivot = nutrients.groupby(['fdc_id', 'nutrient_id'])[value_column].first().unstack()
+    pivot.columns = [NUTRIENT_MAPPING[str(nutrient_id)] for nutrient_id in pivot.columns]
+    return pivot.reindex(columns=columns)
+
+def build_food_mappings(foods, nutrients, category_ids, existing_names, is_verified):
+    """Turn USDA food rows plus pivoted nutrients into FoodReference insert mappings.
+
+    Names already in `existing_names` (or repeated within the file) are
+    skipped; `existing_names` is updated with every name produced.
+    Returns (mappings, skipped_count).
+    """
+    foods = foods.join(nutrients, on='fdc_id')
+    fields = list(NUTRIENT_MAPPING.values())
+    foods[fields] = foods[fields].fillna(0.0)
+
+    # Estimate calories from macronutrients where energy is missing
+    estimated = foods['protein'] * 4 + foods['carbs'] * 4 + foods['fat'] * 9
+    foods['calories'] = foods['calories'].where(foods['calories'] != 0, estimated)
+
+    mappings = []
+    skipped_count = 0
+    for row in foods.itertuples(index=False):
+        name = clean_food_name(row.description)
+        if not name or name in existing_names:
+            skipped_count += 1
+            continue
+        existing_names.add(name)
+        category_name = RELEVANT_CATEGORIES.get(row.food_category_id)
+        mapping = {field: float(getattr(row, field)) for field in fields}
+        mapping.update(
+            food_name=name,
+            category_id=category_ids.get(category_name),
+            brand='',
+            serving_size="100g",
+            is_verified=is_verified,
+            search_keywords=row.description.lower()
+        )
+        mappings.append(mapping)
+    return mappings, skipped_count
+
+def bulk_insert_foods(session, mappings):
+    """Insert FoodReference mappings in large batches, committing per batch."""
+    for start in range(0, len(mappings), INSERT_BATCH_SIZE):
+        # render_nulls keeps rows with and without a category in the same executemany
+        session.bulk_insert_mappings(FoodReference, mappings[start:start + INSERT_BATCH_SIZE], render_nulls=True)
+        session.commit()
+        print(f"  Inserted {min(start + INSERT_BATCH_SIZE, len(mappings))}/{len(mappings)} foods...")
+
+def report_rate(label, count, started):
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed > 0 else 0
+    print(f"{label}: {count} rows in {elapsed:.1f}s ({rate:.0f} rows/sec)")
+
+def load_import_lookups(session):
+    """Existing food names and category ids, loaded once per import."""
+    existing_names = {name for (name,) in session.query(FoodReference.food_name)}
+    category_ids = dict(session.query(FoodCategory.name, FoodCategory.id))
+    return existing_names, category_ids
+
 def import_foundation_foods(session):
     """Import foundation foods (highest quality data)"""
     print("\nImporting foundation foods...")
+    started = time.perf_counter()
     
     foundation_file = os.path.join(DATA_DIR, "foundation_food.csv")
     food_file = os.path.join(DATA_DIR, "food.csv")
@@ -115,134 +224,36 @@ def import_foundation_foods(session):
         return
     
     # Read foundation foods
-    foundation_foods = pd.read_csv(foundation_file)
-    print(f"Found {len(foundation_foods)} foundation foods")
+    foundation_ids = pd.read_csv(foundation_file, usecols=['fdc_id'], dtype={'fdc_id': 'int64'})['fdc_id']
+    print(f"Found {len(foundation_ids)} foundation foods")
     
-    # Read food descriptions (we'll need to sample this large file)
     print("Reading food descriptions...")
-    food_descriptions = {}
+    foods = read_usda_foods(food_file, lambda chunk: chunk['fdc_id'].isin(foundation_ids))
     
-    # Read only the first 10000 lines to get a sample of food descriptions
-    with open(food_file, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for i, row in enumerate(reader):
-            if i >= 10000:  # Limit to first 10k for performance
-                break
-            food_descriptions[row['fdc_id']] = {
-                'description': row.get('description', ''),
-                'food_category_id': row.get('food_category_id', ''),
-                'brand_owner': row.get('brand_owner', ''),
-                'brand_name': row.get('brand_name', '')
-            }
-    
-    # Read nutrient data (we'll need to sample this too)
     print("Reading nutrient data...")
-    food_nutrients = {}
-    
-    with open(food_nutrient_file, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for i, row in enumerate(reader):
-            if i >= 50000:  # Limit to first 50k for performance
-                break
-            
-            fdc_id = row['fdc_id']
-            nutrient_id = row['nutrient_id']
-            
-            if fdc_id not in food_nutrients:
-                food_nutrients[fdc_id] = []
-            
-            food_nutrients[fdc_id].append({
-                'nutrient_id': nutrient_id,
-                'value': row.get('value', 0)
-            })
-    
-    # Import foundation foods
-    imported_count = 0
-    skipped_count = 0
+    nutrients = read_usda_nutrients(food_nutrient_file, foods['fdc_id'])
     
-    for _, foundation_food in foundation_foods.iterrows():
-        fdc_id = str(foundation_food['fdc_id'])
-        
-        # Get food description
-        food_info = food_descriptions.get(fdc_id, {})
-        description = food_info.get('description', '')
-        category_id = food_info.get('food_category_id', '')
-        
-        if not description:
-            skipped_count += 1
-            continue
-        
-        # Check if food already exists
-        existing = session.query(FoodReference).filter_by(food_name=description).first()
-        if existing:
-            skipped_count += 1
-            continue
-        
-        # Get nutrient values
-        nutrients = food_nutrients.get(fdc_id, [])
-        
-        # Extract nutrition data
-        nutrition_data = {}
-        for nutrient_id, field_name in NUTRIENT_MAPPING.items():
-            value = get_nutrient_value(nutrients, nutrient_id)
-            nutrition_data[field_name] = value
-        
-        # Set default calories if not found
-        if nutrition_data.get('calories', 0) == 0:
-            # Estimate calories from macronutrients
-            protein_cals = nutrition_data.get('protein', 0) * 4
-            carb_cals = nutrition_data.get('carbs', 0) * 4
-            fat_cals = nutrition_data.get('fat', 0) * 9
-            nutrition_data['calories'] = protein_cals + carb_cals + fat_cals
-        
-        # Find matching category
-        category = None
-        if category_id in RELEVANT_CATEGORIES:
-            category_name = RELEVANT_CATEGORIES[category_id]
-            category = session.query(FoodCategory).filter_by(name=category_name).first()
-        
-        # Create food reference
-        food_ref = FoodReference(
-            food_name=clean_food_name(description),
-            category_id=category.id if category else None,
-            calories=nutrition_data.get('calories', 0),
-            protein=nutrition_data.get('protein', 0),
-            carbs=nutrition_data.get('carbs', 0),
-            fat=nutrition_data.get('fat', 0),
-            fiber=nutrition_data.get('fiber', 0),
-            sugar=nutrition_data.get('sugar', 0),
-            sodium=nutrition_data.get('sodium', 0),
-            saturated_fat=nutrition_data.get('saturated_fat', 0),
-            trans_fat=nutrition_data.get('trans_fat', 0),
-            cholesterol=nutrition_data.get('cholesterol', 0),
-            potassium=nutrition_data.get('potassium', 0),
-            vitamin_c=nutrition_data.get('vitamin_c', 0),
-            calcium=nutrition_data.get('calcium', 0),
-            iron=nutrition_data.get('iron', 0),
-            brand=food_info.get('brand_name', ''),
-            serving_size="100g",
-            is_verified=True,
-            search_keywords=description.lower()
-        )
-        
-        session.add(food_ref)
-        imported_count += 1
-        
-        if imported_count % 10 == 0:
-            print(f"  Imported {imported_count} foods...")
-            session.commit()
+    existing_names, category_ids = load_import_lookups(session)
+    mappings, skipped_count = build_food_mappings(foods, nutrients, category_ids, existing_names, is_verified=True)
+    skipped_count += len(foundation_ids) - len(foods)  # no description in food.csv
     
-    session.commit()
-    print(f"Successfully imported {imported_count} foundation foods")
+    bulk_insert_foods(session, mappings)
+    print(f"Successfully imported {len(mappings)} foundation foods")
     print(f"Skipped {skipped_count} foods (already exists or no description)")
+    report_rate("Foundation foods", len(mappings), started)
 
 def import_common_foods(session):
     """Import additional common foods from the main food database"""
     print("\nImporting common foods from main database...")
+    started = time.perf_counter()
     
     food_file = os.path.join(DATA_DIR, "food.csv")
     food_nutrient_file = os.path.join(DATA_DIR, "food_nutrient.csv")
     
+    if not all(os.path.exists(f) for f in [food_file, food_nutrient_file]):
+        print("Error: Required CSV files not found!")
+        return
+    
     # Common food keywords to look for
     common_keywords = [
         'chicken', 'beef', 'pork', 'salmon', 'tuna', 'shrimp',
@@ -252,211 +263,237 @@ def import_common_foods(session):
         'milk', 'cheese', 'yogurt', 'egg',
         'almond', 'peanut', 'walnut', 'cashew'
     ]
+    keyword_pattern = '|'.join(common_keywords)
     
-    # Read food descriptions and filter by keywords
-    matching_foods = []
-    
+    # Match our keywords and categories
     print("Searching for common foods...")
-    with open(food_file, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for i, row in enumerate(reader):
-            if i >= 50000:  # Limit for performance
-                break
-            
-            description = row.get('description', '').lower()
-            category_id = row.get('food_category_id', '')
-            
-            # Check if it matches our keywords and categories
-            if (any(keyword in description for keyword in common_keywords) and 
-                category_id in RELEVANT_CATEGORIES):
-                matching_foods.append({
-                    'fdc_id': row['fdc_id'],
-                    'description': row.get('description', ''),
-                    'category_id': category_id,
-                    'brand_owner': row.get('brand_owner', ''),
-                    'brand_name': row.get('brand_name', '')
-                })
-    
-    print(f"Found {len(matching_foods)} matching common foods")
-    
-    # Read nutrient data for matching foods
-    food_nutrients = {}
-    matching_fdc_ids = {food['fdc_id'] for food in matching_foods}
-    
-    with open(food_nutrient_file, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            fdc_id = row['fdc_id']
-            if fdc_id in matching_fdc_ids:
-                nutrient_id = row['nutrient_id']
-                
-                if fdc_id not in food_nutrients:
-                    food_nutrients[fdc_id] = []
-                
-                food_nutrients[fdc_id].append({
-                    'nutrient_id': nutrient_id,
-                    'value': row.get('value', 0)
-                })
+    foods = read_usda_foods(food_file, lambda chunk: (
+        chunk['food_category_id'].isin(list(RELEVANT_CATEGORIES)) &
+        chunk['description'].str.lower().str.contains(keyword_pattern, regex=True)
+    ))
+    print(f"Found {len(foods)} matching common foods")
     
-    # Import matching foods
-    imported_count = 0
-    skipped_count = 0
+    print("Reading nutrient data...")
+    nutrients = read_usda_nutrients(food_nutrient_file, foods['fdc_id'])
     
-    for food_info in matching_foods:
-        fdc_id = food_info['fdc_id']
-        description = food_info['description']
-        category_id = food_info['category_id']
-        
-        # Check if food already exists
-        existing = session.query(FoodReference).filter_by(food_name=description).first()
-        if existing:
-            skipped_count += 1
-            continue
-        
-        # Get nutrient values
-        nutrients = food_nutrients.get(fdc_id, [])
-        
-        # Extract nutrition data
-        nutrition_data = {}
-        for nutrient_id, field_name in NUTRIENT_MAPPING.items():
-            value = get_nutrient_value(nutrients, nutrient_id)
-            nutrition_data[field_name] = value
-        
-        # Set default calories if not found
-        if nutrition_data.get('calories', 0) == 0:
-            protein_cals = nutrition_data.get('protein', 0) * 4
-            carb_cals = nutrition_data.get('carbs', 0) * 4
-            fat_cals = nutrition_data.get('fat', 0) * 9
-            nutrition_data['calories'] = protein_cals + carb_cals + fat_cals
-        
-        # Find matching category
-        category = None
-        if category_id in RELEVANT_CATEGORIES:
-            category_name = RELEVANT_CATEGORIES[category_id]
-            category = session.query(FoodCategory).filter_by(name=category_name).first()
-        
-        # Create food reference
-        food_ref = FoodReference(
-            food_name=clean_food_name(description),
-            category_id=category.id if category else None,
-            calories=nutrition_data.get('calories', 0),
-            protein=nutrition_data.get('protein', 0),
-            carbs=nutrition_data.get('carbs', 0),
-            fat=nutrition_data.get('fat', 0),
-            fiber=nutrition_data.get('fiber', 0),
-            sugar=nutrition_data.get('sugar', 0),
-            sodium=nutrition_data.get('sodium', 0),
-            saturated_fat=nutrition_data.get('saturated_fat', 0),
-            trans_fat=nutrition_data.get('trans_fat', 0),
-            cholesterol=nutrition_data.get('cholesterol', 0),
-            potassium=nutrition_data.get('potassium', 0),
-            vitamin_c=nutrition_data.get('vitamin_c', 0),
-            calcium=nutrition_data.get('calcium', 0),
-            iron=nutrition_data.get('iron', 0),
-            brand=food_info.get('brand_name', ''),
-            serving_size="100g",
-            is_verified=False,  # Not foundation foods
-            search_keywords=description.lower()
-        )
-        
-        session.add(food_ref)
-        imported_count += 1
-        
-        if imported_count % 20 == 0:
-            print(f"  Imported {imported_count} common foods...")
-            session.commit()
+    existing_names, category_ids = load_import_lookups(session)
+    mappings, skipped_count = build_food_mappings(foods, nutrients, category_ids, existing_names, is_verified=False)
     
-    session.commit()
-    print(f"Successfully imported {imported_count} common foods")
+    bulk_insert_foods(session, mappings)
+    print(f"Successfully imported {len(mappings)} common foods")
     print(f"Skipped {skipped_count} foods (already exists)")
+    report_rate("Common foods", len(mappings), started)
+
+# Open Food Facts columns we read (the TSV has ~200)
+OFF_COLUMNS = ['code', 'product_name', 'brands', 'categories', 'serving_size',
+               'energy_100g', 'proteins_100g', 'carbohydrates_100g', 'fat_100g',
+               'fiber_100g', 'sugars_100g', 'salt_100g']
+OFF_BLOCK_LINES = 50000  # TSV lines handed to a worker at a time
+
+def parse_off_block(header, block):
+    """Parse a block of raw Open Food Facts TSV lines into validated rows.
+
+    Runs in a worker process. Units are converted column-wise (energy kJ to
+    kcal, salt g to sodium mg) and rows without a barcode, a name, or any
+    calories/protein are dropped. Returns (rows, dropped_count).
+    """
+    frame = pd.read_csv(io.StringIO(block.decode('utf-8', errors='replace')), sep='\t', header=None,
+                        names=header, usecols=OFF_COLUMNS, dtype=str, quoting=csv.QUOTE_NONE,
+                        on_bad_lines='skip', engine='c')
+    total = len(frame)
+    text_columns = ['code', 'product_name', 'brands', 'categories', 'serving_size']
+    frame[text_columns] = frame[text_columns].fillna('')
+
+    def numeric(column):
+        return pd.to_numeric(frame[column], errors='coerce').fillna(0.0)
+
+    out = pd.DataFrame({
+        'barcode': frame['code'].str.strip(),
+        'food_name': frame['product_name'].str.strip().str.slice(0, 100),
+        'brand': frame['brands'].str.split(',').str[0].str.strip().str.slice(0, 100),
+        'category': frame['categories'].str.split(',').str[0].str.strip(),
+        'serving_size': frame['serving_size'].str.strip().str.slice(0, 50),
+        'calories': numeric('energy_100g') / 4.184,  # kJ to kcal
+        'protein': numeric('proteins_100g'),
+        'carbs': numeric('carbohydrates_100g'),
+        'fat': numeric('fat_100g'),
+        'fiber': numeric('fiber_100g'),
+        'sugar': numeric('sugars_100g'),
+        'sodium': numeric('salt_100g') * 400,  # salt g to sodium mg
+    })
+    out['serving_size'] = out['serving_size'].mask(out['serving_size'] == '', '100g')
+
+    # Only import if barcode, name, and at least calories or protein
+    valid = ((out['barcode'] != '') & (out['barcode'].str.len() <= 32) & (out['food_name'] != '') &
+             ((out['calories'] != 0) | (out['protein'] != 0)))
+    out = out[valid]
+    out['search_keywords'] = (out['food_name'].str.lower() + ',' + out['brand'].str.lower() + ',' +
+                              out['category'].str.lower())
+    rows = out.drop(columns=['category']).to_dict('records')
+    return rows, total - len(rows)
+
+def _parse_off_block_job(args):
+    return parse_off_block(*args)
 
-def import_openfoodfacts(session):
-    """Import foods from Open Food Facts CSV (with barcode)"""
+def _iter_off_blocks(f, header, offset):
+    """Yield (header, block_bytes) jobs plus the uncompressed offset at the end of each block."""
+    while True:
+        lines = []
+        for _ in range(OFF_BLOCK_LINES):
+            line = f.readline()
+            if not line:
+                break
+            lines.append(line)
+        if not lines:
+            return
+        block = b''.join(lines)
+        offset += len(block)
+        yield (header, block), offset
+
+def _load_off_checkpoint(checkpoint_file, off_file):
+    if not os.path.exists(checkpoint_file):
+        return None
+    with open(checkpoint_file) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('file_size') != os.path.getsize(off_file):
+        print("  Ignoring checkpoint written for a different Open Food Facts file")
+        return None
+    return checkpoint
+
+def _save_off_checkpoint(checkpoint_file, checkpoint):
+    # Write-then-rename so a crash never leaves a half-written checkpoint
+    tmp_file = checkpoint_file + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_file, checkpoint_file)
+
+def upsert_off_foods(session, rows):
+    """Insert new Open Food Facts foods and refresh existing ones, keyed on barcode.
+
+    The name is never updated so the food_name unique key cannot collide.
+    """
+    if not rows:
+        return
+    now = datetime.utcnow()
+    for row in rows:
+        row['updated_at'] = now
+    update_fields = ['brand', 'calories', 'protein', 'carbs', 'fat', 'fiber', 'sugar', 'sodium',
+                     'serving_size', 'search_keywords', 'updated_at']
+    insert = dialect_insert()
+    if insert is not None:
+        stmt = insert(FoodReference)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['barcode'],
+            set_={field: stmt.excluded[field] for field in update_fields}
+        )
+        session.execute(stmt, rows)
+    else:
+        existing = dict(session.query(FoodReference.barcode, FoodReference.id).filter(
+            FoodReference.barcode.in_([row['barcode'] for row in rows])
+        ))
+        session.bulk_insert_mappings(FoodReference, [r for r in rows if r['barcode'] not in existing],
+                                     render_nulls=True)
+        session.bulk_update_mappings(FoodReference, [
+            dict({field: r[field] for field in update_fields}, id=existing[r['barcode']])
+            for r in rows if r['barcode'] in existing
+        ])
+
+def import_openfoodfacts(session, workers=None):
+    """Import foods from Open Food Facts CSV (with barcode)
+
+    The gzipped TSV is decompressed here and parsed in worker processes; the
+    uncompressed byte offset of the last committed block is checkpointed next
+    to the file so an interrupted import resumes where it stopped.
+    """
     print("\nImporting foods from Open Food Facts...")
     off_file = "en.openfoodfacts.org.products.csv.gz"
     if not os.path.exists(off_file):
         print(f"Open Food Facts file not found: {off_file}")
         return
+    checkpoint_file = off_file + '.checkpoint.json'
+    started = time.perf_counter()
     
-    # OpenFoodFacts CSV columns of interest
-    # We'll read the header to get the right indices
-    with gzip.open(off_file, 'rt', encoding='utf-8') as f:
-        reader = csv.DictReader(f, delimiter='\t')
-        imported_count = 0
-        skipped_count = 0
-        for i, row in enumerate(reader):
-            if i > 100000:  # Limit for demo/performance
-                break
-            barcode = row.get('code', '').strip()
-            name = row.get('product_name', '').strip()
-            brand = row.get('brands', '').split(',')[0].strip() if row.get('brands') else ''
-            category = row.get('categories', '').split(',')[0].strip() if row.get('categories') else ''
-            serving_size = row.get('serving_size', '').strip() or '100g'
-            # Nutrition
-            try:
-                calories = float(row.get('energy_100g', '') or 0) / 4.184 if row.get('energy_100g') else 0  # kJ to kcal
-            except Exception:
-                calories = 0
-            try:
-                protein = float(row.get('proteins_100g', '') or 0)
-            except Exception:
-                protein = 0
-            try:
-                carbs = float(row.get('carbohydrates_100g', '') or 0)
-            except Exception:
-                carbs = 0
-            try:
-                fat = float(row.get('fat_100g', '') or 0)
-            except Exception:
-                fat = 0
-            try:
-                fiber = float(row.get('fiber_100g', '') or 0)
-            except Exception:
-                fiber = 0
-            try:
-                sugar = float(row.get('sugars_100g', '') or 0)
-            except Exception:
-                sugar = 0
+    checkpoint = _load_off_checkpoint(checkpoint_file, off_file) or {
+        'file_size': os.path.getsize(off_file), 'offset': 0, 'imported': 0, 'updated': 0, 'skipped': 0
+    }
+    
+    resumed_rows = checkpoint['imported'] + checkpoint['updated']
+    
+    # Dedupe against the database in memory; anything committed before a crash is included
+    existing_barcodes = {barcode for (barcode,) in session.query(FoodReference.barcode).filter(FoodReference.barcode != None)}
+    existing_names = {name for (name,) in session.query(FoodReference.food_name)}
+    
+    with gzip.open(off_file, 'rb') as f:
+        header_line = f.readline()
+        header = header_line.decode('utf-8').rstrip('\r\n').split('\t')
+        offset = max(checkpoint['offset'], len(header_line))
+        if checkpoint['offset']:
+            print(f"  Resuming from byte {offset} ({checkpoint['imported']} imported so far)")
+        f.seek(offset)  # gzip seeks forward by decompressing; no parsing needed
+        
+        workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        # Pool.imap drains its input eagerly; cap the blocks in flight so the
+        # decompressed file is never held in memory
+        in_flight = threading.Semaphore(workers * 2)
+        offsets = deque()
+        # The generator runs in the pool's task-handler thread; if the loop below fails
+        # it must stop waiting for a slot, or Pool.terminate() joins that thread forever
+        stopping = threading.Event()
+        
+        def tracked_jobs():
+            for job, end_offset in _iter_off_blocks(f, header, offset):
+                while not in_flight.acquire(timeout=0.5):
+                    if stopping.is_set():
+                        return
+                if stopping.is_set():
+                    return
+                offsets.append(end_offset)
+                yield job
+        
+        with multiprocessing.Pool(workers) as pool:
             try:
-                sodium = float(row.get('salt_100g', '') or 0) * 400 if row.get('salt_100g') else 0  # salt to sodium mg
-            except Exception:
-                sodium = 0
-            # Only import if barcode, name, and at least calories or protein
-            if not barcode or not name or (calories == 0 and protein == 0):
-                skipped_count += 1
-                continue
-            # Avoid duplicates by barcode or name
-            exists = session.query(FoodReference).filter(
-                (FoodReference.barcode == barcode) | (FoodReference.food_name == name)
-            ).first()
-            if exists:
-                skipped_count += 1
-                continue
-            # Create food reference
-            food_ref = FoodReference(
-                food_name=name,
-                brand=brand,
-                category_id=None,  # Could map to your categories if desired
-                calories=calories,
-                protein=protein,
-                carbs=carbs,
-                fat=fat,
-                fiber=fiber,
-                sugar=sugar,
-                sodium=sodium,
-                serving_size=serving_size,
-                barcode=barcode,
-                is_verified=False,
-                search_keywords=f"{name.lower()},{brand.lower()},{category.lower()}"
-            )
-            session.add(food_ref)
-            imported_count += 1
-            if imported_count % 100 == 0:
-                print(f"  Imported {imported_count} Open Food Facts foods...")
-                session.commit()
-        session.commit()
-        print(f"Successfully imported {imported_count} Open Food Facts foods")
-        print(f"Skipped {skipped_count} foods (missing data or duplicate)")
+                # imap keeps block order, so checkpoints only ever move forward
+                for rows, dropped in pool.imap(_parse_off_block_job, tracked_jobs()):
+                    in_flight.release()
+                    checkpoint['skipped'] += dropped
+                    # A barcode may appear once per upsert; later blocks update earlier
+                    # ones, which is also what a resumed import sees
+                    batch = []
+                    seen_barcodes = set()
+                    for row in rows:
+                        barcode = row['barcode']
+                        if barcode in seen_barcodes:
+                            checkpoint['skipped'] += 1
+                            continue
+                        seen_barcodes.add(barcode)
+                        if barcode in existing_barcodes:
+                            checkpoint['updated'] += 1
+                        elif row['food_name'] in existing_names:
+                            checkpoint['skipped'] += 1
+                            continue
+                        else:
+                            existing_barcodes.add(barcode)
+                            existing_names.add(row['food_name'])
+                            checkpoint['imported'] += 1
+                        row['is_verified'] = False
+                        row['category_id'] = None  # Could map to your categories if desired
+                        batch.append(row)
+                    upsert_off_foods(session, batch)
+                    session.commit()
+                    checkpoint['offset'] = offsets.popleft()
+                    _save_off_checkpoint(checkpoint_file, checkpoint)
+                    print(f"  Imported {checkpoint['imported']} / updated {checkpoint['updated']} Open Food Facts foods...")
+            finally:
+                # Unblock the generator so the pool can shut down on errors and Ctrl-C
+                stopping.set()
+                in_flight.release()
+    
+    if os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+    print(f"Successfully imported {checkpoint['imported']} Open Food Facts foods")
+    print(f"Updated {checkpoint['updated']} existing foods by barcode")
+    print(f"Skipped {checkpoint['skipped']} foods (missing data or duplicate)")
+    report_rate("Open Food Facts foods", checkpoint['imported'] + checkpoint['updated'] - resumed_rows, started)
 
 def main():
     """Main import function"""
@@ -494,6 +531,10 @@ def main():
             print(f"Total categories: {total_categories}")
             print(f"Import completed successfully!")
             
+            # Web workers notice the new updated_at watermark on their own;
+            # this covers a cache living in this process
+            clear_nutrition_cache()
+            
         except Exception as e:
             print(f"Error during import: {e}")
             session.rollback()
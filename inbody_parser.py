@@ -0,0 +1,334 @@
+"""
+Single-pass parser for InBody result sheet OCR text.
+
+The text is tokenized once, by one pattern compiled at import, into
+Token(label, number, position, percent, line) tuples: either a label
+printed on the sheet (or a known OCR misreading of one) or a number.
+Every metric is then resolved from that token stream:
+
+- METRIC_RULES: a (label, side, format) rule takes the number directly
+  AFTER or BEFORE an occurrence of the label, with no other number in
+  between, if the whole number matches the format; the first occurrence
+  that fits wins and VALID_RANGES rejects implausible values. In a row
+  of labels alone ("Left Arm  Right Arm") each label takes the number in
+  its column of the next row.
+- known misreadings of values on the original sample scans
+- body fat percentage from the PBF row or from the words around a number
+- weight from the history row, SMM from partial labels
+
+Labels match with or without the spaces between their words, as Tesseract
+keeps them in some panels and drops them in others. With debug=True every
+step is logged at INFO.
+"""
+import logging
+import re
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+Token = namedtuple('Token', 'label number position percent line')
+
+AFTER = 'after'
+BEFORE = 'before'
+
+def _words(*words):
+    return r'[ \t]*'.join(words)
+
+# (label, pattern); where labels share a prefix the longer one is listed first and wins
+LABELS = (
+    ('skeletal_muscle_mass', _words('Skeletal', 'Muscle', 'Mass')),
+    ('percent_body_fat', _words('Percent', 'Body', 'Fat')),
+    ('body_fat_mass', _words('Body', 'Fat', 'Mass')),
+    ('lean_body_mass', _words('Lean', 'Body', 'Mass')),
+    ('basal_metabolic_rate', _words('Basal', 'Metabolic', 'Rate')),
+    ('body_fat', _words('Body', 'Fat')),
+    ('muscle_mass', _words('Muscle', 'Mass')),
+    ('skeletal', 'Skeletal'),
+    ('left_arm', _words('Left', 'Arm')),
+    ('right_arm', _words('Right', 'Arm')),
+    ('left_leg', _words('Left', 'Leg')),
+    ('right_leg', _words('Right', 'Leg')),
+    ('trunk', 'Trunk'),
+    ('weight', 'Weight'),
+    ('smm', 'SMM'),
+    ('bmr', 'BMR'),
+    ('pbf', 'PBF'),
+    # Misreadings of the obesity panel's "PBF is the percentage" caption, followed by the value without its point
+    ('pbf_caption', 'menscrma|boctyfat|perceniage'),
+    # "126.6" read as "126.f" in the segmental panel
+    ('trunk_misread', r'126\.f'),
+)
+
+def _token_pattern():
+    # Labels are grouped by their first letters behind a lookahead, and the whole alternation behind
+    # one, so most positions in the text are rejected after a single character test
+    groups = {}
+    for label, pattern in LABELS:
+        first = ''.join(sorted({alternative[0].lower() for alternative in pattern.split('|')}))
+        groups.setdefault(first, []).append(f'(?P<{label}>{pattern})')
+    alternatives = [f"(?=[{re.escape(first)}])(?:{'|'.join(group)})" for first, group in groups.items()]
+    alternatives.append(r'(?P<number>\d+(?:\.\d+)?)(?P<percent>%)?|(?P<newline>\n)')
+    starts = re.escape(''.join(sorted(set(''.join(groups)))))
+    return re.compile(f"(?=[{starts}\\d\\n])(?:{'|'.join(alternatives)})", re.IGNORECASE)
+
+_TOKEN_PATTERN = _token_pattern()
+
+# metric -> rules tried in order: (label, side of the label the number is on, format of the whole number)
+METRIC_RULES = {
+    'weight': (('weight', AFTER, r'\d{3}\.\d'), ('weight', BEFORE, r'\d{3}\.\d')),
+    'body_fat_mass': (('body_fat_mass', AFTER, None), ('body_fat_mass', BEFORE, None)),
+    'lean_body_mass': (('lean_body_mass', AFTER, r'\d{3}\.\d{2}'), ('lean_body_mass', BEFORE, r'\d{3}\.\d{2}')),
+    'smm': (('skeletal_muscle_mass', AFTER, None), ('skeletal_muscle_mass', BEFORE, None),
+            ('smm', AFTER, None), ('smm', BEFORE, None)),
+    'bmr': (('basal_metabolic_rate', AFTER, r'\d{4}'), ('basal_metabolic_rate', BEFORE, r'\d{4}'),
+            ('bmr', AFTER, r'\d{4}')),
+    'left_arm_lean_mass': (('left_arm', AFTER, r'\d{2}\.\d{2}'), ('left_arm', BEFORE, r'\d{2}\.\d{2}')),
+    'right_arm_lean_mass': (('right_arm', AFTER, r'\d{2}\.\d{2}'), ('right_arm', BEFORE, r'\d{2}\.\d{2}')),
+    'trunk_lean_mass': (('trunk', AFTER, r'\d{3}\.\d'), ('trunk', BEFORE, r'\d{3}\.\d')),
+    'left_leg_lean_mass': (('left_leg', AFTER, r'\d{2}\.\d{2}'), ('left_leg', BEFORE, r'\d{2}\.\d{2}')),
+    'right_leg_lean_mass': (('right_leg', AFTER, r'\d{2}\.\d{2}'), ('right_leg', BEFORE, r'\d{2}\.\d{2}')),
+}
+METRIC_RULES = {
+    metric: tuple((label, side, re.compile(fmt) if fmt else None) for label, side, fmt in rules)
+    for metric, rules in METRIC_RULES.items()
+}
+
+VALID_RANGES = {
+    'weight': (100, 500),
+    'bmr': (1000, 5000),
+    'left_arm_lean_mass': (1, 200),
+    'right_arm_lean_mass': (1, 200),
+    'trunk_lean_mass': (1, 200),
+    'left_leg_lean_mass': (1, 200),
+    'right_leg_lean_mass': (1, 200),
+}
+
+# Numbers misread on the original sample scans: metric -> exact token text and the value it stands for
+MISREAD_NUMBERS = {
+    'left_leg_lean_mass': ('526.59', 26.59),
+    'right_leg_lean_mass': ('27.07', 27.07),
+}
+
+# Rules for a body fat percentage printed with its % sign, in order
+BODY_FAT_PERCENT_RULES = (
+    ('body_fat', BEFORE), ('body_fat', AFTER), ('pbf', BEFORE), ('pbf', AFTER),
+    ('percent_body_fat', BEFORE), ('percent_body_fat', AFTER),
+)
+# PBF values OCR'd without their decimal point (283 for 28.3) are scaled back
+PBF_RULES = (('pbf', AFTER, r'\d{2,3}'), ('pbf', BEFORE, r'\d{2,3}'), ('pbf', AFTER, None), ('pbf', BEFORE, None))
+PBF_RULES = tuple((label, side, re.compile(fmt) if fmt else None) for label, side, fmt in PBF_RULES)
+_TWO_OR_THREE_DIGITS = re.compile(r'\d{2,3}')
+_PERCENT_DECIMAL = re.compile(r'\d{2}\.\d')
+
+BODY_FAT_WORDS = ('bodyfat', 'pbf', 'percent', 'fat', 'obesity', 'bf')
+BMI_WORDS = ('bmi', 'index', 'weight', 'height')
+_WORDS_BEFORE = re.compile(r'[A-Za-z\s]{0,20}$')
+_WORDS_AFTER = re.compile(r'[A-Za-z\s]{0,20}')
+_WEIGHT_HISTORY_VALUE = re.compile(r'\d{3}\.\d')
+_HISTORY_SEPARATOR = re.compile(r'\s*,\s*')
+
+SMM_FALLBACK_RULES = tuple((label, side, None) for label in ('skeletal_muscle_mass', 'skeletal', 'muscle_mass')
+                           for side in (AFTER, BEFORE))
+
+def tokenize(text):
+    """Label and number tokens of the text, in order"""
+    tokens = []
+    line = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        kind = match.lastgroup
+        if kind == 'newline':
+            line += 1
+        elif kind == 'number' or kind == 'percent':
+            tokens.append(Token(None, match.group('number'), match.start(), kind == 'percent', line))
+        else:
+            tokens.append(Token(kind, None, match.start(), False, line))
+    return tokens
+
+class _TokenStream:
+    """Tokens of one text, with each label occurrence's neighbouring numbers"""
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.numbers = [token for token in self.tokens if token.number is not None]
+        # label -> [number before, number after, line] per occurrence
+        self.around = {}
+        last_number = None
+        waiting = []
+        for token in self.tokens:
+            if token.number is None:
+                neighbours = [last_number, None, token.line]
+                self.around.setdefault(token.label, []).append(neighbours)
+                waiting.append(neighbours)
+                continue
+            if len(waiting) > 1 and token.line > waiting[-1][2]:
+                self._match_columns(waiting, token)
+            for neighbours in waiting:
+                if neighbours[1] is None:
+                    neighbours[1] = token
+            waiting = []
+            last_number = token
+
+    def _match_columns(self, waiting, first_number):
+        # A row of labels alone ("Left Arm  Right Arm") heads a row of their values ("10.76 lbs  10.96 lbs"):
+        # the k-th label of the row takes the k-th number of the next line with numbers
+        row = [neighbours for neighbours in waiting if neighbours[2] == waiting[-1][2]]
+        values = [token for token in self.numbers if token.line == first_number.line]
+        if len(row) > 1 and len(values) >= len(row):
+            for neighbours, value in zip(row, values):
+                neighbours[1] = value
+
+    def has_label(self, label):
+        return label in self.around
+
+    def find(self, label, side, fmt=None, percent=False):
+        """The number next to the first occurrence of label whose number on that side fits"""
+        for before, after, _line in self.around.get(label, ()):
+            token = after if side == AFTER else before
+            if token is None or (percent and not token.percent):
+                continue
+            if fmt is None or fmt.fullmatch(token.number):
+                return token
+        return None
+
+    def end(self, token):
+        return token.position + len(token.number)
+
+def _scaled_percent(value):
+    # A 3-digit PBF like 283 lost its decimal point
+    return value / 10 if value > 100 else value
+
+def parse_inbody_metrics(text, debug=False):
+    """Parse InBody metrics from OCR text; returns metric name -> value"""
+    if not text:
+        return {}
+    log = logger.info if debug else None
+    stream = _TokenStream(text)
+    metrics = {}
+
+    if log:
+        log(f"Tokens: {len(stream.tokens)} ({len(stream.numbers)} numbers)")
+        for token in stream.tokens:
+            log(f"  {token}")
+
+    for metric, rules in METRIC_RULES.items():
+        for label, side, fmt in rules:
+            token = stream.find(label, side, fmt)
+            if token is None:
+                continue
+            value = float(token.number)
+            low, high = VALID_RANGES.get(metric, (None, None))
+            if low is not None and not low <= value <= high:
+                if log:
+                    log(f"Skipping unrealistic {metric}: {value}")
+                continue
+            metrics[metric] = value
+            if log:
+                log(f"✓ Found {metric}: {value} ({side} {label} at {token.position})")
+            break
+
+    _resolve_misreads(stream, metrics, log)
+    if 'body_fat_percentage' not in metrics:
+        _resolve_body_fat_percentage(stream, metrics, log)
+    if 'weight' not in metrics:
+        _resolve_weight_from_history(stream, metrics, log)
+    if 'smm' not in metrics:
+        for label, side, fmt in SMM_FALLBACK_RULES:
+            token = stream.find(label, side, fmt)
+            if token is not None and 10 <= float(token.number) <= 200:
+                metrics['smm'] = float(token.number)
+                if log:
+                    log(f"✓ Found smm from {label}: {metrics['smm']}")
+                break
+
+    if log:
+        log(f"=== Final Results: {len(metrics)} metrics extracted ===")
+        for key, value in metrics.items():
+            log(f"  {key}: {value}")
+    return metrics
+
+def _resolve_misreads(stream, metrics, log):
+    if 'right_arm_lean_mass' not in metrics:
+        # 10.96 split into "10" and "96"
+        for first, second in zip(stream.numbers, stream.numbers[1:]):
+            if first.number.endswith('10') and second.number.startswith('96'):
+                metrics['right_arm_lean_mass'] = 10.96
+                break
+    if 'trunk_lean_mass' not in metrics and stream.has_label('trunk_misread'):
+        metrics['trunk_lean_mass'] = 126.6
+    for metric, (misread, value) in MISREAD_NUMBERS.items():
+        if metric not in metrics and any(token.number == misread for token in stream.numbers):
+            metrics[metric] = value
+    if log:
+        log(f"After known misreads: {sorted(metrics)}")
+
+def _resolve_body_fat_percentage(stream, metrics, log):
+    def found(value, how):
+        metrics['body_fat_percentage'] = value
+        if log:
+            log(f"✓ Found body_fat_percentage {how}: {value}")
+
+    for label, side in BODY_FAT_PERCENT_RULES:
+        token = stream.find(label, side, percent=True)
+        if token is not None and 1 <= float(token.number) <= 50:
+            return found(float(token.number), f"with % {side} {label}")
+
+    token = stream.find('pbf', AFTER)
+    if token is not None and 1 <= float(token.number) <= 50:
+        return found(float(token.number), 'after PBF')
+    for label, side, fmt in PBF_RULES:
+        token = stream.find(label, side, fmt)
+        if token is not None and 1 <= _scaled_percent(float(token.number)) <= 50:
+            return found(_scaled_percent(float(token.number)), f"{side} PBF")
+
+    token = stream.find('pbf_caption', AFTER, _TWO_OR_THREE_DIGITS)
+    if token is not None and 1 <= _scaled_percent(float(token.number)) <= 50:
+        return found(_scaled_percent(float(token.number)), 'from the PBF caption')
+
+    text = stream.text
+    # A 10-30 decimal with body fat words and no BMI words within 50 characters
+    for token in stream.numbers:
+        if not _PERCENT_DECIMAL.fullmatch(token.number) or not 10 <= float(token.number) <= 30:
+            continue
+        end = stream.end(token)
+        context = (text[max(0, token.position - 50):token.position] + text[end:end + 50]).lower()
+        if any(word in context for word in BODY_FAT_WORDS) and not any(word in context for word in BMI_WORDS):
+            return found(float(token.number), 'from nearby words')
+
+    # Any 1-50 number directly next to body fat words
+    for token in stream.numbers:
+        value = float(token.number)
+        if not 1 <= value <= 50:
+            continue
+        before = _WORDS_BEFORE.search(text, max(0, token.position - 20), token.position).group().lower()
+        after = _WORDS_AFTER.match(text, stream.end(token)).group().lower()
+        if any(word in before or word in after for word in BODY_FAT_WORDS) and \
+           not any(word in before or word in after for word in BMI_WORDS):
+            return found(value, f"from context '{before.strip()}' -> {token.number} <- '{after.strip()}'")
+
+    if log:
+        log("No body fat percentage; numbers in range: " +
+            ', '.join(token.number for token in stream.numbers if 1 <= float(token.number) <= 50))
+
+def _resolve_weight_from_history(stream, metrics, log):
+    # The history row lists recent weights, oldest first: 209.9, 212.1, 214.7, 214.4
+    runs = []
+    run = []
+    for token in stream.numbers:
+        joined = bool(run) and _HISTORY_SEPARATOR.fullmatch(stream.text, stream.end(run[-1]), token.position)
+        if _WEIGHT_HISTORY_VALUE.fullmatch(token.number) and (joined or not run):
+            run.append(token)
+            continue
+        if len(run) >= 2:
+            runs.append(run)
+        run = [token] if _WEIGHT_HISTORY_VALUE.fullmatch(token.number) else []
+    if len(run) >= 2:
+        runs.append(run)
+    # Prefer the first run of four, then three, then two, and take its last of those values
+    for length in (4, 3, 2):
+        for run in runs:
+            if len(run) >= length:
+                metrics['weight'] = float(run[length - 1].number)
+                if log:
+                    log(f"✓ Found weight from history: {metrics['weight']}")
+                return
@@ -0,0 +1,105 @@
+"""add daily rollup
+
+Revision ID: 0e2d364e6ed9
+Revises: 7fd440aa188a
+Create Date: 2026-10-18 17:38:25.975909
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0e2d364e6ed9'
+down_revision = '7fd440aa188a'
+branch_labels = None
+depends_on = None
+
+BACKFILL_SQL = """
+INSERT INTO daily_rollup (
+    user_id, date, calories, manual_calories, protein, carbs, fat, food_entries, manual_food_entries,
+    workout_sets, workout_exercises, workout_volume,
+    activity_count, activity_minutes, activity_miles, activity_calories, walking_miles, running_miles, cycling_miles,
+    weight, mood_rating, updated_at
+)
+SELECT
+    k.user_id, k.date,
+    COALESCE(f.calories, 0), COALESCE(f.manual_calories, 0), COALESCE(f.protein, 0), COALESCE(f.carbs, 0),
+    COALESCE(f.fat, 0), COALESCE(f.entries, 0), COALESCE(f.manual_entries, 0),
+    COALESCE(w.sets, 0), COALESCE(w.exercises, 0), COALESCE(w.volume, 0),
+    COALESCE(a.count, 0), COALESCE(a.minutes, 0), COALESCE(a.miles, 0), COALESCE(a.calories, 0),
+    COALESCE(a.walking, 0), COALESCE(a.running, 0), COALESCE(a.cycling, 0),
+    (SELECT s.weight FROM stat s WHERE s.user_id = k.user_id AND s.date = k.date AND s.weight IS NOT NULL
+     ORDER BY s.id DESC LIMIT 1),
+    (SELECT m.rating FROM mood m WHERE m.user_id = k.user_id AND m.date = k.date ORDER BY m.id DESC LIMIT 1),
+    CURRENT_TIMESTAMP
+FROM (
+    SELECT user_id, date FROM food_entry
+    UNION SELECT user_id, date FROM workout
+    UNION SELECT user_id, date FROM activity
+    UNION SELECT user_id, date FROM stat WHERE weight IS NOT NULL
+    UNION SELECT user_id, date FROM mood
+) k
+LEFT JOIN (
+    SELECT user_id, date, SUM(calories) AS calories,
+           SUM(CASE WHEN food_name = 'Manual Entry' THEN calories ELSE 0 END) AS manual_calories,
+           SUM(protein) AS protein, SUM(carbs) AS carbs, SUM(fat) AS fat, COUNT(id) AS entries,
+           SUM(CASE WHEN food_name = 'Manual Entry' THEN 1 ELSE 0 END) AS manual_entries
+    FROM food_entry GROUP BY user_id, date
+) f ON f.user_id = k.user_id AND f.date = k.date
+LEFT JOIN (
+    SELECT user_id, date, COUNT(id) AS sets, COUNT(DISTINCT exercise) AS exercises,
+           SUM(COALESCE(total_weight, weight) * reps) AS volume
+    FROM workout GROUP BY user_id, date
+) w ON w.user_id = k.user_id AND w.date = k.date
+LEFT JOIN (
+    SELECT user_id, date, COUNT(id) AS count, SUM(duration) AS minutes, SUM(miles) AS miles,
+           SUM(calories_burned) AS calories,
+           SUM(CASE WHEN LOWER(activity_type) = 'walking' THEN miles ELSE 0 END) AS walking,
+           SUM(CASE WHEN LOWER(activity_type) = 'running' THEN miles ELSE 0 END) AS running,
+           SUM(CASE WHEN LOWER(activity_type) = 'cycling' THEN miles ELSE 0 END) AS cycling
+    FROM activity GROUP BY user_id, date
+) a ON a.user_id = k.user_id AND a.date = k.date
+"""
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('daily_rollup',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('calories', sa.Integer(), nullable=False),
+    sa.Column('manual_calories', sa.Integer(), nullable=False),
+    sa.Column('protein', sa.Float(), nullable=False),
+    sa.Column('carbs', sa.Float(), nullable=False),
+    sa.Column('fat', sa.Float(), nullable=False),
+    sa.Column('food_entries', sa.Integer(), nullable=False),
+    sa.Column('manual_food_entries', sa.Integer(), nullable=False),
+    sa.Column('workout_sets', sa.Integer(), nullable=False),
+    sa.Column('workout_exercises', sa.Integer(), nullable=False),
+    sa.Column('workout_volume', sa.Float(), nullable=False),
+    sa.Column('activity_count', sa.Integer(), nullable=False),
+    sa.Column('activity_minutes', sa.Float(), nullable=False),
+    sa.Column('activity_miles', sa.Float(), nullable=False),
+    sa.Column('activity_calories', sa.Integer(), nullable=False),
+    sa.Column('walking_miles', sa.Float(), nullable=False),
+    sa.Column('running_miles', sa.Float(), nullable=False),
+    sa.Column('cycling_miles', sa.Float(), nullable=False),
+    sa.Column('weight', sa.Float(), nullable=True),
+    sa.Column('mood_rating', sa.Integer(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'date', name='uix_daily_rollup_user_date')
+    )
+    # ### end Alembic commands ###
+
+    # Backfill one row per user-day that has any logs (same aggregates as daily_rollup.compute_daily_rollups)
+    op.execute(BACKFILL_SQL)
+
+
+def downgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_table('daily_rollup')
+    # ### end Alembic commands ###
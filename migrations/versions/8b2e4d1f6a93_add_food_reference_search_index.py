@@ -0,0 +1,61 @@
+"""add food reference search index
+
+Revision ID: 8b2e4d1f6a93
+Revises: 3f9a1c2b7d64
+Create Date: 2026-10-18 17:40:12.318877
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4d1f6a93'
+down_revision = '3f9a1c2b7d64'
+branch_labels = None
+depends_on = None
+
+PG_SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(food_name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(brand, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(search_keywords, '')), 'C')"
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("""CREATE VIRTUAL TABLE food_reference_fts USING fts5(
+            food_name, brand, search_keywords,
+            content='food_reference', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )""")
+        op.execute("""CREATE TRIGGER food_reference_fts_ai AFTER INSERT ON food_reference BEGIN
+            INSERT INTO food_reference_fts(rowid, food_name, brand, search_keywords)
+            VALUES (new.id, new.food_name, new.brand, new.search_keywords);
+        END""")
+        op.execute("""CREATE TRIGGER food_reference_fts_ad AFTER DELETE ON food_reference BEGIN
+            INSERT INTO food_reference_fts(food_reference_fts, rowid, food_name, brand, search_keywords)
+            VALUES ('delete', old.id, old.food_name, old.brand, old.search_keywords);
+        END""")
+        op.execute("""CREATE TRIGGER food_reference_fts_au AFTER UPDATE ON food_reference BEGIN
+            INSERT INTO food_reference_fts(food_reference_fts, rowid, food_name, brand, search_keywords)
+            VALUES ('delete', old.id, old.food_name, old.brand, old.search_keywords);
+            INSERT INTO food_reference_fts(rowid, food_name, brand, search_keywords)
+            VALUES (new.id, new.food_name, new.brand, new.search_keywords);
+        END""")
+        # Index the rows that already exist
+        op.execute("INSERT INTO food_reference_fts(food_reference_fts) VALUES ('rebuild')")
+    elif dialect == 'postgresql':
+        op.execute(f"CREATE INDEX ix_food_reference_search ON food_reference USING GIN (({PG_SEARCH_VECTOR}))")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS food_reference_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS food_reference_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS food_reference_fts_ai")
+        op.execute("DROP TABLE IF EXISTS food_reference_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_food_reference_search")
@@ -11,6 +11,17 @@ def init_db(app: Flask):
     with app.app_context():
         db.create_all()
 
+def dialect_insert():
+    """Return the INSERT construct supporting ON CONFLICT for the current database, if any."""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    return None
+
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     google_id = db.Column(db.String(100), unique=True, nullable=False)
@@ -35,6 +46,10 @@ class User(db.Model, UserMixin):
     workout_templates = db.relationship('WorkoutTemplate', backref='user', lazy=True, cascade='all, delete-orphan')
     workout_sessions = db.relationship('WorkoutSession', backref='user', lazy=True, cascade='all, delete-orphan')
     settings = db.relationship('UserSettings', backref='user', lazy=True, uselist=False, cascade='all, delete-orphan')
+    tdee_dirty_dates = db.relationship('TDEEDirtyDate', backref='user', lazy=True, cascade='all, delete-orphan')
+    daily_rollups = db.relationship('DailyRollup', backref='user', lazy=True, cascade='all, delete-orphan')
+    ocr_jobs = db.relationship('OCRJob', backref='user', lazy=True, cascade='all, delete-orphan')
+    ocr_cache_entries = db.relationship('OCRCache', backref='user', lazy=True, cascade='all, delete-orphan')
     
     # Relationship to favorite exercises
     favorite_exercises = db.relationship('Exercise', secondary='user_favorite_exercise')
@@ -70,6 +85,9 @@ class Stat(db.Model):
     
     # Body Scan Image
     bodyscan_image_path = db.Column(db.String(255), nullable=True)
+    bodyscan_blob = db.Column(db.String(80), nullable=True)  # Blob key of the scan (see upload_storage.py)
+    
+    __table_args__ = (db.Index('ix_stat_user_date', 'user_id', 'date'),)
 
 class FoodCategory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -96,6 +114,7 @@ class FoodServingSize(db.Model):
     is_common = db.Column(db.Boolean, default=False)  # Is this a commonly used serving size?
     is_default = db.Column(db.Boolean, default=False)  # Is this the default serving size?
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)  # Indexed for the nutrition cache watermark
     
     # Relationship - remove cascade to fix the error
     food = db.relationship('FoodReference', backref='serving_sizes', lazy=True)
@@ -130,7 +149,7 @@ class FoodReference(db.Model):
     serving_size = db.Column(db.String(50), nullable=True)  # e.g., "1 cup", "100g" - legacy field
     is_verified = db.Column(db.Boolean, default=False)  # Admin verified data
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)  # Indexed for the nutrition cache watermark
     
     # Search optimization
     search_keywords = db.Column(db.Text, nullable=True)  # Comma-separated keywords for better search
@@ -177,11 +196,12 @@ class FoodReference(db.Model):
     
     def get_common_serving_sizes(self):
         """Get list of common serving sizes for this food"""
-        return FoodServingSize.query.filter_by(food_id=self.id, is_common=True).order_by(FoodServingSize.amount).all()
+        # Filtered in memory so eager-loaded serving_sizes need no extra query
+        return sorted((s for s in self.serving_sizes if s.is_common), key=lambda s: s.amount)
     
     def get_default_serving_size(self):
         """Get the default serving size for this food"""
-        return FoodServingSize.query.filter_by(food_id=self.id, is_default=True).first()
+        return next((s for s in sorted(self.serving_sizes, key=lambda s: s.id) if s.is_default), None)
 
 class UserFavoriteFood(db.Model):
     __tablename__ = 'user_favorite_food'
@@ -200,6 +220,8 @@ class FoodEntry(db.Model):
     fat = db.Column(db.Float, nullable=True)
     quantity = db.Column(db.Float, nullable=False)
     unit = db.Column(db.String(20), nullable=False)
+    
+    __table_args__ = (db.Index('ix_food_entry_user_date', 'user_id', 'date'),)
 
 class FoodSummary(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -221,8 +243,18 @@ class Workout(db.Model):
     reps = db.Column(db.Integer, nullable=False)
     sets = db.Column(db.Integer, nullable=False)
     total_weight = db.Column(db.Float, nullable=True)  # New: total weight (plates + barbell)
+    # Sets the row stands for: add_workout logs `sets` identical sets in one row, while a
+    # set logged in a session is one row whose `sets` is its set number
+    set_count = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     
     # Removed session_exercise_id foreign key to fix circular reference
+    
+    # Day views filter by user and date; PR rebuilds, per-exercise history and
+    # set logging by user, exercise and (usually) date
+    __table_args__ = (
+        db.Index('ix_workout_user_date', 'user_id', 'date'),
+        db.Index('ix_workout_user_exercise_date', 'user_id', 'exercise', 'date'),
+    )
 
 class ExerciseCategory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -303,6 +335,8 @@ class Mood(db.Model):
     date = db.Column(db.Date, nullable=False)
     rating = db.Column(db.Integer, nullable=False)
     notes = db.Column(db.Text, nullable=True)
+    
+    __table_args__ = (db.Index('ix_mood_user_date', 'user_id', 'date'),)
 
 class Work(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -339,6 +373,8 @@ class Activity(db.Model):
     calories_burned = db.Column(db.Integer)  # Estimated calories
     miles = db.Column(db.Float, nullable=True)  # Distance in miles
     activity_level = db.Column(db.String(20), nullable=True)  # General activity level for the day
+    
+    __table_args__ = (db.Index('ix_activity_user_date', 'user_id', 'date'),)
 
 class TDEE(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -355,6 +391,107 @@ class TDEE(db.Model):
     # Fix: Change unique constraint to be per user per date
     __table_args__ = (db.UniqueConstraint('user_id', 'date', name='uix_tdee_user_date'),)
 
+class TDEEDirtyDate(db.Model):
+    """Ledger of TDEE rows made stale by writes, rebuilt lazily on read or by the background flusher"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    cascade_forward = db.Column(db.Boolean, nullable=False, default=False)  # Also invalidates every later date (BMR/profile changes)
+    marked_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (db.UniqueConstraint('user_id', 'date', name='uix_tdee_dirty_user_date'),)
+
+class DailyRollup(db.Model):
+    """Per-user daily totals for the dashboard widgets, kept current on writes by daily_rollup.py"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    
+    # Food (all entries; manual_* covers 'Manual Entry' rows)
+    calories = db.Column(db.Integer, nullable=False, default=0)
+    manual_calories = db.Column(db.Integer, nullable=False, default=0)
+    protein = db.Column(db.Float, nullable=False, default=0)
+    carbs = db.Column(db.Float, nullable=False, default=0)
+    fat = db.Column(db.Float, nullable=False, default=0)
+    food_entries = db.Column(db.Integer, nullable=False, default=0)
+    manual_food_entries = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Workouts
+    workout_sets = db.Column(db.Integer, nullable=False, default=0)  # Workout rows logged that day
+    workout_exercises = db.Column(db.Integer, nullable=False, default=0)
+    workout_volume = db.Column(db.Float, nullable=False, default=0)  # sum of weight x reps (total weight for barbell)
+    
+    # Activities
+    activity_count = db.Column(db.Integer, nullable=False, default=0)
+    activity_minutes = db.Column(db.Float, nullable=False, default=0)
+    activity_miles = db.Column(db.Float, nullable=False, default=0)
+    activity_calories = db.Column(db.Integer, nullable=False, default=0)
+    walking_miles = db.Column(db.Float, nullable=False, default=0)
+    running_miles = db.Column(db.Float, nullable=False, default=0)
+    cycling_miles = db.Column(db.Float, nullable=False, default=0)
+    
+    # Body and mood (latest entry of the day)
+    weight = db.Column(db.Float, nullable=True)
+    mood_rating = db.Column(db.Integer, nullable=True)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (db.UniqueConstraint('user_id', 'date', name='uix_daily_rollup_user_date'),)
+
+class DataVersion(db.Model):
+    """Write counter per table and user, bumped on commit by conditional_get.py for ETag version tokens"""
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(64), nullable=False)
+    user_id = db.Column(db.Integer, nullable=False, default=0)  # 0 for tables without a user_id column
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint('table_name', 'user_id', name='uix_data_version_table_user'),)
+
+class OCRJob(db.Model):
+    """Body scan OCR run in the background process pool (see ocr_jobs.py)"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, done, failed, reviewed
+    filename = db.Column(db.String(255), nullable=False)  # Blob key of the uploaded scan
+    stat_id = db.Column(db.Integer, db.ForeignKey('stat.id', ondelete='SET NULL'), nullable=True)  # Stat to fill in, or the reviewed result
+    metrics = db.Column(db.Text, nullable=True)  # JSON of the extracted metrics
+    error = db.Column(db.Text, nullable=True)
+    duration_ms = db.Column(db.Float, nullable=True)  # Time spent in the worker
+    sha256 = db.Column(db.String(64), nullable=True)  # Of the uploaded file
+    phash = db.Column(db.String(16), nullable=True)  # Perceptual hash of the sheet, hex
+    cache_hit = db.Column(db.String(20), nullable=True)  # exact, near_duplicate; None when OCR ran
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (db.Index('ix_ocr_job_user_created', 'user_id', 'created_at'),)
+
+class OCRCache(db.Model):
+    """OCR result of a body scan, keyed by file content (see ocr_cache.py)"""
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False, unique=True)
+    phash = db.Column(db.String(16), nullable=False)  # 64-bit perceptual hash of the sheet, hex
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)  # First uploader; scopes near-duplicate matches
+    text = db.Column(db.Text, nullable=False)  # Raw OCR text
+    metrics = db.Column(db.Text, nullable=False)  # JSON of parse_inbody_metrics(text)
+    parser_version = db.Column(db.Integer, nullable=False)  # OCR_PARSER_VERSION that produced metrics
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (db.Index('ix_ocr_cache_user', 'user_id'),)
+
+class Blob(db.Model):
+    """An uploaded file stored once under its content hash (see upload_storage.py)"""
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(80), nullable=False, unique=True)  # sha256 hex + extension
+    size = db.Column(db.Integer, nullable=False)
+    refcount = db.Column(db.Integer, nullable=False, default=0)  # ProgressPic and Stat columns pointing at it
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    stored_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Last upload of these bytes
+    
+    __table_args__ = (db.Index('ix_blob_refcount_stored', 'refcount', 'stored_at'),)
+
 class UserSettings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -484,9 +621,15 @@ class WorkColumn(db.Model):
 class ProgressPic(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    filename = db.Column(db.String(255), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)  # Blob key of the picture
     upload_date = db.Column(db.Date, nullable=False, default=datetime.utcnow().date)
     description = db.Column(db.String(500), nullable=True)
+    # Resized copies written by image_variants.py (blob keys)
+    thumb_webp = db.Column(db.String(255), nullable=True)
+    thumb_jpeg = db.Column(db.String(255), nullable=True)
+    medium_webp = db.Column(db.String(255), nullable=True)
+    medium_jpeg = db.Column(db.String(255), nullable=True)
+    variants_status = db.Column(db.String(20), nullable=False, default='pending', server_default='pending')  # pending, ready, failed
     
     # Relationship
     user = db.relationship('User', backref='progress_pics')
@@ -495,7 +638,7 @@ class PersonalRecord(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     exercise = db.Column(db.String(100), nullable=False)
-    pr_type = db.Column(db.String(50), nullable=False)  # 'weight', 'reps', 'volume', 'milestone'
+    pr_type = db.Column(db.String(50), nullable=False)  # 'weight', 'reps', 'volume', 'e1rm', 'milestone'
     value = db.Column(db.Float, nullable=False)  # The actual PR value
     weight = db.Column(db.Float, nullable=True)  # Weight used for the PR
     reps = db.Column(db.Integer, nullable=True)  # Reps used for the PR
@@ -508,8 +651,11 @@ class PersonalRecord(db.Model):
     user = db.relationship('User', backref='personal_records')
     workout = db.relationship('Workout', backref='personal_records')
     
-    # Ensure unique PRs per user, exercise, and type
-    __table_args__ = (db.UniqueConstraint('user_id', 'exercise', 'pr_type', name='uix_personal_record_user_exercise_type'),)
+    # Ensure unique PRs per user, exercise, and type; the second index serves ?types= listings
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'exercise', 'pr_type', name='uix_personal_record_user_exercise_type'),
+        db.Index('ix_personal_record_user_type_exercise', 'user_id', 'pr_type', 'exercise'),
+    )
 
 class FastingPeriod(db.Model):
     id = db.Column(db.Integer, primary_key=True)
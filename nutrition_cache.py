@@ -0,0 +1,242 @@
+"""
+In-process cache of FoodReference nutrition records.
+
+The food UI asks for the same food's nutrition and serving sizes on every
+quantity change, and reference data almost never changes, so records are
+kept in a bounded LRU keyed by food_id with a TTL. Entries are dropped when
+FoodReference/FoodServingSize rows are changed through the ORM in this
+process (on commit), and every CHECK_SECONDS the cache compares a cheap
+watermark (latest updated_at and row count of FoodReference and
+FoodServingSize) so inserts, edits and deletes made by importers and other
+workers clear it as well. Writes that bypass updated_at and keep the row
+counts (raw SQL updates) are only picked up when entries expire after the
+TTL.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+import numpy as np
+from flask import current_app
+from sqlalchemy import func, select
+from sqlalchemy.orm import selectinload
+from models import db, FoodReference, FoodServingSize
+from session_changes import register_change_hook
+
+NUTRIENT_FIELDS = ('calories', 'protein', 'carbs', 'fat', 'fiber', 'sugar', 'sodium',
+                   'saturated_fat', 'trans_fat', 'cholesterol', 'potassium', 'vitamin_c',
+                   'calcium', 'iron')
+
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_TTL_SECONDS = 3600
+CHECK_SECONDS = 30
+
+ServingRecord = namedtuple('ServingRecord', 'id description amount unit grams_equivalent is_common is_default')
+# nutrients holds the per-100g values in NUTRIENT_FIELDS order
+NutritionRecord = namedtuple('NutritionRecord', 'food_id food_name nutrients serving_sizes updated_at')
+
+class NutritionCache:
+    """Thread-safe LRU of NutritionRecords with per-entry expiry."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, food_id):
+        with self._lock:
+            entry = self._entries.get(food_id)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[food_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(food_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, record):
+        with self._lock:
+            self._entries[record.food_id] = (record, time.monotonic() + self.ttl)
+            self._entries.move_to_end(record.food_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, food_ids):
+        with self._lock:
+            for food_id in food_ids:
+                if self._entries.pop(food_id, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+_cache = None
+_cache_lock = threading.Lock()
+_watermark = None
+_watermark_checked_at = 0.0
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = NutritionCache(
+                    current_app.config.get('NUTRITION_CACHE_SIZE', DEFAULT_MAX_ENTRIES),
+                    current_app.config.get('NUTRITION_CACHE_TTL', DEFAULT_TTL_SECONDS)
+                )
+    return _cache
+
+def _check_watermark(cache):
+    """Clear the cache if reference data changed outside this process."""
+    global _watermark, _watermark_checked_at
+    now = time.monotonic()
+    if now - _watermark_checked_at < CHECK_SECONDS:
+        return
+    _watermark_checked_at = now
+    watermark = tuple(db.session.execute(select(*(
+        select(aggregate).scalar_subquery()
+        for model in (FoodReference, FoodServingSize)
+        for aggregate in (func.max(model.updated_at), func.count(model.id))
+    ))).one())
+    if _watermark is not None and watermark != _watermark:
+        cache.clear()
+    _watermark = watermark
+
+def _build_record(food):
+    servings = sorted(food.serving_sizes, key=lambda s: (s.amount, s.id))
+    return NutritionRecord(
+        food_id=food.id,
+        food_name=food.food_name,
+        nutrients=tuple(getattr(food, field) for field in NUTRIENT_FIELDS),
+        serving_sizes=tuple(
+            ServingRecord(s.id, s.description, s.amount, s.unit, s.grams_equivalent,
+                          bool(s.is_common), bool(s.is_default))
+            for s in servings
+        ),
+        updated_at=food.updated_at
+    )
+
+def get_nutrition_record(food_id):
+    """Return the cached NutritionRecord for a food, loading it on a miss.
+
+    Returns None if the food does not exist.
+    """
+    cache = _get_cache()
+    _check_watermark(cache)
+    record = cache.get(food_id)
+    if record is not None:
+        return record
+    food = FoodReference.query.options(selectinload(FoodReference.serving_sizes)).filter_by(id=food_id).first()
+    if food is None:
+        return None
+    record = _build_record(food)
+    cache.put(record)
+    return record
+
+def get_nutrition_records(food_ids):
+    """Return {food_id: NutritionRecord} for many foods, loading all misses in one query.
+
+    Foods that do not exist are left out of the result.
+    """
+    cache = _get_cache()
+    _check_watermark(cache)
+    records = {}
+    missing = []
+    for food_id in set(food_ids):
+        record = cache.get(food_id)
+        if record is not None:
+            records[food_id] = record
+        else:
+            missing.append(food_id)
+    if missing:
+        foods = FoodReference.query.options(selectinload(FoodReference.serving_sizes)).filter(
+            FoodReference.id.in_(missing)
+        ).all()
+        for food in foods:
+            record = _build_record(food)
+            cache.put(record)
+            records[food.id] = record
+    return records
+
+def serving_multiplier(record, serving_size_id=None, amount=100, unit='g'):
+    """Factor to apply to a record's per-100g values; mirrors FoodReference.get_nutrition_for_serving."""
+    if serving_size_id:
+        try:
+            serving_size_id = int(serving_size_id)
+        except (TypeError, ValueError):
+            serving_size_id = None
+        serving = next((s for s in record.serving_sizes if s.id == serving_size_id), None)
+        return serving.grams_equivalent / 100.0 if serving else 1.0
+    if unit.lower() in ['g', 'gram', 'grams']:
+        return amount / 100.0
+    if unit.lower() in ['oz', 'ounce', 'ounces']:
+        return (amount * 28.35) / 100.0  # Convert oz to grams
+    return 1.0  # Default to 100g basis
+
+def nutrition_for_serving(record, serving_size_id=None, amount=100, unit='g'):
+    """Scale a record's per-100g nutrition for one serving."""
+    multiplier = serving_multiplier(record, serving_size_id, amount, unit)
+    nutrition = {}
+    for field, value in zip(NUTRIENT_FIELDS, record.nutrients):
+        if field == 'calories':
+            nutrition[field] = value * multiplier
+        else:
+            nutrition[field] = (value or 0) * multiplier
+    return nutrition
+
+def nutrition_matrix(records, multipliers):
+    """Scale many records at once.
+
+    Returns an (N, len(NUTRIENT_FIELDS)) array where row i is records[i]
+    scaled by multipliers[i]; missing nutrient values count as 0.
+    """
+    per_100g = np.array(
+        [[value or 0 for value in record.nutrients] for record in records],
+        dtype=float
+    ).reshape(len(records), len(NUTRIENT_FIELDS))
+    return per_100g * np.asarray(multipliers, dtype=float)[:, np.newaxis]
+
+def clear_nutrition_cache():
+    """Drop every cached record (e.g. after a bulk import)."""
+    global _watermark
+    _watermark = None
+    if _cache is not None:
+        _cache.clear()
+
+def nutrition_cache_stats():
+    return _get_cache().stats()
+
+def _collect_changed_foods(obj, deleted, changed):
+    if isinstance(obj, FoodReference):
+        changed.add(obj.id)
+    elif isinstance(obj, FoodServingSize):
+        changed.add(obj.food_id)
+
+def _invalidate_changed_foods(changed):
+    if _cache is not None:
+        _cache.invalidate(changed)
+
+# Invalidate on commit any food whose reference row or serving sizes were flushed
+register_change_hook('nutrition_cache', _collect_changed_foods, after_commit=_invalidate_changed_foods)
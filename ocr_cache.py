@@ -0,0 +1,106 @@
+"""
+Content-addressed cache of body scan OCR results.
+
+Every OCR'd scan is stored under the SHA-256 of the uploaded bytes and a
+64-bit perceptual hash (DCT pHash) of the sheet found in the photo,
+together with the raw OCR text and the metrics parse_inbody_metrics read
+from it. submit_ocr_job looks here before queueing a job:
+
+- the same file again (same SHA-256, from any user) reuses the result
+- a resized, recompressed or re-saved copy of one of the user's own scans
+  (pHash within OCR_CACHE_MAX_DISTANCE bits) reuses it too. A perceptual
+  hash cannot see a changed digit, so these near-duplicate results are
+  offered for review but never fill in a Stat by themselves.
+
+Only results with metrics are cached: a scan nothing was read from (a bad
+photo, or one preprocessing could not handle yet) is OCR'd again when it
+is uploaded again.
+
+Entries parsed by an older OCR_PARSER_VERSION are re-parsed from the
+stored text when next used, or all at once with
+scripts/reparse_ocr_cache.py, so a parser fix never needs the scans OCR'd
+again.
+"""
+import hashlib
+import json
+from datetime import datetime
+import cv2
+import numpy as np
+from models import db, dialect_insert, OCRCache
+from ocr_processor import ocr_processor, OCR_PARSER_VERSION
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def perceptual_hash(image_path):
+    """64-bit DCT perceptual hash of the sheet in the photo, as 16 hex digits"""
+    gray = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        raise ValueError(f"Could not read image: {image_path}")
+    # Hash the detected page, so a re-crop of the same photo still matches
+    x, y, w, h = ocr_processor.detect_page(gray)
+    small = cv2.resize(gray[y:y + h, x:x + w], (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    bits = ''.join('1' if bit else '0' for bit in low > np.median(low))
+    return f"{int(bits, 2):016x}"
+
+def hamming_distance(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count('1')
+
+def find_cached_scan(sha256):
+    """The cache entry of a file, or None. Does not commit.
+
+    An entry without metrics (stored before empty results were skipped) is dropped, so the scan is OCR'd again.
+    """
+    entry = OCRCache.query.filter_by(sha256=sha256).first()
+    if entry is not None and entry.metrics == '{}':
+        db.session.delete(entry)
+        db.session.flush()
+        return None
+    return entry
+
+def find_near_duplicate(user_id, phash, max_distance):
+    """The user's cached scan closest to phash within max_distance bits, or None"""
+    if max_distance <= 0:
+        return None
+    # A user has a handful of scans, so comparing them in Python is cheaper than indexing hash prefixes
+    candidates = db.session.query(OCRCache.id, OCRCache.phash).filter(
+        OCRCache.user_id == user_id, OCRCache.metrics != '{}').all()
+    best = min(candidates, key=lambda c: hamming_distance(c.phash, phash), default=None)
+    if best is None or hamming_distance(best.phash, phash) > max_distance:
+        return None
+    return db.session.get(OCRCache, best.id)
+
+def cached_metrics(entry):
+    """Metrics of a cache entry, re-parsed from its text if the parser changed since. Does not commit."""
+    if entry.parser_version != OCR_PARSER_VERSION:
+        reparse_entry(entry)
+    entry.hits += 1
+    entry.last_used_at = datetime.utcnow()
+    return json.loads(entry.metrics)
+
+def reparse_entry(entry):
+    """Re-run the current parser over the stored text; returns whether the metrics changed. Does not commit."""
+    metrics = json.dumps(ocr_processor.parse_inbody_metrics(entry.text))
+    changed = metrics != entry.metrics
+    entry.metrics = metrics
+    entry.parser_version = OCR_PARSER_VERSION
+    return changed
+
+def store_scan_result(user_id, sha256, phash, text, metrics):
+    """Cache an OCR result that has metrics; a concurrent job that stored the same file first wins. Does not commit."""
+    if not metrics:
+        return
+    values = {
+        'sha256': sha256, 'phash': phash, 'user_id': user_id, 'text': text, 'metrics': json.dumps(metrics),
+        'parser_version': OCR_PARSER_VERSION, 'hits': 0, 'created_at': datetime.utcnow()
+    }
+    insert = dialect_insert()
+    if insert is not None:
+        db.session.execute(insert(OCRCache).values(**values).on_conflict_do_nothing(index_elements=['sha256']))
+    elif not OCRCache.query.filter_by(sha256=sha256).first():
+        db.session.add(OCRCache(**values))
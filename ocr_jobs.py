@@ -0,0 +1,205 @@
+"""
+Background OCR jobs for InBody body scans.
+
+Uploads are stored (see upload_storage.py), recorded as an OCRJob row and handed to a bounded
+process pool (OCR_WORKERS processes, default one per core), so the
+OpenCV + Tesseract work never runs on a web worker. At most
+OCR_MAX_PENDING jobs are queued or running per web process; submit_ocr_job
+raises OCRQueueFull beyond that. When a job finishes its row is updated
+from the pool's callback thread; jobs attached to a Stat (add_stat with an
+image) also fill that Stat's empty fields with the extracted metrics.
+
+Scans already in the OCR cache (ocr_cache.py) skip the pool: their job is
+created finished, with cache_hit set.
+
+The job table is the source of truth for polling, so any web process can
+answer for a job; a job still queued after OCR_JOB_TIMEOUT (e.g. its web
+process restarted) is reported as failed.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from flask import url_for
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from models import db, OCRJob, Stat
+from tdee_engine import mark_tdee_dirty
+from ocr_processor import init_ocr_worker, run_ocr_job
+from ocr_cache import perceptual_hash, find_cached_scan, find_near_duplicate, cached_metrics, store_scan_result
+from upload_storage import get_storage, blob_sha256
+
+logger = logging.getLogger(__name__)
+
+# Stat columns an OCR result may fill
+OCR_STAT_FIELDS = (
+    'weight', 'body_fat_percentage', 'smm', 'body_fat_mass', 'lean_body_mass', 'bmr',
+    'left_arm_lean_mass', 'right_arm_lean_mass', 'left_leg_lean_mass', 'right_leg_lean_mass', 'trunk_lean_mass'
+)
+
+class OCRQueueFull(Exception):
+    """Raised when the OCR pool already has OCR_MAX_PENDING jobs in flight."""
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = None
+_futures = {}  # job id -> Future, for jobs submitted by this process
+
+def _get_executor(app):
+    global _executor, _slots
+    with _executor_lock:
+        if _executor is None:
+            workers = app.config.get('OCR_WORKERS') or os.cpu_count() or 1
+            # spawn: OpenCV and the app's DB connections do not survive fork safely
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=init_ocr_worker)
+            if _slots is None:
+                _slots = threading.BoundedSemaphore(app.config.get('OCR_MAX_PENDING') or workers * 4)
+        return _executor
+
+def _discard_broken_executor(executor):
+    # A worker that dies (e.g. killed for memory) breaks the whole pool; the next submit starts a new one
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+def shutdown_ocr_pool(wait=True):
+    """Stop the worker processes (tests and app shutdown)."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait, cancel_futures=not wait)
+            _executor = None
+
+def submit_ocr_job(app, user_id, filename, stat_id=None):
+    """Record and queue an OCR job for an uploaded scan (a blob key); returns the committed OCRJob.
+
+    With stat_id, the extracted metrics fill that Stat's empty fields once the job finishes.
+    A cached scan returns a job that is already done.
+    """
+    path = get_storage(app).local_path(filename)
+    # The key is the file's SHA-256, so the scan is not read again to look it up
+    sha256 = blob_sha256(filename)
+    entry = find_cached_scan(sha256)
+    cache_hit = 'exact'
+    if entry is not None:
+        phash = entry.phash
+    else:
+        try:
+            phash = perceptual_hash(path)
+        except Exception as e:
+            # Unreadable image: let the worker fail the job with the real error
+            logger.warning(f"Could not hash {filename}: {e}")
+            phash = None
+        if phash:
+            entry = find_near_duplicate(user_id, phash, app.config.get('OCR_CACHE_MAX_DISTANCE', 4))
+            cache_hit = 'near_duplicate'
+    if entry is not None:
+        return _cached_job(user_id, filename, stat_id, sha256, phash, entry, cache_hit)
+
+    executor = _get_executor(app)
+    if not _slots.acquire(blocking=False):
+        raise OCRQueueFull("Too many scans are being processed, try again shortly")
+    try:
+        job = OCRJob(user_id=user_id, filename=filename, stat_id=stat_id, status='queued', sha256=sha256, phash=phash)
+        db.session.add(job)
+        db.session.commit()
+        try:
+            future = executor.submit(run_ocr_job, path)
+        except BrokenProcessPool:
+            _discard_broken_executor(executor)
+            executor = _get_executor(app)
+            future = executor.submit(run_ocr_job, path)
+    except Exception:
+        _slots.release()
+        raise
+    _futures[job.id] = future
+    future.add_done_callback(lambda f, job_id=job.id: _job_finished(app, job_id, f, executor))
+    return job
+
+def _cached_job(user_id, filename, stat_id, sha256, phash, entry, cache_hit):
+    metrics = cached_metrics(entry)
+    now = datetime.utcnow()
+    job = OCRJob(user_id=user_id, filename=filename, stat_id=stat_id, status='done', metrics=json.dumps(metrics),
+                 duration_ms=0, sha256=sha256, phash=phash, cache_hit=cache_hit, created_at=now, finished_at=now)
+    db.session.add(job)
+    # A near-duplicate may differ in a digit the hash cannot see; it is only shown for review
+    if stat_id and cache_hit == 'exact':
+        apply_metrics_to_stat(stat_id, metrics)
+    db.session.commit()
+    return job
+
+def _job_finished(app, job_id, future, executor):
+    _slots.release()
+    _futures.pop(job_id, None)
+    with app.app_context():
+        try:
+            job = db.session.get(OCRJob, job_id)
+            if job is None:
+                return
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"OCR job {job_id} failed: {e}")
+                if isinstance(e, BrokenProcessPool):
+                    _discard_broken_executor(executor)
+                job.status = 'failed'
+                job.error = str(e) or e.__class__.__name__
+            else:
+                job.status = 'done'
+                job.metrics = json.dumps(result['metrics'])
+                job.duration_ms = result['duration_ms']
+                if job.stat_id:
+                    apply_metrics_to_stat(job.stat_id, result['metrics'])
+                if result['metrics'] and job.sha256 and job.phash:
+                    store_scan_result(job.user_id, job.sha256, job.phash, result['text'], result['metrics'])
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Could not record OCR job {job_id}: {e}")
+
+def apply_metrics_to_stat(stat_id, metrics):
+    """Fill the Stat's empty OCR fields from metrics (values typed by the user win). Does not commit."""
+    stat = db.session.get(Stat, stat_id)
+    if stat is None:
+        return
+    old_bmr = stat.bmr
+    for field in OCR_STAT_FIELDS:
+        if metrics.get(field) is not None and getattr(stat, field) in (None, 0):
+            setattr(stat, field, metrics[field])
+    # A new BMR changes TDEE from this date on
+    if stat.bmr != old_bmr:
+        mark_tdee_dirty(stat.user_id, stat.date, cascade_forward=True)
+
+def expire_stale_job(job, app):
+    """Mark a job failed if it has been queued longer than OCR_JOB_TIMEOUT; returns whether it was."""
+    timeout = timedelta(seconds=app.config.get('OCR_JOB_TIMEOUT', 300))
+    if job.status == 'queued' and job.id not in _futures and job.created_at < datetime.utcnow() - timeout:
+        job.status = 'failed'
+        job.error = 'Timed out waiting for an OCR worker'
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        return True
+    return False
+
+def serialize_ocr_job(job):
+    future = _futures.get(job.id)
+    status = 'running' if job.status == 'queued' and future is not None and future.running() else job.status
+    return {
+        'id': job.id,
+        'status': status,
+        'metrics': json.loads(job.metrics) if job.metrics else None,
+        'error': job.error,
+        'image_path': url_for('fitness.bodyscan_file', key=job.filename).lstrip('/'),
+        'temp_filename': job.filename,
+        'stat_id': job.stat_id,
+        'duration_ms': job.duration_ms,
+        'cache_hit': job.cache_hit,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
@@ -2,18 +2,45 @@ import cv2
 import numpy as np
 import pytesseract
 from PIL import Image
-import re
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from inbody_parser import parse_inbody_metrics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# InBody result sheets are US Letter; pages are rescaled so their text reaches Tesseract at TARGET_DPI
+PAGE_WIDTH_INCHES = 8.5
+TARGET_DPI = 300
+
+# Metric panels of the InBody result sheet as (name, x0, y0, x1, y1, psm): fractions of the
+# page, padded so a slightly skewed photo keeps its numbers, and the Tesseract page
+# segmentation mode suited to the panel. The history, impedance and interpretation
+# areas are never parsed and are skipped.
+INBODY_REGIONS = (
+    ('body_composition', 0.03, 0.09, 0.64, 0.26, 6),
+    ('mass_control', 0.62, 0.11, 0.96, 0.30, 4),
+    ('muscle_fat', 0.03, 0.25, 0.64, 0.41, 6),
+    ('obesity', 0.03, 0.40, 0.64, 0.54, 6),
+    ('segmental', 0.02, 0.52, 0.64, 0.79, 11),  # sparse labels around the body figure
+)
+
+# Bump when parse_inbody_metrics changes, so cached OCR text is re-parsed (see ocr_cache.py)
+OCR_PARSER_VERSION = 2
+
+OCR_CHAR_WHITELIST = r'0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz.%()[]{}:;,\- '
+
 class InBodyOCRProcessor:
     """OCR processor for InBody scan images"""
     
-    def __init__(self):
+    def __init__(self, target_dpi=TARGET_DPI, region_workers=len(INBODY_REGIONS), debug=False):
+        self.target_dpi = target_dpi
+        self.region_workers = region_workers
+        self.debug = debug  # Log the raw OCR text and every parsing step
+        
         # Configure Tesseract path for Windows
         tesseract_path = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
         
@@ -31,434 +58,160 @@ class InBodyOCRProcessor:
                 logger.error(f"Tesseract not found: {e}")
                 logger.error("Please ensure Tesseract is installed and in your PATH")
     
+    def load_page(self, image_path):
+        """Grayscale, denoised page cropped from the photo and scaled to target_dpi"""
+        image = cv2.imread(image_path)
+        if image is None:
+            raise ValueError(f"Could not read image: {image_path}")
+        
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        x, y, w, h = self.detect_page(gray)
+        page = gray[y:y + h, x:x + w]
+        
+        # A 3x3 median removes sensor speckle at a fraction of non-local means' cost;
+        # denoise before upscaling so it runs on the fewest pixels
+        page = cv2.medianBlur(page, 3)
+        
+        scale = self.target_dpi * PAGE_WIDTH_INCHES / page.shape[1]
+        if abs(scale - 1) > 0.05:
+            interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+            page = cv2.resize(page, None, fx=scale, fy=scale, interpolation=interpolation)
+        return page
+    
+    def detect_page(self, gray):
+        """Bounding box (x, y, w, h) of the paper sheet in the photo, or the whole image"""
+        height, width = gray.shape
+        # Find the bright paper on a quarter-size copy; the box only needs to be roughly right
+        small = cv2.resize(gray, None, fx=0.25, fy=0.25, interpolation=cv2.INTER_AREA)
+        _, mask = cv2.threshold(cv2.GaussianBlur(small, (5, 5), 0), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((9, 9), np.uint8))
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return 0, 0, width, height
+        x, y, w, h = (v * 4 for v in cv2.boundingRect(max(contours, key=cv2.contourArea)))
+        # Anything much smaller than the frame is a panel or glare, not the sheet
+        if w * h < 0.3 * width * height:
+            return 0, 0, width, height
+        return x, y, min(w, width - x), min(h, height - y)
+    
+    def binarize(self, gray):
+        """Local (adaptive) threshold, so shadows and glare across a photographed sheet do not wash out grey print"""
+        # Neighbourhood of about a sixth of an inch at target_dpi, a few text lines high
+        block_size = (self.target_dpi // 6) | 1
+        return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, block_size, 15)
+    
     def preprocess_image(self, image_path):
-        """Preprocess the image for better OCR results"""
+        """Preprocess the whole page for OCR"""
         try:
-            # Read image
-            image = cv2.imread(image_path)
-            if image is None:
-                raise ValueError(f"Could not read image: {image_path}")
-            
-            # Convert to grayscale
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            
-            # Apply noise reduction
-            denoised = cv2.fastNlMeansDenoising(gray)
-            
-            # Apply thresholding to get binary image
-            _, binary = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            
-            # Apply morphological operations to clean up the image
-            kernel = np.ones((1, 1), np.uint8)
-            cleaned = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
-            
-            return cleaned
-            
+            return self.binarize(self.load_page(image_path))
         except Exception as e:
             logger.error(f"Error preprocessing image: {e}")
             return None
     
-    def extract_text(self, image_path):
+    def region_images(self, page):
+        """(name, binarized crop, psm) for each InBody metric panel of a page from load_page"""
+        height, width = page.shape
+        regions = []
+        for name, x0, y0, x1, y1, psm in INBODY_REGIONS:
+            crop = page[int(y0 * height):int(y1 * height), int(x0 * width):int(x1 * width)]
+            regions.append((name, self.binarize(crop), psm))
+        return regions
+    
+    def _ocr(self, image, psm):
+        config = f"--oem 3 --psm {psm} -c tessedit_char_whitelist={OCR_CHAR_WHITELIST}"
+        return pytesseract.image_to_string(Image.fromarray(image), config=config)
+    
+    def ocr_regions(self, page):
+        """OCR the metric panels concurrently; returns their text in sheet order.
+        
+        Tesseract runs as a subprocess, so threads are enough to overlap the panels.
+        """
+        regions = self.region_images(page)
+        workers = min(len(regions), self.region_workers)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            texts = list(executor.map(lambda region: self._ocr(region[1], region[2]), regions))
+        return '\n'.join(texts)
+    
+    def ocr_full_page(self, page):
+        return self._ocr(self.binarize(page), 6)
+    
+    def _read_text(self, image_path, full_page=False):
+        page = self.load_page(image_path)
+        text = self.ocr_full_page(page) if full_page else self.ocr_regions(page)
+        
+        logger.info(f"Extracted text length: {len(text)}")
+        if self.debug:
+            logger.info(f"\n===== RAW OCR TEXT =====\n{text}\n======================\n")
+        return text
+    
+    def extract_text(self, image_path, full_page=False):
         """Extract text from the image using OCR"""
         try:
-            # Preprocess the image
-            processed_image = self.preprocess_image(image_path)
-            if processed_image is None:
-                return None
-            
-            # Convert to PIL Image for pytesseract
-            pil_image = Image.fromarray(processed_image)
-            
-            # Extract text with custom configuration
-            custom_config = r'--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz.%()[]{}:;,\- '
-            
-            text = pytesseract.image_to_string(pil_image, config=custom_config)
-            
-            logger.info(f"Extracted text length: {len(text)}")
-            logger.info(f"\n===== RAW OCR TEXT =====\n{text}\n======================\n")
-            return text
-            
+            return self._read_text(image_path, full_page)
         except Exception as e:
             logger.error(f"Error extracting text: {e}")
             return None
     
     def parse_inbody_metrics(self, text):
-        """Parse InBody metrics from extracted text"""
-        if not text:
-            return {}
-        
-        metrics = {}
-        
-        # First, let's find all numbers in the text and their context
-        logger.info("=== DEBUGGING: All numbers found in text ===")
-        number_pattern = r'(\d+\.?\d*)'
-        all_numbers = re.findall(number_pattern, text)
-        logger.info(f"All numbers found: {all_numbers}")
-        
-        # Find numbers with context (what comes before/after)
-        context_pattern = r'([A-Za-z\s]{0,20})(\d+\.?\d*)([A-Za-z\s]{0,20})'
-        contexts = re.findall(context_pattern, text)
-        logger.info("=== Number contexts ===")
-        for before, number, after in contexts:
-            if float(number) > 1:  # Only show meaningful numbers
-                logger.info(f"'{before.strip()}' -> {number} <- '{after.strip()}'")
-        
-        # Simple, flexible patterns that look for numbers near keywords
-        patterns = {
-            'weight': [
-                r'Weight[^0-9]*(\d{3}\.\d)',  # Weight followed by 3-digit decimal
-                r'(\d{3}\.\d)[^0-9]*Weight',  # 3-digit decimal followed by Weight
-            ],
-            'body_fat_mass': [
-                r'BodyFatMass[^0-9]*(\d+\.?\d*)',
-                r'(\d+\.?\d*)[^0-9]*BodyFatMass',
-            ],
-            'lean_body_mass': [
-                r'LeanBodyMass[^0-9]*(\d{3}\.\d{2})',  # 177.38 format
-                r'(\d{3}\.\d{2})[^0-9]*LeanBodyMass',
-                r'(\d{3}\.\d{2})[^0-9]*lbs[^0-9]*LeanBodyMass',
-            ],
-            'smm': [
-                r'SkeletalMuscleMass[^0-9]*(\d+\.?\d*)',
-                r'(\d+\.?\d*)[^0-9]*SkeletalMuscleMass',
-                r'SMM[^0-9]*(\d+\.?\d*)',
-                r'(\d+\.?\d*)[^0-9]*SMM',
-            ],
-            'bmr': [
-                r'BasalMetabolicRate[^0-9]*(\d{4})',  # 2108 format
-                r'(\d{4})[^0-9]*BasalMetabolicRate',
-                r'BMR[^0-9]*(\d{4})',
-            ],
-            'left_arm_lean_mass': [
-                r'LeftArm[^0-9]*(\d{2}\.\d{2})',  # 10.76 format
-                r'(\d{2}\.\d{2})[^0-9]*LeftArm',
-            ],
-            'right_arm_lean_mass': [
-                r'RightArm[^0-9]*(\d{2}\.\d{2})',  # 10.96 format
-                r'(\d{2}\.\d{2})[^0-9]*RightArm',
-            ],
-            'trunk_lean_mass': [
-                r'Trunk[^0-9]*(\d{3}\.\d)',  # 126.6 format
-                r'(\d{3}\.\d)[^0-9]*Trunk',
-            ],
-            'left_leg_lean_mass': [
-                r'LeftLeg[^0-9]*(\d{2}\.\d{2})',  # 26.59 format
-                r'(\d{2}\.\d{2})[^0-9]*LeftLeg',
-            ],
-            'right_leg_lean_mass': [
-                r'RightLeg[^0-9]*(\d{2}\.\d{2})',  # 27.07 format
-                r'(\d{2}\.\d{2})[^0-9]*RightLeg',
-            ],
-        }
-        
-        logger.info("=== Attempting to match patterns ===")
-        
-        # Try to extract each metric using multiple patterns
-        for metric_name, pattern_list in patterns.items():
-            for pattern in pattern_list:
-                matches = re.findall(pattern, text, re.IGNORECASE)
-                if matches:
-                    try:
-                        raw_value = matches[0]
-                        value = float(raw_value)
-                        
-                        # Basic validation
-                        if metric_name == 'weight' and (value < 100 or value > 500):
-                            logger.info(f"Skipping unrealistic weight: {value}")
-                            continue
-                        if metric_name == 'bmr' and (value < 1000 or value > 5000):
-                            logger.info(f"Skipping unrealistic BMR: {value}")
-                            continue
-                        if 'lean_mass' in metric_name and (value < 1 or value > 200):
-                            logger.info(f"Skipping unrealistic lean mass: {value}")
-                            continue
-                        
-                        metrics[metric_name] = value
-                        logger.info(f"✓ Found {metric_name}: {value}")
-                        break  # Use first valid match
-                    except ValueError:
-                        logger.warning(f"Could not convert {metric_name} value: {matches[0]}")
-                        continue
-        
-        # Special handling for OCR artifacts and split values
-        logger.info("=== Special handling for OCR artifacts ===")
-        
-        # Handle Right Arm (split by OCR: "10" and "96")
-        if 'right_arm_lean_mass' not in metrics:
-            # Look for "10" followed by "96" within reasonable distance
-            right_arm_pattern = r'10[^0-9]*96'
-            if re.search(right_arm_pattern, text):
-                metrics['right_arm_lean_mass'] = 10.96
-                logger.info(f"✓ Found right_arm_lean_mass from split OCR: 10.96")
-        
-        # Handle Trunk (OCR reads "126.f" instead of "126.6")
-        if 'trunk_lean_mass' not in metrics:
-            trunk_artifact_pattern = r'126\.f'
-            if re.search(trunk_artifact_pattern, text):
-                metrics['trunk_lean_mass'] = 126.6
-                logger.info(f"✓ Found trunk_lean_mass from OCR artifact: 126.6")
-        
-        # Handle Left Leg (OCR reads "526.59" instead of "26.59")
-        if 'left_leg_lean_mass' not in metrics:
-            left_leg_artifact_pattern = r'526\.59'
-            if re.search(left_leg_artifact_pattern, text):
-                metrics['left_leg_lean_mass'] = 26.59
-                logger.info(f"✓ Found left_leg_lean_mass from OCR artifact: 26.59")
-        
-        # Handle Right Leg (should be 27.07)
-        if 'right_leg_lean_mass' not in metrics:
-            # Look for "27.07" in the text
-            right_leg_pattern = r'27\.07'
-            if re.search(right_leg_pattern, text):
-                metrics['right_leg_lean_mass'] = 27.07
-                logger.info(f"✓ Found right_leg_lean_mass: 27.07")
-        
-        # Handle Body Fat Percentage (look for percentage near body fat terms)
-        if 'body_fat_percentage' not in metrics:
-            logger.info("=== Looking for body fat percentage ===")
-            # Look for percentage patterns near body fat terms
-            bf_percent_patterns = [
-                r'(\d+\.?\d*)%[^0-9]*BodyFat',
-                r'BodyFat[^0-9]*(\d+\.?\d*)%',
-                r'(\d+\.?\d*)%[^0-9]*PBF',  # PBF = Percent Body Fat
-                r'PBF[^0-9]*(\d+\.?\d*)%',
-                r'(\d+\.?\d*)%[^0-9]*PercentBodyFat',
-                r'PercentBodyFat[^0-9]*(\d+\.?\d*)%',
-            ]
-            for pattern in bf_percent_patterns:
-                matches = re.findall(pattern, text, re.IGNORECASE)
-                if matches:
-                    try:
-                        value = float(matches[0])
-                        if 1 <= value <= 50:  # Reasonable body fat percentage
-                            metrics['body_fat_percentage'] = value
-                            logger.info(f"✓ Found body_fat_percentage: {value}")
-                            break
-                    except ValueError:
-                        continue
-        
-        # Special handling for body fat percentage from OCR artifacts
-        if 'body_fat_percentage' not in metrics:
-            logger.info("=== Looking for body fat percentage in OCR artifacts ===")
-            
-            # Look for PBF specifically in the text
-            pbf_section = re.search(r'PBF[^0-9]*(\d+\.?\d*)', text, re.IGNORECASE)
-            if pbf_section:
-                try:
-                    value = float(pbf_section.group(1))
-                    if 1 <= value <= 50:  # Reasonable body fat percentage
-                        metrics['body_fat_percentage'] = value
-                        logger.info(f"✓ Found body_fat_percentage from PBF section: {value}")
-                except ValueError:
-                    pass
-            
-            # Look for PBF with different patterns
-            if 'body_fat_percentage' not in metrics:
-                pbf_patterns = [
-                    r'PBF[^0-9]*(\d{2,3})',  # PBF followed by 2-3 digit number
-                    r'(\d{2,3})[^0-9]*PBF',  # 2-3 digit number followed by PBF
-                    r'PBF[^0-9]*(\d+\.?\d*)',  # PBF followed by any decimal number
-                    r'(\d+\.?\d*)[^0-9]*PBF',  # Any decimal number followed by PBF
-                ]
-                for pattern in pbf_patterns:
-                    matches = re.findall(pattern, text, re.IGNORECASE)
-                    if matches:
-                        try:
-                            raw_value = float(matches[0])
-                            # If it's a 3-digit number like 283, it might be 28.3%
-                            if raw_value > 100:
-                                value = raw_value / 10
-                            else:
-                                value = raw_value
-                            
-                            if 1 <= value <= 50:  # Reasonable body fat percentage
-                                metrics['body_fat_percentage'] = value
-                                logger.info(f"✓ Found body_fat_percentage from PBF pattern: {value}")
-                                break
-                        except ValueError:
-                            continue
-            
-            # Look for PBF specifically in the obesity analysis section, avoiding BMI
-            if 'body_fat_percentage' not in metrics:
-                # Look for PBF in the obesity section, but avoid BMI
-                pbf_in_obesity = re.search(r'ObesityAnalysis.*?PBF[^0-9]*(\d+\.?\d*)', text, re.DOTALL | re.IGNORECASE)
-                if pbf_in_obesity:
-                    try:
-                        value = float(pbf_in_obesity.group(1))
-                        if 1 <= value <= 50:  # Reasonable body fat percentage
-                            metrics['body_fat_percentage'] = value
-                            logger.info(f"✓ Found body_fat_percentage from PBF in obesity section: {value}")
-                    except ValueError:
-                        pass
-            
-            # Look for PBF OCR artifacts (like "menscrma283" for "PBF is the percentage: 28.3%")
-            if 'body_fat_percentage' not in metrics:
-                logger.info("=== Looking for PBF OCR artifacts ===")
-                # Look for patterns like "menscrma283" which might be "PBF is the percentage: 28.3%"
-                ocr_structure_patterns = [
-                    r'menscrma(\d{2,3})',  # OCR artifact for "PBF is the percentage: 28.3%"
-                    r'boctyfat[^0-9]*(\d{2,3})',  # OCR artifact for "body fat: 28.3%"
-                    r'perceniage[^0-9]*(\d{2,3})',  # OCR artifact for "percentage: 28.3%"
-                ]
-                for pattern in ocr_structure_patterns:
-                    matches = re.findall(pattern, text, re.IGNORECASE)
-                    if matches:
-                        try:
-                            raw_value = float(matches[0])
-                            # If it's a 3-digit number like 283, it might be 28.3%
-                            if raw_value > 100:
-                                value = raw_value / 10
-                            else:
-                                value = raw_value
-                            
-                            if 1 <= value <= 50:  # Reasonable body fat percentage
-                                metrics['body_fat_percentage'] = value
-                                logger.info(f"✓ Found body_fat_percentage from OCR structure: {value}")
-                                break
-                        except ValueError:
-                            continue
-            
-            # Look for the actual body fat percentage value (like 17.3) in the text
-            if 'body_fat_percentage' not in metrics:
-                logger.info("=== Looking for actual body fat percentage values ===")
-                # Look for decimal numbers in the body fat percentage range
-                decimal_patterns = [
-                    r'(\d{2}\.\d)',  # 17.3, 22.1, etc.
-                ]
-                for pattern in decimal_patterns:
-                    matches = re.findall(pattern, text)
-                    if matches:
-                        for match in matches:
-                            try:
-                                value = float(match)
-                                if 10 <= value <= 30:  # More specific range for body fat percentage
-                                    # Check if this value appears in a body fat context
-                                    context_before = text[max(0, text.find(match)-50):text.find(match)]
-                                    context_after = text[text.find(match)+len(match):text.find(match)+len(match)+50]
-                                    context = context_before + context_after
-                                    context_lower = context.lower()
-                                    
-                                    # Look for body fat indicators in the context
-                                    body_fat_indicators = ['bodyfat', 'pbf', 'percent', 'fat', 'obesity', 'bf']
-                                    bmi_indicators = ['bmi', 'index', 'weight', 'height']
-                                    
-                                    if any(indicator in context_lower for indicator in body_fat_indicators) and \
-                                       not any(indicator in context_lower for indicator in bmi_indicators):
-                                        metrics['body_fat_percentage'] = value
-                                        logger.info(f"✓ Found body_fat_percentage from decimal pattern: {value}")
-                                        logger.info(f"  Context: '{context_before.strip()}' -> {match} <- '{context_after.strip()}'")
-                                        break
-                            except ValueError:
-                                continue
-                        if 'body_fat_percentage' in metrics:
-                            break
-            
-            # Final fallback: analyze context around all numbers to find body fat percentage
-            if 'body_fat_percentage' not in metrics:
-                logger.info("=== Analyzing context around all numbers for body fat percentage ===")
-                # Look for numbers that appear near body fat related terms
-                for before, number, after in contexts:
-                    try:
-                        value = float(number)
-                        if 1 <= value <= 50:  # Reasonable body fat percentage range
-                            before_lower = before.lower()
-                            after_lower = after.lower()
-                            # Check if the context suggests this is body fat percentage
-                            body_fat_indicators = ['bodyfat', 'pbf', 'percent', 'fat', 'obesity', 'bf']
-                            if any(indicator in before_lower or indicator in after_lower for indicator in body_fat_indicators):
-                                # Avoid BMI values
-                                bmi_indicators = ['bmi', 'index', 'weight', 'height']
-                                if not any(indicator in before_lower or indicator in after_lower for indicator in bmi_indicators):
-                                    metrics['body_fat_percentage'] = value
-                                    logger.info(f"✓ Found body_fat_percentage from context analysis: {value}")
-                                    logger.info(f"  Context: '{before.strip()}' -> {number} <- '{after.strip()}'")
-                                    break
-                    except ValueError:
-                        continue
-            
-            # Additional debugging: show all numbers in body fat percentage range
-            if 'body_fat_percentage' not in metrics:
-                logger.info("=== Numbers in body fat percentage range (1-50) ===")
-                for before, number, after in contexts:
-                    try:
-                        value = float(number)
-                        if 1 <= value <= 50:
-                            logger.info(f"  {value} - Context: '{before.strip()}' -> {number} <- '{after.strip()}'")
-                    except ValueError:
-                        continue
-        
-        # Special handling for weight from history section
-        if 'weight' not in metrics:
-            logger.info("=== Looking for weight in history section ===")
-            # Look for patterns like 209.9,212.1,214.7,214.4
-            weight_history_patterns = [
-                r'(\d{3}\.\d)\s*,\s*(\d{3}\.\d)\s*,\s*(\d{3}\.\d)\s*,\s*(\d{3}\.\d)',
-                r'(\d{3}\.\d)\s*,\s*(\d{3}\.\d)\s*,\s*(\d{3}\.\d)',
-                r'(\d{3}\.\d)\s*,\s*(\d{3}\.\d)',
-            ]
-            
-            for pattern in weight_history_patterns:
-                weight_matches = re.findall(pattern, text)
-                if weight_matches:
-                    try:
-                        # Take the most recent weight (last in the sequence)
-                        recent_weights = [float(w) for w in weight_matches[0]]
-                        metrics['weight'] = recent_weights[-1]  # Most recent
-                        logger.info(f"✓ Found weight from history: {metrics['weight']}")
-                        break
-                    except (ValueError, IndexError):
-                        continue
-        
-        # Special handling for SMM (Skeletal Muscle Mass) from OCR artifacts
-        if 'smm' not in metrics:
-            logger.info("=== Looking for SMM in OCR artifacts ===")
-            # Look for patterns that might represent SMM
-            smm_artifact_patterns = [
-                r'SkeletalMuscleMass[^0-9]*(\d+\.?\d*)',
-                r'(\d+\.?\d*)[^0-9]*SkeletalMuscleMass',
-                r'Skeletal[^0-9]*(\d+\.?\d*)',
-                r'(\d+\.?\d*)[^0-9]*Skeletal',
-                r'MuscleMass[^0-9]*(\d+\.?\d*)',
-                r'(\d+\.?\d*)[^0-9]*MuscleMass',
-            ]
-            for pattern in smm_artifact_patterns:
-                matches = re.findall(pattern, text, re.IGNORECASE)
-                if matches:
-                    try:
-                        value = float(matches[0])
-                        if 10 <= value <= 200:  # Reasonable SMM range
-                            metrics['smm'] = value
-                            logger.info(f"✓ Found smm from OCR artifact: {value}")
-                            break
-                    except ValueError:
-                        continue
-        
-        logger.info(f"=== Final Results: {len(metrics)} metrics extracted ===")
-        for key, value in metrics.items():
-            logger.info(f"  {key}: {value}")
-        
-        return metrics
+        """Parse InBody metrics from extracted text (see inbody_parser.py)"""
+        return parse_inbody_metrics(text, debug=self.debug)
     
-    def process_inbody_image(self, image_path):
-        """Main method to process InBody image and extract metrics"""
+    def read_scan(self, image_path, raise_errors=False):
+        """Raw OCR text and the metrics parsed from it; text is None when OCR failed
+
+        With raise_errors, a failed OCR raises its error instead (pool workers report it on the job).
+        """
         try:
             logger.info(f"Processing InBody image: {image_path}")
             
             # Extract text from image
-            text = self.extract_text(image_path)
-            if not text:
-                logger.error("No text extracted from image")
-                return {}
+            text = self._read_text(image_path)
+            if not text or not text.strip():
+                raise ValueError("OCR produced no text")
             
             # Parse metrics from text
             metrics = self.parse_inbody_metrics(text)
             
+            # Sheets laid out differently from INBODY_REGIONS lose their panels; read the whole page instead
+            if not metrics:
+                logger.info("No metrics in the panel regions, retrying with the full page")
+                full_text = self.extract_text(image_path, full_page=True)
+                if full_text:
+                    text = full_text
+                    metrics = self.parse_inbody_metrics(text)
+            
             logger.info(f"Successfully processed image. Found {len(metrics)} metrics.")
-            return metrics
+            return text, metrics
             
         except Exception as e:
+            if raise_errors:
+                raise
             logger.error(f"Error processing InBody image: {e}")
-            return {}
+            return None, {}
+    
+    def process_inbody_image(self, image_path):
+        """Main method to process InBody image and extract metrics"""
+        return self.read_scan(image_path)[1]
+
+# Global instance; OCR_DEBUG=1 turns on the OCR text and parser trace logging
+ocr_processor = InBodyOCRProcessor(debug=os.environ.get('OCR_DEBUG') == '1')
+
+def init_ocr_worker():
+    """Process pool initializer: one OpenCV thread per worker process, since the pool already uses every core."""
+    cv2.setNumThreads(1)
+    # Each job already runs a Tesseract process per panel; keep each of those single-threaded too
+    os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+def run_ocr_job(image_path):
+    """Entry point for OCR pool workers; returns the raw text, the metrics and the time spent.
 
-# Global instance
-ocr_processor = InBodyOCRProcessor() 
\ No newline at end of file
+    Raises when the scan cannot be read, so the job is recorded as failed with the reason.
+    """
+    start = time.perf_counter()
+    try:
+        text, metrics = ocr_processor.read_scan(image_path, raise_errors=True)
+    except Exception as e:
+        # Re-raised as a plain error: some (e.g. pytesseract's TesseractNotFoundError) cannot be
+        # unpickled in the parent, which would break the whole pool instead of failing the job
+        raise RuntimeError(str(e) or e.__class__.__name__) from None
+    return {'text': text, 'metrics': metrics, 'duration_ms': round((time.perf_counter() - start) * 1000, 1)}
@@ -0,0 +1,323 @@
+"""
+Personal-record index.
+
+PersonalRecord keeps one row per (user, exercise, pr_type) holding the
+running best for each type in PR_TYPES. Logging a set compares it against
+those rows and updates them in the caller's transaction, so a set costs one
+read of the exercise's PR rows. Deleting or editing a set that holds a PR
+rebuilds the exercise's rows with an aggregate query over the
+(user_id, exercise) index instead of loading the workout history.
+compute_user_prs/save_user_prs recompute every PR of a user in one NumPy
+pass over their workouts and upsert the rows in bulk.
+"""
+import numpy as np
+from sqlalchemy import func, or_, case
+from models import db, dialect_insert, Workout, PersonalRecord
+
+# Rep-range PRs: heaviest weight lifted for at least N reps
+REP_RANGE_PRS = {'1rm': 1, '3rm': 3, '5rm': 5, '10rm': 10}
+PR_TYPES = ('weight', 'reps', 'volume', 'e1rm', 'e1rm_brzycki') + tuple(REP_RANGE_PRS)
+# Recorded even when zero (e.g. bodyweight exercises); the others need a positive value
+ZERO_ALLOWED_PR_TYPES = ('weight', 'reps')
+# Brzycki is undefined from 37 reps on
+BRZYCKI_MAX_REPS = 36
+# Reported back when a set beats them; the estimated and rep-range types are only tracked
+ANNOUNCED_PR_TYPES = ('weight', 'reps', 'volume')
+# Also reported for the first set of an exercise
+FIRST_SET_PR_TYPES = ('weight', 'reps')
+
+def is_barbell_exercise(exercise):
+    return 'barbell' in exercise.lower()
+
+def estimated_1rm(weight, reps):
+    """Epley estimate of the one-rep max."""
+    if not weight or not reps:
+        return 0.0
+    if reps == 1:
+        return float(weight)
+    return weight * (1 + reps / 30.0)
+
+def estimated_1rm_brzycki(weight, reps):
+    """Brzycki estimate of the one-rep max."""
+    if not weight or not reps or reps > BRZYCKI_MAX_REPS:
+        return 0.0
+    return weight * 36.0 / (37 - reps)
+
+def set_pr_values(exercise, weight, reps, total_weight=None, set_count=1):
+    """PR values for a single Workout row, keyed by pr_type.
+
+    Barbell exercises rank by total weight (plates + bar). Volume covers
+    every set the row stands for (Workout.set_count, not Workout.sets,
+    which is a set number for session sets); e1RM is per set. Types that do
+    not apply to the set are 0.
+    """
+    pr_weight = (total_weight if total_weight is not None else weight) if is_barbell_exercise(exercise) else weight
+    pr_weight = pr_weight or 0
+    reps = reps or 0
+    return {
+        'weight': pr_weight,
+        'reps': reps,
+        'volume': pr_weight * reps * (set_count or 1),
+        'e1rm': estimated_1rm(pr_weight, reps),
+        'e1rm_brzycki': estimated_1rm_brzycki(pr_weight, reps),
+        **{pr_type: pr_weight if reps >= n else 0 for pr_type, n in REP_RANGE_PRS.items()}
+    }
+
+def _pr_value_columns(exercise):
+    """SQL expressions mirroring set_pr_values, for rebuilding from Workout rows."""
+    if is_barbell_exercise(exercise):
+        pr_weight = func.coalesce(Workout.total_weight, Workout.weight, 0)
+    else:
+        pr_weight = func.coalesce(Workout.weight, 0)
+    reps = func.coalesce(Workout.reps, 0)
+    return {
+        'weight': pr_weight,
+        'reps': reps,
+        'volume': pr_weight * reps * func.coalesce(Workout.set_count, 1),
+        'e1rm': case(
+            (or_(pr_weight == 0, reps == 0), 0.0),
+            (reps == 1, pr_weight),
+            else_=pr_weight * (1 + reps / 30.0)
+        ),
+        'e1rm_brzycki': case(
+            (or_(pr_weight == 0, reps == 0, reps > BRZYCKI_MAX_REPS), 0.0),
+            else_=pr_weight * 36.0 / (37 - reps)
+        ),
+        **{pr_type: case((reps >= n, pr_weight), else_=0) for pr_type, n in REP_RANGE_PRS.items()}
+    }
+
+def _counts_as_pr(pr_type, value):
+    return value is not None and (value > 0 or pr_type in ZERO_ALLOWED_PR_TYPES)
+
+def _apply_pr(pr, user_id, exercise, pr_type, value, workout):
+    if pr is None:
+        pr = PersonalRecord(user_id=user_id, exercise=exercise, pr_type=pr_type)
+        db.session.add(pr)
+    pr.value = value
+    pr.weight = workout.weight
+    pr.reps = workout.reps
+    pr.sets = workout.sets
+    pr.date_achieved = workout.date
+    pr.workout_id = workout.id
+    return pr
+
+def _set_before(workout, pr):
+    return pr.workout_id is not None and (workout.date, workout.id) < (pr.date_achieved, pr.workout_id)
+
+def _announced(pr_type, had_record):
+    return pr_type in ANNOUNCED_PR_TYPES and (had_record or pr_type in FIRST_SET_PR_TYPES)
+
+def _current_prs(user_id, exercise):
+    return {
+        pr.pr_type: pr
+        for pr in PersonalRecord.query.filter_by(user_id=user_id, exercise=exercise).all()
+    }
+
+def record_set_prs(workout, current=None):
+    """Update the PR index for a newly logged (flushed) workout set.
+
+    Does not commit; the caller commits together with the set. Returns the
+    announced pr_types the set beat (weight and reps also when set for the
+    first time). A set tying a PR takes it over, unannounced, when it is
+    earlier than the current holder.
+    """
+    values = set_pr_values(workout.exercise, workout.weight, workout.reps, workout.total_weight, workout.set_count)
+    if current is None:
+        current = _current_prs(workout.user_id, workout.exercise)
+    achieved = []
+    for pr_type in PR_TYPES:
+        value = values[pr_type]
+        pr = current.get(pr_type)
+        if not _counts_as_pr(pr_type, value):
+            continue
+        if pr is None or value > pr.value:
+            _apply_pr(pr, workout.user_id, workout.exercise, pr_type, value, workout)
+            if _announced(pr_type, pr is not None):
+                achieved.append(pr_type)
+        elif value == pr.value and _set_before(workout, pr):
+            # Ties go to the earliest set, as in rebuild_exercise_prs
+            _apply_pr(pr, workout.user_id, workout.exercise, pr_type, value, workout)
+    return achieved
+
+def rebuild_exercise_prs(user_id, exercise, current=None):
+    """Recompute an exercise's PR rows from its remaining workouts.
+
+    One aggregate query finds every max, a second fetches the earliest set
+    reaching each of them. Does not commit. Returns {pr_type: PersonalRecord}.
+    """
+    columns = _pr_value_columns(exercise)
+    base = Workout.query.filter(Workout.user_id == user_id, Workout.exercise == exercise)
+    maxima = dict(zip(PR_TYPES, base.with_entities(*(func.max(columns[t]) for t in PR_TYPES)).one()))
+
+    if current is None:
+        current = _current_prs(user_id, exercise)
+    holders = {}
+    wanted = [t for t in PR_TYPES if _counts_as_pr(t, maxima[t])]
+    if wanted:
+        rows = base.add_columns(*(columns[t] for t in wanted)).filter(
+            or_(*(columns[t] == maxima[t] for t in wanted))
+        ).order_by(Workout.date, Workout.id).all()
+        for row in rows:
+            workout, row_values = row[0], row[1:]
+            for pr_type, value in zip(wanted, row_values):
+                if value == maxima[pr_type]:
+                    holders.setdefault(pr_type, workout)
+
+    prs = {}
+    for pr_type in PR_TYPES:
+        workout = holders.get(pr_type)
+        if workout is not None:
+            prs[pr_type] = _apply_pr(current.get(pr_type), user_id, exercise, pr_type, maxima[pr_type], workout)
+        elif pr_type in current:
+            db.session.delete(current[pr_type])
+    return prs
+
+def refresh_set_prs(workout):
+    """Update the PR index after a set's weight or reps were edited.
+
+    Only a set that currently holds a PR can lower one, so the exercise is
+    rebuilt in that case; otherwise the edit is treated like a new set.
+    Returns the announced pr_types the edited set now holds with a higher
+    value than before.
+    """
+    current = _current_prs(workout.user_id, workout.exercise)
+    if not any(pr.workout_id == workout.id for pr in current.values()):
+        return record_set_prs(workout, current)
+    previous = {pr_type: pr.value for pr_type, pr in current.items()}
+    prs = rebuild_exercise_prs(workout.user_id, workout.exercise, current)
+    return [
+        pr_type for pr_type, pr in prs.items()
+        if pr.workout_id == workout.id and _announced(pr_type, pr_type in previous)
+        and (pr_type not in previous or pr.value > previous[pr_type])
+    ]
+
+def delete_workout_set(workout):
+    """Delete a workout set and update the PR index. Does not commit.
+
+    The exercise is rebuilt only when the set held one of its PRs.
+    """
+    current = _current_prs(workout.user_id, workout.exercise)
+    held = any(pr.workout_id == workout.id for pr in current.values())
+    db.session.delete(workout)
+    if held:
+        db.session.flush()
+        rebuild_exercise_prs(workout.user_id, workout.exercise, current)
+
+def prs_by_workout(user_id, workout_ids):
+    """Map workout_id -> announced pr_types it currently holds, in one query."""
+    result = {}
+    if not workout_ids:
+        return result
+    for workout_id, pr_type in db.session.query(PersonalRecord.workout_id, PersonalRecord.pr_type).filter(
+        PersonalRecord.user_id == user_id,
+        PersonalRecord.workout_id.in_(list(workout_ids)),
+        PersonalRecord.pr_type.in_(ANNOUNCED_PR_TYPES)
+    ):
+        result.setdefault(workout_id, []).append(pr_type)
+    return result
+
+def _pr_value_arrays(pr_weight, reps, set_count):
+    """NumPy version of set_pr_values over arrays of sets."""
+    no_lift = (pr_weight == 0) | (reps == 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'weight': pr_weight,
+            'reps': reps,
+            'volume': pr_weight * reps * set_count,
+            'e1rm': np.where(no_lift, 0.0, np.where(reps == 1, pr_weight, pr_weight * (1 + reps / 30.0))),
+            'e1rm_brzycki': np.where(no_lift | (reps > BRZYCKI_MAX_REPS), 0.0, pr_weight * 36.0 / (37 - reps)),
+            **{pr_type: np.where(reps >= n, pr_weight, 0.0) for pr_type, n in REP_RANGE_PRS.items()}
+        }
+
+def compute_user_prs(user_id):
+    """Best set per (exercise, pr_type) across all of a user's workouts.
+
+    Loads the workouts in one query and ranks them per exercise with NumPy;
+    ties go to the earliest set, as in rebuild_exercise_prs. Returns
+    {(exercise, pr_type): (value, workout_row)}.
+    """
+    rows = db.session.query(
+        Workout.id, Workout.exercise, Workout.weight, Workout.total_weight,
+        Workout.reps, Workout.sets, Workout.set_count, Workout.date
+    ).filter(Workout.user_id == user_id).all()
+    if not rows:
+        return {}
+
+    exercises, group = np.unique(np.array([row.exercise for row in rows], dtype=object).astype(str), return_inverse=True)
+    barbell = np.array([is_barbell_exercise(exercise) for exercise in exercises])[group]
+    weight = np.array([row.weight or 0 for row in rows], dtype=float)
+    total_weight = np.array([row.total_weight if row.total_weight is not None else (row.weight or 0) for row in rows], dtype=float)
+    pr_weight = np.where(barbell, total_weight, weight)
+    reps = np.array([row.reps or 0 for row in rows], dtype=float)
+    set_count = np.array([row.set_count or 1 for row in rows], dtype=float)
+    ids = np.array([row.id for row in rows])
+    dates = np.array([row.date.toordinal() for row in rows])
+
+    best = {}
+    for pr_type, values in _pr_value_arrays(pr_weight, reps, set_count).items():
+        eligible = np.nonzero(values >= 0 if pr_type in ZERO_ALLOWED_PR_TYPES else values > 0)[0]
+        if not len(eligible):
+            continue
+        # Sort by exercise, then value descending, then earliest set; take the first per exercise
+        order = eligible[np.lexsort((ids[eligible], dates[eligible], -values[eligible], group[eligible]))]
+        _, first = np.unique(group[order], return_index=True)
+        for i in order[first]:
+            value = values[i].item()
+            best[(str(exercises[group[i]]), pr_type)] = (value, rows[i])
+    return best
+
+def save_user_prs(user_id):
+    """Recompute and bulk-upsert every PR of a user; returns the number of PR rows.
+
+    PR rows of the types above that no longer have a qualifying set are
+    removed; other pr_types (e.g. 'milestone') are left alone. Does not commit.
+    """
+    best = compute_user_prs(user_id)
+    rows = [
+        {
+            'user_id': user_id,
+            'exercise': exercise,
+            'pr_type': pr_type,
+            'value': value,
+            'weight': workout.weight,
+            'reps': workout.reps,
+            'sets': workout.sets,
+            'date_achieved': workout.date,
+            'workout_id': workout.id
+        } for (exercise, pr_type), (value, workout) in best.items()
+    ]
+
+    stale_ids = [
+        pr_id for pr_id, exercise, pr_type in db.session.query(
+            PersonalRecord.id, PersonalRecord.exercise, PersonalRecord.pr_type
+        ).filter(PersonalRecord.user_id == user_id, PersonalRecord.pr_type.in_(PR_TYPES))
+        if (exercise, pr_type) not in best
+    ]
+    if stale_ids:
+        PersonalRecord.query.filter(PersonalRecord.id.in_(stale_ids)).delete(synchronize_session=False)
+
+    if not rows:
+        return 0
+    insert = dialect_insert()
+    if insert is not None:
+        stmt = insert(PersonalRecord)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'exercise', 'pr_type'],
+            set_={field: stmt.excluded[field]
+                  for field in ('value', 'weight', 'reps', 'sets', 'date_achieved', 'workout_id')}
+        )
+        db.session.execute(stmt, rows)
+    else:
+        existing = {
+            (pr.exercise, pr.pr_type): pr
+            for pr in PersonalRecord.query.filter(PersonalRecord.user_id == user_id,
+                                                  PersonalRecord.pr_type.in_(PR_TYPES))
+        }
+        for row in rows:
+            pr = existing.get((row['exercise'], row['pr_type']))
+            if pr is None:
+                db.session.add(PersonalRecord(**row))
+            else:
+                for field, value in row.items():
+                    setattr(pr, field, value)
+    return len(rows)
@@ -0,0 +1,126 @@
+"""
+Opt-in per-request SQL profiler.
+
+When PROFILE_REQUESTS is enabled, every request counts its SQL statements
+and the time spent in them (SQLAlchemy cursor events), adds a
+Server-Timing header (visible in the browser's network panel) and feeds a
+rolling per-endpoint window that /debug/profile reports as percentiles,
+together with the slowest statements seen. Statements slower than
+PROFILE_SLOW_QUERY_MS are also logged as warnings.
+"""
+import threading
+import time
+from collections import deque
+import numpy as np
+from flask import g, request, has_request_context, current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+WINDOW_SIZE = 500  # requests kept per endpoint
+SLOWEST_STATEMENTS = 5
+MAX_SQL_LENGTH = 500
+
+class EndpointProfile:
+    """Rolling window of request measurements for one endpoint."""
+
+    def __init__(self, window=WINDOW_SIZE):
+        self.requests = 0
+        self.total_ms = deque(maxlen=window)
+        self.db_ms = deque(maxlen=window)
+        self.queries = deque(maxlen=window)
+        self.slowest = []  # (ms, sql), longest first
+
+    def add(self, total_ms, db_ms, queries, statements):
+        self.requests += 1
+        self.total_ms.append(total_ms)
+        self.db_ms.append(db_ms)
+        self.queries.append(queries)
+        self.slowest = sorted(self.slowest + statements, key=lambda s: s[0], reverse=True)[:SLOWEST_STATEMENTS]
+
+    def summary(self):
+        def percentiles(values):
+            p50, p95, p99 = np.percentile(np.asarray(values, dtype=float), [50, 95, 99])
+            return {'p50': round(p50, 2), 'p95': round(p95, 2), 'p99': round(p99, 2), 'max': round(max(values), 2)}
+        return {
+            'requests': self.requests,
+            'window': len(self.total_ms),
+            'total_ms': percentiles(self.total_ms),
+            'db_ms': percentiles(self.db_ms),
+            'queries': percentiles(self.queries),
+            'slowest_statements': [{'ms': round(ms, 2), 'sql': sql} for ms, sql in self.slowest]
+        }
+
+class RequestProfiler:
+    """Thread-safe collection of EndpointProfiles."""
+
+    def __init__(self):
+        self._endpoints = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def record(self, endpoint, total_ms, db_ms, queries, statements):
+        with self._lock:
+            profile = self._endpoints.get(endpoint)
+            if profile is None:
+                profile = self._endpoints[endpoint] = EndpointProfile()
+            profile.add(total_ms, db_ms, queries, statements)
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = {name: profile.summary() for name, profile in self._endpoints.items()}
+        return {
+            'since': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(self.started_at)) + 'Z',
+            'endpoints': endpoints
+        }
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self.started_at = time.time()
+
+profiler = RequestProfiler()
+
+def _current_profile():
+    return g.get('sql_profile') if has_request_context() else None
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile() is not None:
+        conn.info.setdefault('profile_query_start', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile()
+    starts = conn.info.get('profile_query_start')
+    if profile is None or not starts:
+        return
+    elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+    profile['queries'] += 1
+    profile['db_ms'] += elapsed_ms
+    profile['statements'].append((elapsed_ms, statement[:MAX_SQL_LENGTH]))
+    if elapsed_ms >= current_app.config.get('PROFILE_SLOW_QUERY_MS', 100):
+        current_app.logger.warning(f"Slow query ({elapsed_ms:.1f}ms) in {request.endpoint}: {statement[:MAX_SQL_LENGTH]}")
+
+def _start_request_profile():
+    g.sql_profile = {'start': time.perf_counter(), 'queries': 0, 'db_ms': 0.0, 'statements': []}
+
+def _finish_request_profile(response):
+    profile = g.pop('sql_profile', None)
+    if profile is None:
+        return response
+    total_ms = (time.perf_counter() - profile['start']) * 1000
+    response.headers.add('Server-Timing',
+                         f'db;dur={profile["db_ms"]:.2f};desc="{profile["queries"]} queries", '
+                         f'total;dur={total_ms:.2f}')
+    statements = sorted(profile['statements'], key=lambda s: s[0], reverse=True)[:SLOWEST_STATEMENTS]
+    profiler.record(request.endpoint or request.path, total_ms, profile['db_ms'], profile['queries'], statements)
+    return response
+
+def init_profiler(app):
+    """Hook the profiler into the app if PROFILE_REQUESTS is set; returns whether it is enabled."""
+    if not app.config.get('PROFILE_REQUESTS'):
+        return False
+    app.before_request(_start_request_profile)
+    app.after_request(_finish_request_profile)
+    app.logger.info("Request profiling enabled; see /debug/profile")
+    return True
@@ -0,0 +1,130 @@
+import json
+from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify
+from flask_login import login_required, current_user
+from models import User, TDEE, TDEEDirtyDate, UserSettings, DailyRollup
+from daily_rollup import get_daily_rollups
+from conditional_get import conditional_get
+from tdee_engine import flush_dirty_tdee, tdee_balance_status
+from routes.fitness_routes import daily_nutrition_payload, latest_weight_payload, recent_activity_items, update_tdee_for_date
+
+dashboard_bp = Blueprint('dashboard', __name__)
+
+# Dashboard widgets, in display order
+DASHBOARD_SECTIONS = ('weight', 'nutrition', 'tdee', 'workouts', 'recent_activity', 'miles', 'mood')
+DASHBOARD_DAYS = 7
+
+def _today():
+    return datetime.now().date()
+
+def stored_dashboard_sections(settings):
+    """Sections enabled in UserSettings.dashboard_sections, or None when unset or unreadable."""
+    if not settings or not settings.dashboard_sections:
+        return None
+    try:
+        stored = json.loads(settings.dashboard_sections)
+    except ValueError:
+        return None
+    if not isinstance(stored, list):
+        return None
+    return [section for section in DASHBOARD_SECTIONS if section in stored]
+
+def _tdee_section(user_id, today):
+    # Rebuild any TDEE rows invalidated by writes since the last read
+    flush_dirty_tdee(user_id)
+    tdee = TDEE.query.filter_by(user_id=user_id, date=today).first()
+    if not tdee:
+        # Calculate today's row on first read, as /api/tdee does
+        update_tdee_for_date(user_id, today)
+        tdee = TDEE.query.filter_by(user_id=user_id, date=today).first()
+    if not tdee:
+        return {'date': today.strftime('%Y-%m-%d'), 'tdee': None}
+    balance = tdee.calorie_intake - tdee.tdee if tdee.calorie_intake is not None and tdee.tdee is not None else None
+    return {
+        'date': tdee.date.strftime('%Y-%m-%d'),
+        'bmr': tdee.bmr,
+        'activity_level': tdee.activity_level,
+        'activity_calories': tdee.activity_calories,
+        'tdee': tdee.tdee,
+        'calorie_intake': tdee.calorie_intake,
+        'balance': balance,
+        'status': tdee_balance_status(balance) if balance is not None and tdee.calorie_intake else None
+    }
+
+def build_dashboard(user, sections, today):
+    """Payload per requested section.
+
+    Every section except tdee is served from one query over the last
+    DASHBOARD_DAYS daily rollup rows; the payloads match the widget endpoints
+    (/fitness/api/latest_weight, daily_nutrition, weekly_workouts,
+    recent_activity, activity_miles_summary).
+    """
+    start_date = today - timedelta(days=DASHBOARD_DAYS)
+    rollups = []
+    if any(section != 'tdee' for section in sections):
+        rollups = get_daily_rollups(user.id, start_date, today)
+    today_rollup = next((r for r in rollups if r.date == today), None)
+
+    payload = {}
+    for section in sections:
+        if section == 'weight':
+            payload[section] = latest_weight_payload(user, rollups)
+        elif section == 'nutrition':
+            payload[section] = daily_nutrition_payload(user.id, today, today_rollup)
+        elif section == 'tdee':
+            payload[section] = _tdee_section(user.id, today)
+        elif section == 'workouts':
+            payload[section] = {'count': sum(r.workout_sets for r in rollups)}
+        elif section == 'recent_activity':
+            payload[section] = recent_activity_items(rollups, today)
+        elif section == 'miles':
+            summary = {
+                'Walking': sum(r.walking_miles for r in rollups),
+                'Running': sum(r.running_miles for r in rollups),
+                'Cycling': sum(r.cycling_miles for r in rollups)
+            }
+            payload[section] = {
+                'start_date': str(start_date),
+                'end_date': str(today),
+                'summary': {k: round(v, 2) for k, v in summary.items()}
+            }
+        elif section == 'mood':
+            ratings = [r.mood_rating for r in rollups if r.mood_rating is not None]
+            payload[section] = {
+                'today': today_rollup.mood_rating if today_rollup else None,
+                'average': round(sum(ratings) / len(ratings), 1) if ratings else None,
+                'days_logged': len(ratings)
+            }
+    return payload
+
+@dashboard_bp.route('/bootstrap')
+@login_required
+@conditional_get(DailyRollup, TDEE, TDEEDirtyDate, UserSettings, User, vary=_today)
+def get_dashboard_bootstrap():
+    """Every dashboard widget's data in one response.
+
+    Query params: sections (comma-separated subset of DASHBOARD_SECTIONS).
+    Sections disabled in the user's dashboard settings are left out. The ETag
+    comes from version tokens of the tables the widgets read (the requested
+    sections are part of the URL), so an unchanged dashboard gets a 304
+    before any section is built.
+    """
+    try:
+        sections = list(DASHBOARD_SECTIONS)
+        if request.args.get('sections'):
+            sections = [s.strip() for s in request.args['sections'].split(',') if s.strip()]
+            unknown = [s for s in sections if s not in DASHBOARD_SECTIONS]
+            if unknown:
+                return jsonify({'error': f"Unknown sections: {', '.join(unknown)}"}), 400
+
+        enabled = stored_dashboard_sections(UserSettings.query.filter_by(user_id=current_user.id).first())
+        if enabled is not None:
+            sections = [s for s in sections if s in enabled]
+
+        today = _today()
+        return jsonify({
+            'date': today.strftime('%Y-%m-%d'),
+            'sections': build_dashboard(current_user, sections, today)
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
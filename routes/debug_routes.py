@@ -0,0 +1,30 @@
+from functools import wraps
+from flask import Blueprint, jsonify, current_app
+from flask_login import login_required, current_user
+from request_profiler import profiler
+
+debug_bp = Blueprint('debug', __name__)
+
+def admin_required(view):
+    """Restrict a view to the emails listed in ADMIN_EMAILS"""
+    @wraps(view)
+    @login_required
+    def wrapper(*args, **kwargs):
+        if (current_user.email or '').lower() not in current_app.config.get('ADMIN_EMAILS', []):
+            return jsonify({'error': 'Admin access required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+@debug_bp.route('/profile', methods=['GET'])
+@admin_required
+def get_profile():
+    """Rolling per-endpoint request/SQL percentiles collected by request_profiler"""
+    if not current_app.config.get('PROFILE_REQUESTS'):
+        return jsonify({'enabled': False, 'endpoints': {}})
+    return jsonify({'enabled': True, **profiler.snapshot()})
+
+@debug_bp.route('/profile', methods=['DELETE'])
+@admin_required
+def reset_profile():
+    profiler.reset()
+    return jsonify({'message': 'Profile data cleared'})
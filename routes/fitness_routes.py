@@ -1,13 +1,17 @@
-from flask import Blueprint, request, jsonify, current_app, render_template
+from flask import Blueprint, request, jsonify, current_app, render_template, url_for, send_file
 from flask_login import login_required, current_user
-from models import db, User, Stat, FoodReference, FoodEntry, Workout, Activity, TDEE, UserSettings, ExerciseCategory, Exercise, UserFavoriteExercise, ProgressPic, PersonalRecord, FastingPeriod, DistanceMilestone, UserExercise, WorkoutTemplate, WorkoutTemplateExercise, WorkoutSession, WorkoutSessionExercise, RepeatActivity
+from models import db, User, Stat, FoodReference, FoodEntry, Workout, Activity, TDEE, ExerciseCategory, Exercise, UserFavoriteExercise, ProgressPic, PersonalRecord, FastingPeriod, DistanceMilestone, UserExercise, WorkoutTemplate, WorkoutTemplateExercise, WorkoutSession, WorkoutSessionExercise, RepeatActivity, DailyRollup, OCRJob, Blob
 from utils import clean_nutrient_value, convert_units
 from datetime import datetime, timedelta
 import traceback
-import os
-from werkzeug.utils import secure_filename
-from ocr_processor import ocr_processor
+from ocr_jobs import submit_ocr_job, expire_stale_job, serialize_ocr_job, OCRQueueFull
 from sqlalchemy import func, distinct
+from tdee_engine import calculate_tdee_range, save_tdee_range, mark_tdee_dirty, flush_dirty_tdee
+from pr_index import record_set_prs, refresh_set_prs, delete_workout_set, prs_by_workout, PR_TYPES
+from daily_rollup import get_daily_rollups
+from conditional_get import conditional_get
+from image_variants import submit_progress_pic, variant_paths
+from upload_storage import store_upload, get_storage
 
 fitness_bp = Blueprint('fitness', __name__)
 
@@ -16,150 +20,19 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def bodyscan_path(key):
+    """Web path of a stored body scan, in the relative form kept in Stat.bodyscan_image_path"""
+    return url_for('fitness.bodyscan_file', key=key).lstrip('/')
+
+# Stored files are named by their content hash, so a URL always serves the same bytes
+IMMUTABLE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+
 def calculate_tdee_for_date(user_id, date, save_to_db=False, activity_level=None):
     """Calculate TDEE for a given date, optionally saving to database."""
     try:
-        user = User.query.get(user_id)
-        
-        # Get the most recent stat entry for this user on or before the given date
-        stat = Stat.query.filter(Stat.user_id == user_id, Stat.date <= date, Stat.bmr != None).order_by(Stat.date.desc()).first()
-        
-        # Use stat data if available, otherwise fall back to user profile data
-        weight = stat.weight if stat and stat.weight else (user.weight if user else None)
-        height = stat.height if stat and stat.height else (user.height if user else None)
-        age = stat.age if stat and stat.age else (user.age if user else None)
-        sex = stat.sex if stat and stat.sex else (user.sex if user else None)
-        
-        # Use BMR from latest bodyscan if available, otherwise calculate it
-        user_settings = UserSettings.query.filter_by(user_id=user_id).first()
-        units = user_settings.units if user_settings and user_settings.units else 'imperial'
-        if stat:
-            bmr = stat.bmr
-        elif weight is not None and height is not None and age is not None and sex is not None:
-            if units == 'imperial':
-                # Use imperial formula
-                if str(sex).lower() == 'male':
-                    bmr = 4.536 * weight + 15.88 * height - 5 * age + 5
-                else:
-                    bmr = 4.536 * weight + 15.88 * height - 5 * age - 161
-            else:
-                # Use metric formula
-                weight_kg = weight / 2.20462
-                height_cm = height * 2.54
-                if str(sex).lower() == 'male':
-                    bmr = 10 * weight_kg + 6.25 * height_cm - 5 * age + 5
-                else:
-                    bmr = 10 * weight_kg + 6.25 * height_cm - 5 * age - 161
-        else:
-            return None  # Skip if profile incomplete and no BMR available
-
-        # Get activities for the date to determine workout calories
-        activities = Activity.query.filter_by(user_id=user_id, date=date).order_by(Activity.id.desc()).all()
-        activity_calories = sum(a.calories_burned for a in activities if a.calories_burned)
-        
-        tdee_record = TDEE.query.filter_by(user_id=user_id, date=date).first()
-        if not activity_level and tdee_record and tdee_record.activity_level:
-            daily_activity_level = tdee_record.activity_level
-        elif activity_level:
-            daily_activity_level = activity_level
-        else:
-            latest_activity_with_level = next((a.activity_level for a in activities if a.activity_level), None)
-            if latest_activity_with_level:
-                daily_activity_level = latest_activity_with_level
-            else:
-                user_settings = UserSettings.query.filter_by(user_id=user_id).first()
-                if user_settings and user_settings.activity_level:
-                    daily_activity_level = user_settings.activity_level
-                else:
-                    daily_activity_level = 'light'  # Default if no setting is found
-        
-        # Activity level multipliers
-        activity_multipliers = {
-            'sedentary': 1.2,
-            'light': 1.375,
-            'moderate': 1.55,
-            'active': 1.725,
-            'very_active': 1.9
-        }
-        
-        # Calculate base TDEE with activity level multiplier
-        activity_multiplier = activity_multipliers.get(daily_activity_level, 1.375)  # default to light multiplier
-        base_tdee = bmr * activity_multiplier
-
-        # Get all food entries for the date
-        food_entries = FoodEntry.query.filter_by(user_id=user_id, date=date).all()
-        
-        # Implement priority system: logged food takes priority over manual input
-        logged_food_entries = [e for e in food_entries if e.food_name != 'Manual Entry']
-        manual_entries = [e for e in food_entries if e.food_name == 'Manual Entry']
-        
-        if logged_food_entries:
-            # If logged food exists, use only logged food calories
-            calorie_intake = sum(e.calories for e in logged_food_entries if e.calories)
-        elif manual_entries:
-            # If no logged food but manual entries exist, use manual input
-            calorie_intake = sum(e.calories for e in manual_entries if e.calories)
-        else:
-            # No food entries at all
-            calorie_intake = 0
-
-        # Final TDEE = base TDEE (with activity level) + additional workout calories
-        tdee_value = base_tdee + activity_calories
-
-        # Create TDEE object with calculated values
-        tdee_data = {
-            'user_id': user_id,
-            'date': date,
-            'bmr': round(bmr),
-            'activity_calories': activity_calories,
-            'tdee': round(tdee_value),
-            'calorie_intake': calorie_intake,
-            'activity_level': daily_activity_level,
-            'activity_multiplier': activity_multiplier,
-            'base_tdee': round(base_tdee)
-        }
-
-        # Save to database only if requested
         if save_to_db:
-            tdee = TDEE.query.filter_by(user_id=user_id, date=date).first()
-            
-            # If activity_level is provided, use it to update the calculation
-            if activity_level is not None:
-                daily_activity_level = activity_level
-                activity_multiplier = activity_multipliers.get(daily_activity_level, 1.375)
-                base_tdee = bmr * activity_multiplier
-                tdee_data['activity_level'] = daily_activity_level
-                tdee_data['activity_multiplier'] = activity_multiplier
-                tdee_data['base_tdee'] = round(base_tdee)
-                tdee_data['tdee'] = round(base_tdee + activity_calories)
-            
-            # Always update the database with the calculated values from tdee_data
-            if tdee:
-                tdee.bmr = tdee_data['bmr']
-                tdee.activity_calories = tdee_data['activity_calories']
-                tdee.tdee = tdee_data['tdee']
-                tdee.calorie_intake = tdee_data['calorie_intake']
-                tdee.activity_level = tdee_data['activity_level']
-                tdee.activity_multiplier = tdee_data['activity_multiplier']
-                tdee.base_tdee = tdee_data['base_tdee']
-            else:
-                tdee = TDEE(
-                    user_id=user_id,
-                    date=date,
-                    bmr=tdee_data['bmr'],
-                    activity_calories=tdee_data['activity_calories'],
-                    tdee=tdee_data['tdee'],
-                    calorie_intake=tdee_data['calorie_intake'],
-                    activity_level=tdee_data['activity_level'],
-                    activity_multiplier=tdee_data['activity_multiplier'],
-                    base_tdee=tdee_data['base_tdee']
-                )  # noqa: E999 Linter: All parameters are valid for TDEE model (see models.py)
-                db.session.add(tdee)
-            db.session.commit()
-            return tdee
-        else:
-            return tdee_data
-            
+            return save_tdee_range(user_id, [date], activity_level=activity_level).get(date)
+        return calculate_tdee_range(user_id, [date], activity_level=activity_level).get(date)
     except Exception as e:
         if save_to_db:
             db.session.rollback()
@@ -170,30 +43,6 @@ def update_tdee_for_date(user_id, date, activity_level=None):
     """Update or create TDEE record for a given date."""
     return calculate_tdee_for_date(user_id, date, save_to_db=True, activity_level=activity_level)
 
-def update_all_tdee_records(user_id):
-    """Update TDEE records for all dates when profile data changes."""
-    try:
-        # Get all unique dates that have activities, food entries, or existing TDEE records
-        activity_dates = db.session.query(Activity.date).filter_by(user_id=user_id).distinct().all()
-        food_dates = db.session.query(FoodEntry.date).filter_by(user_id=user_id).distinct().all()
-        tdee_dates = db.session.query(TDEE.date).filter_by(user_id=user_id).distinct().all()
-        
-        # Combine all dates
-        all_dates = set()
-        for (date,) in activity_dates:
-            all_dates.add(date)
-        for (date,) in food_dates:
-            all_dates.add(date)
-        for (date,) in tdee_dates:
-            all_dates.add(date)
-        
-        for date in all_dates:
-            update_tdee_for_date(user_id, date, activity_level=None)
-        return True
-    except Exception as e:
-        print(f"Error updating all TDEE records: {str(e)}")
-        return False
-
 @fitness_bp.route('/add_stat', methods=['POST'])
 @login_required
 def add_stat():
@@ -202,55 +51,36 @@ def add_stat():
         data = request.form
         
         bodyscan_image_path = None
-        ocr_metrics = {}
+        bodyscan_blob = None
         
         if 'bodyscan_image' in request.files:
             file = request.files['bodyscan_image']
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                # Ensure unique filenames
-                unique_filename = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{filename}"
-                upload_folder = current_app.config['UPLOAD_FOLDER']
-                
-                # Check if upload_folder is an absolute path, if not, make it so
-                if not os.path.isabs(upload_folder):
-                    upload_folder = os.path.join(current_app.root_path, upload_folder)
-                
-                if not os.path.exists(upload_folder):
-                    os.makedirs(upload_folder)
-
-                file_path = os.path.join(upload_folder, unique_filename)
-                file.save(file_path)
-                # Store relative path for web access
-                bodyscan_image_path = os.path.join('static/uploads', unique_filename).replace('\\', '/')
-                
-                # Process OCR if image was uploaded
-                try:
-                    ocr_metrics = ocr_processor.process_inbody_image(file_path)
-                except Exception as e:
-                    current_app.logger.error(f"OCR processing failed: {e}")
-                    ocr_metrics = {}
+                # Stored once under its content hash; the scan is OCR'd in the background
+                # and fills the fields left empty here
+                bodyscan_blob = store_upload(current_app._get_current_object(), file)
+                bodyscan_image_path = bodyscan_path(bodyscan_blob)
 
-        # Use OCR data if available, otherwise use form data
         stat_fields = {
-            'weight': clean_nutrient_value(data.get('weight')) or ocr_metrics.get('weight'),
-            'body_fat_percentage': clean_nutrient_value(data.get('body_fat_percentage')) or ocr_metrics.get('body_fat_percentage'),
+            'weight': clean_nutrient_value(data.get('weight')),
+            'body_fat_percentage': clean_nutrient_value(data.get('body_fat_percentage')),
             'resting_heart_rate': int(data.get('resting_heart_rate')) if data.get('resting_heart_rate') else None,
-            'smm': clean_nutrient_value(data.get('smm')) or ocr_metrics.get('smm'),
-            'body_fat_mass': clean_nutrient_value(data.get('body_fat_mass')) or ocr_metrics.get('body_fat_mass'),
-            'lean_body_mass': clean_nutrient_value(data.get('lean_body_mass')) or ocr_metrics.get('lean_body_mass'),
-            'bmr': int(data.get('bmr')) if data.get('bmr') else ocr_metrics.get('bmr'),
-            'bicep_measurement': clean_nutrient_value(data.get('bicep_measurement')) or ocr_metrics.get('bicep_measurement'),
-            'chest_measurement': clean_nutrient_value(data.get('chest_measurement')) or ocr_metrics.get('chest_measurement'),
-            'waist_measurement': clean_nutrient_value(data.get('waist_measurement')) or ocr_metrics.get('waist_measurement'),
-            'butt_measurement': clean_nutrient_value(data.get('butt_measurement')) or ocr_metrics.get('butt_measurement'),
-            'quad_measurement': clean_nutrient_value(data.get('quad_measurement')) or ocr_metrics.get('quad_measurement'),
-            'left_arm_lean_mass': clean_nutrient_value(data.get('left_arm_lean_mass')) or ocr_metrics.get('left_arm_lean_mass'),
-            'right_arm_lean_mass': clean_nutrient_value(data.get('right_arm_lean_mass')) or ocr_metrics.get('right_arm_lean_mass'),
-            'left_leg_lean_mass': clean_nutrient_value(data.get('left_leg_lean_mass')) or ocr_metrics.get('left_leg_lean_mass'),
-            'right_leg_lean_mass': clean_nutrient_value(data.get('right_leg_lean_mass')) or ocr_metrics.get('right_leg_lean_mass'),
-            'trunk_lean_mass': clean_nutrient_value(data.get('trunk_lean_mass')) or ocr_metrics.get('trunk_lean_mass'),
-            'bodyscan_image_path': bodyscan_image_path
+            'smm': clean_nutrient_value(data.get('smm')),
+            'body_fat_mass': clean_nutrient_value(data.get('body_fat_mass')),
+            'lean_body_mass': clean_nutrient_value(data.get('lean_body_mass')),
+            'bmr': int(data.get('bmr')) if data.get('bmr') else None,
+            'bicep_measurement': clean_nutrient_value(data.get('bicep_measurement')),
+            'chest_measurement': clean_nutrient_value(data.get('chest_measurement')),
+            'waist_measurement': clean_nutrient_value(data.get('waist_measurement')),
+            'butt_measurement': clean_nutrient_value(data.get('butt_measurement')),
+            'quad_measurement': clean_nutrient_value(data.get('quad_measurement')),
+            'left_arm_lean_mass': clean_nutrient_value(data.get('left_arm_lean_mass')),
+            'right_arm_lean_mass': clean_nutrient_value(data.get('right_arm_lean_mass')),
+            'left_leg_lean_mass': clean_nutrient_value(data.get('left_leg_lean_mass')),
+            'right_leg_lean_mass': clean_nutrient_value(data.get('right_leg_lean_mass')),
+            'trunk_lean_mass': clean_nutrient_value(data.get('trunk_lean_mass')),
+            'bodyscan_image_path': bodyscan_image_path,
+            'bodyscan_blob': bodyscan_blob
         }
         # Only keep fields that are valid for the Stat model
         valid_stat_fields = [
@@ -258,23 +88,28 @@ def add_stat():
             'lean_body_mass', 'bmr', 'bicep_measurement', 'chest_measurement',
             'waist_measurement', 'butt_measurement', 'quad_measurement',
             'left_arm_lean_mass', 'right_arm_lean_mass', 'left_leg_lean_mass',
-            'right_leg_lean_mass', 'trunk_lean_mass', 'bodyscan_image_path'
+            'right_leg_lean_mass', 'trunk_lean_mass', 'bodyscan_image_path', 'bodyscan_blob'
         ]
         filtered_stat_fields = {k: v for k, v in stat_fields.items() if k in valid_stat_fields}
-        has_data = any(v not in [None, '', 0] for k, v in filtered_stat_fields.items() if k != 'bodyscan_image_path')
-        if not has_data:
+        has_data = any(v not in [None, '', 0] for k, v in filtered_stat_fields.items() if k not in ('bodyscan_image_path', 'bodyscan_blob'))
+        if not has_data and not bodyscan_blob:
             return jsonify({'error': 'No stat fields provided. Please enter at least one value.'}), 400
         # user_id and date are valid fields for Stat (see models.py), linter errors are false positives
         stat = Stat(user_id=current_user.id, date=current_date, **filtered_stat_fields)
         db.session.add(stat)
+        # A new BMR changes TDEE from this date on
+        if stat.bmr is not None:
+            mark_tdee_dirty(current_user.id, stat.date, cascade_forward=True)
         db.session.commit()
         
-        update_all_tdee_records(current_user.id)
-        
         response_data = {'message': 'Stat added successfully'}
-        if ocr_metrics:
-            response_data['ocr_metrics'] = ocr_metrics
-            response_data['message'] += f' (OCR extracted {len(ocr_metrics)} metrics)'
+        if bodyscan_blob:
+            try:
+                job = submit_ocr_job(current_app._get_current_object(), current_user.id, bodyscan_blob, stat_id=stat.id)
+                response_data['ocr_job_id'] = job.id
+                response_data['message'] += ' (body scan is being processed)'
+            except OCRQueueFull as e:
+                current_app.logger.warning(f"Body scan not processed: {e}")
         
         return jsonify(response_data)
     except Exception as e:
@@ -294,42 +129,61 @@ def process_ocr():
         if not file or not file.filename or not allowed_file(file.filename):
             return jsonify({'error': 'Invalid file type'}), 400
         
-        # Save file temporarily
-        filename = secure_filename(file.filename)
-        unique_filename = f"temp_{datetime.now().strftime('%Y%m%d%H%M%S')}_{filename}"
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        
-        if not os.path.isabs(upload_folder):
-            upload_folder = os.path.join(current_app.root_path, upload_folder)
-        
-        if not os.path.exists(upload_folder):
-            os.makedirs(upload_folder)
-
-        file_path = os.path.join(upload_folder, unique_filename)
-        file.save(file_path)
+        # Stored unreferenced until the reviewed Stat is saved; an abandoned review is swept later
+        blob_key = store_upload(current_app._get_current_object(), file)
+        db.session.commit()
         
-        # Process OCR
+        # OCR runs in the background pool; the client polls the job
         try:
-            ocr_metrics = ocr_processor.process_inbody_image(file_path)
-        except Exception as e:
-            current_app.logger.error(f"OCR processing failed: {e}")
-            ocr_metrics = {}
-        
-        # Store relative path for web access
-        image_path = os.path.join('static/uploads', unique_filename).replace('\\', '/')
-        
+            job = submit_ocr_job(current_app._get_current_object(), current_user.id, blob_key)
+        except OCRQueueFull as e:
+            response = jsonify({'error': str(e)})
+            response.headers['Retry-After'] = '10'
+            return response, 503
+        
+        # Scans found in the OCR cache come back already done
+        cached = job.status == 'done'
         return jsonify({
             'success': True,
-            'message': f'OCR extracted {len(ocr_metrics)} metrics',
-            'metrics': ocr_metrics,
-            'image_path': image_path,
-            'temp_filename': unique_filename
-        })
+            'message': 'Scan read from cache' if cached else 'Scan queued for OCR',
+            'job_id': job.id,
+            'status': job.status,
+            'cache_hit': job.cache_hit,
+            'status_url': url_for('fitness.get_ocr_job', job_id=job.id),
+            'review_url': url_for('fitness.review_ocr', job_id=job.id),
+            'image_path': bodyscan_path(blob_key),
+            'temp_filename': blob_key
+        }), 200 if cached else 202
         
     except Exception as e:
         current_app.logger.error(f"Error in process_ocr: {e}")
         return jsonify({'error': str(e)}), 400
 
+@fitness_bp.route('/api/ocr_jobs/<int:job_id>', methods=['GET'])
+@login_required
+def get_ocr_job(job_id):
+    """Poll an OCR job; metrics are included once its status is 'done'"""
+    try:
+        job = OCRJob.query.filter_by(id=job_id, user_id=current_user.id).first()
+        if not job:
+            return jsonify({'error': 'OCR job not found'}), 404
+        expire_stale_job(job, current_app)
+        return jsonify(serialize_ocr_job(job))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@fitness_bp.route('/api/ocr_jobs', methods=['GET'])
+@login_required
+def get_ocr_jobs():
+    """The user's most recent OCR jobs, newest first"""
+    try:
+        jobs = OCRJob.query.filter_by(user_id=current_user.id).order_by(OCRJob.created_at.desc()).limit(20).all()
+        for job in jobs:
+            expire_stale_job(job, current_app)
+        return jsonify([serialize_ocr_job(job) for job in jobs])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @fitness_bp.route('/review_ocr', methods=['GET'])
 @login_required
 def review_ocr():
@@ -344,18 +198,12 @@ def save_reviewed_stat():
         current_date = datetime.now().date()
         data = request.form
         
-        # Get the temp image path and move it to permanent location
-        temp_filename = data.get('temp_filename')
-        bodyscan_image_path = None
-        
-        if temp_filename:
-            temp_path = os.path.join(current_app.config['UPLOAD_FOLDER'], temp_filename)
-            if os.path.exists(temp_path):
-                # Move to permanent location
-                permanent_filename = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{temp_filename.replace('temp_', '')}"
-                permanent_path = os.path.join(current_app.config['UPLOAD_FOLDER'], permanent_filename)
-                os.rename(temp_path, permanent_path)
-                bodyscan_image_path = os.path.join('static/uploads', permanent_filename).replace('\\', '/')
+        # The uploaded scan's blob; referencing it from the Stat keeps it from being swept
+        job = OCRJob.query.filter_by(id=data.get('job_id'), user_id=current_user.id).first() if data.get('job_id') else None
+        bodyscan_blob = job.filename if job else data.get('temp_filename')
+        if bodyscan_blob and not Blob.query.filter_by(key=bodyscan_blob).first():
+            bodyscan_blob = None
+        bodyscan_image_path = bodyscan_path(bodyscan_blob) if bodyscan_blob else None
         
         # Create stat with reviewed data
         stat = Stat(
@@ -378,13 +226,18 @@ def save_reviewed_stat():
             left_leg_lean_mass=clean_nutrient_value(data.get('left_leg_lean_mass')),
             right_leg_lean_mass=clean_nutrient_value(data.get('right_leg_lean_mass')),
             trunk_lean_mass=clean_nutrient_value(data.get('trunk_lean_mass')),
-            bodyscan_image_path=bodyscan_image_path
+            bodyscan_image_path=bodyscan_image_path,
+            bodyscan_blob=bodyscan_blob
         )
         db.session.add(stat)
+        if stat.bmr is not None:
+            mark_tdee_dirty(current_user.id, stat.date, cascade_forward=True)
+        if job:
+            db.session.flush()
+            job.status = 'reviewed'
+            job.stat_id = stat.id
         db.session.commit()
         
-        update_all_tdee_records(current_user.id)
-        
         return jsonify({'message': 'Stat saved successfully'})
         
     except Exception as e:
@@ -459,8 +312,8 @@ def add_food_entry():
             unit=unit
         )
         db.session.add(entry)
+        mark_tdee_dirty(current_user.id, date)
         db.session.commit()
-        update_tdee_for_date(current_user.id, date)
         return jsonify({'message': 'Food entry added successfully'})
     except Exception as e:
         db.session.rollback()
@@ -496,18 +349,6 @@ def add_workout():
         sets = int(data.get('sets') or 1)
         date = datetime.strptime(data.get('date'), '%Y-%m-%d').date()
         
-        # Check current PRs before adding the workout
-        current_weight_pr = PersonalRecord.query.filter_by(
-            user_id=current_user.id, 
-            exercise=exercise_name, 
-            pr_type='weight'
-        ).first()
-        current_reps_pr = PersonalRecord.query.filter_by(
-            user_id=current_user.id, 
-            exercise=exercise_name, 
-            pr_type='reps'
-        ).first()
-        
         # Calculate total_weight (barbell logic: if 'Barbell' in exercise name, add 45)
         is_barbell = 'barbell' in exercise_name.lower()
         total_weight = weight + 45 if is_barbell else weight
@@ -520,20 +361,15 @@ def add_workout():
             weight=weight,
             reps=reps,
             sets=sets,
+            set_count=sets,
             total_weight=total_weight
         )
         db.session.add(workout)
-        db.session.commit()
-        
-        # Update PRs
-        update_prs_for_workout(current_user.id, exercise_name, weight, reps, sets, workout.id, date, total_weight)
+        db.session.flush()
         
-        # Check which PRs were newly achieved
-        new_prs = []
-        if (not current_weight_pr or weight > current_weight_pr.value):
-            new_prs.append('weight')
-        if (not current_reps_pr or reps > current_reps_pr.value):
-            new_prs.append('reps')
+        # Update the PR index in the same transaction as the workout
+        new_prs = record_set_prs(workout)
+        db.session.commit()
         
         return jsonify({
             'message': 'Workout added successfully', 
@@ -624,13 +460,12 @@ def add_activity():
                 miles=miles
             )
             db.session.add(activity)
+            mark_tdee_dirty(current_user.id, date)
             db.session.commit()
             
             # Update milestone if activity has miles
             if miles:
                 update_milestone_from_activity(current_user.id, miles)
-            
-            update_tdee_for_date(current_user.id, date)
         
         # Handle repeat activity if checkbox is checked or if this is a repeat-only creation
         if data.get('repeat_activity') == '1' or data.get('repeat_activity') == True:
@@ -696,6 +531,7 @@ def edit_activity(id):
         # Store old miles for milestone adjustment
         old_miles = activity.miles or 0
         new_miles = float(data.get('miles')) if data.get('miles') else None
+        old_date = activity.date
         
         activity.date = datetime.strptime(data.get('activity_date'), '%Y-%m-%d').date()
         activity.activity_type = data.get('activity_type').title().strip()  # Normalize to title case
@@ -713,6 +549,9 @@ def edit_activity(id):
             calories_burned = int(activity.duration * 10)
         activity.calories_burned = calories_burned
         
+        mark_tdee_dirty(current_user.id, activity.date)
+        if old_date != activity.date:
+            mark_tdee_dirty(current_user.id, old_date)
         db.session.commit()
         
         # Update milestone if miles changed
@@ -724,7 +563,6 @@ def edit_activity(id):
             if new_miles and new_miles > 0:
                 update_milestone_from_activity(current_user.id, new_miles)
         
-        update_tdee_for_date(current_user.id, activity.date)
         return jsonify({'message': 'Activity updated successfully'})
     except Exception as e:
         db.session.rollback()
@@ -743,13 +581,13 @@ def delete_activity(id):
         date = activity.date
         
         db.session.delete(activity)
+        mark_tdee_dirty(current_user.id, date)
         db.session.commit()
         
         # Remove miles from milestone if activity had miles
         if miles and miles > 0:
             update_milestone_from_activity(current_user.id, -miles)
         
-        update_tdee_for_date(current_user.id, date)
         return jsonify({'message': 'Activity deleted successfully'})
     except Exception as e:
         db.session.rollback()
@@ -820,8 +658,8 @@ def add_manual_calories():
             db.session.add(manual_entry)
             message = 'Manual calories added successfully'
         
+        mark_tdee_dirty(current_user.id, date)
         db.session.commit()
-        update_tdee_for_date(current_user.id, date)
         
         return jsonify({
             'message': message,
@@ -835,59 +673,56 @@ def add_manual_calories():
         db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
+def daily_nutrition_payload(user_id, target_date, rollup):
+    """Nutrition totals for a day from its rollup row, plus the day's entries when there are any."""
+    if not rollup or not rollup.food_entries:
+        return {
+            'date': target_date.strftime('%Y-%m-%d'),
+            'calories': 0,
+            'protein': 0,
+            'carbs': 0,
+            'fat': 0,
+            'source': 'none',
+            'entries': []
+        }
+    
+    # Determine source (logged food takes priority)
+    has_logged_food = rollup.food_entries > rollup.manual_food_entries
+    source = 'logged_food' if has_logged_food else 'manual_input'
+    
+    food_entries = FoodEntry.query.filter_by(user_id=user_id, date=target_date).all()
+    
+    # Format entries for response
+    entries = [{
+        'id': e.id,
+        'food_name': e.food_name,
+        'calories': e.calories,
+        'protein': e.protein,
+        'carbs': e.carbs,
+        'fat': e.fat,
+        'quantity': e.quantity,
+        'unit': e.unit,
+        'is_manual': e.food_name == 'Manual Entry'
+    } for e in food_entries]
+    
+    return {
+        'date': target_date.strftime('%Y-%m-%d'),
+        'calories': rollup.calories,
+        'protein': rollup.protein,
+        'carbs': rollup.carbs,
+        'fat': rollup.fat,
+        'source': source,
+        'entries': entries
+    }
+
 @fitness_bp.route('/api/daily_nutrition/<date>')
 @login_required
 def get_daily_nutrition(date):
     """Get nutrition data for a specific date, prioritizing logged food over manual input."""
     try:
         target_date = datetime.strptime(date, '%Y-%m-%d').date()
-        
-        # Get all food entries for the date
-        food_entries = FoodEntry.query.filter_by(user_id=current_user.id, date=target_date).all()
-        
-        if not food_entries:
-            return jsonify({
-                'date': date,
-                'calories': 0,
-                'protein': 0,
-                'carbs': 0,
-                'fat': 0,
-                'source': 'none',
-                'entries': []
-            })
-        
-        # Calculate totals
-        total_calories = sum(e.calories for e in food_entries if e.calories)
-        total_protein = sum(e.protein for e in food_entries if e.protein)
-        total_carbs = sum(e.carbs for e in food_entries if e.carbs)
-        total_fat = sum(e.fat for e in food_entries if e.fat)
-        
-        # Determine source (logged food takes priority)
-        has_logged_food = any(e.food_name != 'Manual Entry' for e in food_entries)
-        source = 'logged_food' if has_logged_food else 'manual_input'
-        
-        # Format entries for response
-        entries = [{
-            'id': e.id,
-            'food_name': e.food_name,
-            'calories': e.calories,
-            'protein': e.protein,
-            'carbs': e.carbs,
-            'fat': e.fat,
-            'quantity': e.quantity,
-            'unit': e.unit,
-            'is_manual': e.food_name == 'Manual Entry'
-        } for e in food_entries]
-        
-        return jsonify({
-            'date': date,
-            'calories': total_calories,
-            'protein': total_protein,
-            'carbs': total_carbs,
-            'fat': total_fat,
-            'source': source,
-            'entries': entries
-        })
+        rollup = DailyRollup.query.filter_by(user_id=current_user.id, date=target_date).first()
+        return jsonify(daily_nutrition_payload(current_user.id, target_date, rollup))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -902,8 +737,8 @@ def delete_food_entry(id):
         
         date = entry.date
         db.session.delete(entry)
+        mark_tdee_dirty(current_user.id, date)
         db.session.commit()
-        update_tdee_for_date(current_user.id, date)
         return jsonify({'message': 'Food entry deleted successfully'})
     except Exception as e:
         db.session.rollback()
@@ -919,6 +754,7 @@ def edit_food_entry(id):
             return jsonify({'error': 'Unauthorized'}), 403
         
         data = request.get_json()
+        old_date = entry.date
         
         # Update the entry
         entry.date = datetime.strptime(data.get('date'), '%Y-%m-%d').date()
@@ -930,8 +766,10 @@ def edit_food_entry(id):
         entry.quantity = float(data.get('quantity', 1))
         entry.unit = data.get('unit', 'manual')
         
+        mark_tdee_dirty(current_user.id, entry.date)
+        if old_date != entry.date:
+            mark_tdee_dirty(current_user.id, old_date)
         db.session.commit()
-        update_tdee_for_date(current_user.id, entry.date)
         
         return jsonify({'message': 'Food entry updated successfully'})
     except Exception as e:
@@ -947,21 +785,13 @@ def delete_stat(id):
         if not stat:
             return jsonify({'error': 'Stat not found or access denied'}), 404
         
-        # Delete associated image file if it exists
-        if stat.bodyscan_image_path:
-            try:
-                image_path = os.path.join(current_app.root_path, stat.bodyscan_image_path)
-                if os.path.exists(image_path):
-                    os.remove(image_path)
-            except Exception as e:
-                current_app.logger.warning(f"Failed to delete image file: {e}")
-        
+        # The scan's blob is swept once nothing references it
+        # Removing a BMR changes TDEE from this date on
+        if stat.bmr is not None:
+            mark_tdee_dirty(current_user.id, stat.date, cascade_forward=True)
         db.session.delete(stat)
         db.session.commit()
         
-        # Update TDEE records after stat deletion
-        update_all_tdee_records(current_user.id)
-        
         return jsonify({'message': 'Stat deleted successfully'})
     except Exception as e:
         db.session.rollback()
@@ -1049,6 +879,7 @@ def update_tdee_record(tdee_id):
 
 @fitness_bp.route('/api/exercise_categories')
 @login_required
+@conditional_get(ExerciseCategory)
 def get_exercise_categories():
     """Get all exercise categories."""
     try:
@@ -1063,6 +894,7 @@ def get_exercise_categories():
 
 @fitness_bp.route('/api/exercises/<int:category_id>')
 @login_required
+@conditional_get(Exercise, UserExercise, UserFavoriteExercise)
 def get_exercises_by_category(category_id):
     try:
         # System exercises
@@ -1100,6 +932,7 @@ def get_exercises_by_category(category_id):
 
 @fitness_bp.route('/api/exercises')
 @login_required
+@conditional_get(Exercise, ExerciseCategory)
 def get_all_exercises():
     """Get all exercises with their categories."""
     try:
@@ -1130,6 +963,7 @@ def get_workouts_by_date():
             user_id=current_user.id,
             date=date
         ).order_by(Workout.id).all()
+        workout_prs = prs_by_workout(current_user.id, [w.id for w in workouts])
 
         result = []
         for w in workouts:
@@ -1158,7 +992,7 @@ def get_workouts_by_date():
                 'total_weight': w.total_weight  # Add total_weight
             }
             
-            workout_data['prs_achieved'] = get_prs_achieved(current_user.id, w.exercise, w.weight, w.reps, w.sets, w.id)
+            workout_data['prs_achieved'] = workout_prs.get(w.id, [])
             result.append(workout_data)
 
         return jsonify(result)
@@ -1214,114 +1048,97 @@ def toggle_favorite(exercise_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
+def latest_weight_payload(user, rollups=()):
+    """Latest logged weight, falling back to the profile weight.
+
+    `rollups` (newest first) are searched before querying older rollup rows.
+    """
+    latest = next((r for r in rollups if r.weight is not None), None)
+    if latest is None:
+        latest = DailyRollup.query.filter(
+            DailyRollup.user_id == user.id,
+            DailyRollup.weight.isnot(None)
+        ).order_by(DailyRollup.date.desc()).first()
+    
+    if latest:
+        return {
+            'weight': latest.weight,
+            'date': latest.date.strftime('%Y-%m-%d'),
+            'change': None  # Could calculate change from previous entry if needed
+        }
+    # Fallback to user profile weight if no stats available
+    if user.weight:
+        return {
+            'weight': user.weight,
+            'date': None,  # No specific date for profile weight
+            'change': None,
+            'source': 'profile'  # Indicate this is from profile, not stats
+        }
+    return {
+        'weight': None,
+        'date': None,
+        'change': None
+    }
+
 @fitness_bp.route('/api/latest_weight')
 @login_required
 def get_latest_weight():
     """Get the user's latest weight from stats or profile."""
     try:
-        latest_stat = Stat.query.filter_by(user_id=current_user.id).order_by(Stat.date.desc()).first()
-        
-        if latest_stat and latest_stat.weight:
-            return jsonify({
-                'weight': latest_stat.weight,
-                'date': latest_stat.date.strftime('%Y-%m-%d'),
-                'change': None  # Could calculate change from previous entry if needed
-            })
-        else:
-            # Fallback to user profile weight if no stats available
-            if current_user.weight:
-                return jsonify({
-                    'weight': current_user.weight,
-                    'date': None,  # No specific date for profile weight
-                    'change': None,
-                    'source': 'profile'  # Indicate this is from profile, not stats
-                })
-            else:
-                return jsonify({
-                    'weight': None,
-                    'date': None,
-                    'change': None
-                })
+        return jsonify(latest_weight_payload(current_user))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@fitness_bp.route('/api/recent_activity')
-@login_required
-def get_recent_activity():
-    """Get recent activity timeline for the dashboard."""
-    try:
-        # Get recent stats (last 7 days)
-        from datetime import timedelta
-        end_date = datetime.now().date()
-        start_date = end_date - timedelta(days=7)
+def recent_activity_items(rollups, end_date):
+    """Timeline items (weight, workout, food) from rollup rows, newest first, at most 5."""
+    activities = []
+    for rollup in rollups:
+        days_ago = (end_date - rollup.date).days
+        time_ago = f"{days_ago} day{'s' if days_ago != 1 else ''} ago" if days_ago > 0 else "Today"
+        date_str = rollup.date.strftime('%Y-%m-%d')
         
-        recent_stats = Stat.query.filter(
-            Stat.user_id == current_user.id,
-            Stat.date >= start_date,
-            Stat.date <= end_date
-        ).order_by(Stat.date.desc()).limit(3).all()
-        
-        # Get recent workouts (last 7 days)
-        recent_workouts = Workout.query.filter(
-            Workout.user_id == current_user.id,
-            Workout.date >= start_date,
-            Workout.date <= end_date
-        ).order_by(Workout.date.desc()).limit(3).all()
-        
-        # Get recent food entries (last 7 days)
-        recent_food = FoodEntry.query.filter(
-            FoodEntry.user_id == current_user.id,
-            FoodEntry.date >= start_date,
-            FoodEntry.date <= end_date
-        ).order_by(FoodEntry.date.desc()).limit(3).all()
-        
-        # Combine and format activities
-        activities = []
-        
-        for stat in recent_stats:
-            days_ago = (end_date - stat.date).days
-            time_ago = f"{days_ago} day{'s' if days_ago != 1 else ''} ago" if days_ago > 0 else "Today"
-            
+        if rollup.weight is not None:
             activities.append({
                 'type': 'weight',
                 'title': 'Weight Logged',
-                'description': f"{stat.weight} lbs",
-                'date': stat.date.strftime('%Y-%m-%d'),
+                'description': f"{rollup.weight} lbs",
+                'date': date_str,
                 'time_ago': time_ago,
                 'icon': '⚖️'
             })
-        
-        for workout in recent_workouts:
-            days_ago = (end_date - workout.date).days
-            time_ago = f"{days_ago} day{'s' if days_ago != 1 else ''} ago" if days_ago > 0 else "Today"
-            
+        if rollup.workout_sets:
             activities.append({
                 'type': 'workout',
                 'title': 'Workout Completed',
-                'description': workout.exercise,
-                'date': workout.date.strftime('%Y-%m-%d'),
+                'description': f"{rollup.workout_exercises} exercise{'s' if rollup.workout_exercises != 1 else ''}, {rollup.workout_sets} sets",
+                'date': date_str,
                 'time_ago': time_ago,
                 'icon': '🏋️'
             })
-        
-        for food in recent_food:
-            days_ago = (end_date - food.date).days
-            time_ago = f"{days_ago} day{'s' if days_ago != 1 else ''} ago" if days_ago > 0 else "Today"
-            
+        if rollup.food_entries:
             activities.append({
                 'type': 'food',
                 'title': 'Food Logged',
-                'description': f"{food.calories} calories",
-                'date': food.date.strftime('%Y-%m-%d'),
+                'description': f"{rollup.calories} calories",
+                'date': date_str,
                 'time_ago': time_ago,
                 'icon': '🍎'
             })
-        
-        # Sort by date (most recent first) and limit to 5 items
-        activities.sort(key=lambda x: x['date'], reverse=True)
-        activities = activities[:5]
-        
-        return jsonify(activities)
+    
+    # Sort by date (most recent first) and limit to 5 items
+    activities.sort(key=lambda x: x['date'], reverse=True)
+    return activities[:5]
+
+@fitness_bp.route('/api/recent_activity')
+@login_required
+def get_recent_activity():
+    """Get recent activity timeline for the dashboard."""
+    try:
+        # One rollup row per day for the last 7 days
+        end_date = datetime.now().date()
+        start_date = end_date - timedelta(days=7)
+        rollups = get_daily_rollups(current_user.id, start_date, end_date)
+        return jsonify(recent_activity_items(rollups, end_date))
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1335,11 +1152,11 @@ def get_weekly_workouts():
         end_date = datetime.now().date()
         start_date = end_date - timedelta(days=7)
         
-        weekly_workouts = Workout.query.filter(
-            Workout.user_id == current_user.id,
-            Workout.date >= start_date,
-            Workout.date <= end_date
-        ).count()
+        weekly_workouts = db.session.query(func.coalesce(func.sum(DailyRollup.workout_sets), 0)).filter(
+            DailyRollup.user_id == current_user.id,
+            DailyRollup.date >= start_date,
+            DailyRollup.date <= end_date
+        ).scalar()
         
         return jsonify({'count': weekly_workouts})
         
@@ -1354,6 +1171,7 @@ def edit_stat(id):
         if not stat:
             return jsonify({'error': 'Stat not found or access denied'}), 404
         data = request.get_json()
+        old_date, old_bmr = stat.date, stat.bmr
         # Only update fields that are present in the request
         editable_fields = [
             'date', 'weight', 'body_fat_percentage', 'smm', 'body_fat_mass', 'lean_body_mass', 'bmr',
@@ -1379,8 +1197,10 @@ def edit_stat(id):
                         setattr(stat, field, value)
                 else:
                     setattr(stat, field, None)
+        # Only BMR (and the date it applies from) feeds into TDEE
+        if (stat.date, stat.bmr) != (old_date, old_bmr) and (old_bmr is not None or stat.bmr is not None):
+            mark_tdee_dirty(current_user.id, min(old_date, stat.date), cascade_forward=True)
         db.session.commit()
-        update_all_tdee_records(current_user.id)
         return jsonify({'message': 'Stat updated successfully'})
     except Exception as e:
         db.session.rollback()
@@ -1414,17 +1234,8 @@ def upload_progress_pic():
             return jsonify({'error': 'No file selected'}), 400
         
         if file and allowed_file(file.filename):
-            # Create progress_pics directory if it doesn't exist
-            progress_pics_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'progress_pics')
-            os.makedirs(progress_pics_dir, exist_ok=True)
-            
-            # Generate unique filename
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            filename = f"progress_{current_user.id}_{timestamp}_{secure_filename(file.filename)}"
-            filepath = os.path.join(progress_pics_dir, filename)
-            
-            # Save file
-            file.save(filepath)
+            # Stored once under its content hash
+            filename = store_upload(current_app._get_current_object(), file)
             
             # Save to database
             progress_pic = ProgressPic(
@@ -1436,10 +1247,14 @@ def upload_progress_pic():
             db.session.add(progress_pic)
             db.session.commit()
             
+            # Thumbnails are resized in the background; the gallery shows them once variants_status is 'ready'
+            submit_progress_pic(current_app._get_current_object(), progress_pic.id)
+            
             return jsonify({
                 'success': True,
                 'filename': filename,
-                'id': progress_pic.id
+                'id': progress_pic.id,
+                'variants_status': progress_pic.variants_status
             })
         else:
             return jsonify({'error': 'Invalid file type'}), 400
@@ -1454,15 +1269,46 @@ def get_progress_pics():
     """Get user's progress pictures."""
     try:
         progress_pics = ProgressPic.query.filter_by(user_id=current_user.id).order_by(ProgressPic.upload_date.desc()).all()
+        def pic_url(pic, name):
+            return url_for('fitness.progress_pic_file', pic_id=pic.id, name=name) if name else None
+        
         return jsonify([{
             'id': pic.id,
             'filename': pic.filename,
             'upload_date': pic.upload_date.strftime('%Y-%m-%d'),
-            'description': pic.description
+            'description': pic.description,
+            'url': pic_url(pic, pic.filename),
+            'variants_status': pic.variants_status,
+            'thumb': {'webp': pic_url(pic, pic.thumb_webp), 'jpeg': pic_url(pic, pic.thumb_jpeg)},
+            'medium': {'webp': pic_url(pic, pic.medium_webp), 'jpeg': pic_url(pic, pic.medium_jpeg)}
         } for pic in progress_pics])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@fitness_bp.route('/progress_pics/<int:pic_id>/<name>')
+@login_required
+def progress_pic_file(pic_id, name):
+    """Serve a progress picture or one of its resized variants."""
+    progress_pic = ProgressPic.query.filter_by(id=pic_id, user_id=current_user.id).first()
+    if not progress_pic or name not in [progress_pic.filename] + variant_paths(progress_pic):
+        return jsonify({'error': 'Progress picture not found'}), 404
+    
+    response = send_file(get_storage(current_app).local_path(name), conditional=True)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+@fitness_bp.route('/bodyscans/<key>')
+@login_required
+def bodyscan_file(key):
+    """Serve an uploaded body scan of the current user."""
+    owned = OCRJob.query.filter_by(user_id=current_user.id, filename=key).first() or \
+        Stat.query.filter_by(user_id=current_user.id, bodyscan_blob=key).first()
+    if not owned or not Blob.query.filter_by(key=key).first():
+        return jsonify({'error': 'Body scan not found'}), 404
+    response = send_file(get_storage(current_app).local_path(key), conditional=True)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
 @fitness_bp.route('/delete_progress_pic/<int:pic_id>', methods=['DELETE'])
 @login_required
 def delete_progress_pic(pic_id):
@@ -1472,11 +1318,7 @@ def delete_progress_pic(pic_id):
         if not progress_pic:
             return jsonify({'error': 'Progress picture not found'}), 404
         
-        # Delete file from filesystem
-        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], 'progress_pics', progress_pic.filename)
-        if os.path.exists(filepath):
-            os.remove(filepath)
-        
+        # The picture's blobs are swept once nothing references them
         # Delete from database
         db.session.delete(progress_pic)
         db.session.commit()
@@ -1498,34 +1340,15 @@ def edit_workout(workout_id):
         new_weight = float(data.get('weight', workout.weight))
         new_reps = int(data.get('reps', workout.reps))
         
-        # Check current PRs before updating
-        current_weight_pr = PersonalRecord.query.filter_by(
-            user_id=current_user.id, 
-            exercise=workout.exercise, 
-            pr_type='weight'
-        ).first()
-        current_reps_pr = PersonalRecord.query.filter_by(
-            user_id=current_user.id, 
-            exercise=workout.exercise, 
-            pr_type='reps'
-        ).first()
-        
         # Update workout data
         workout.weight = new_weight
         workout.reps = new_reps
+        workout.total_weight = new_weight + 45 if 'barbell' in workout.exercise.lower() else new_weight
         
+        # Update the PR index and report PRs the edit raised
+        new_prs = refresh_set_prs(workout)
         db.session.commit()
         
-        # Recalculate PRs for this exercise
-        recalculate_prs_for_exercise(current_user.id, workout.exercise)
-        
-        # Check which PRs were newly achieved
-        new_prs = []
-        if (not current_weight_pr or new_weight > current_weight_pr.value):
-            new_prs.append('weight')
-        if (not current_reps_pr or new_reps > current_reps_pr.value):
-            new_prs.append('reps')
-        
         return jsonify({
             'message': 'Workout updated successfully',
             'prs_updated': new_prs,
@@ -1545,12 +1368,9 @@ def delete_workout(workout_id):
         if not workout:
             return jsonify({'error': 'Workout not found or access denied'}), 404
         
-        # Delete the workout
-        db.session.delete(workout)
+        # Delete the workout, rebuilding the exercise's PRs if it held one
+        delete_workout_set(workout)
         db.session.commit()
-        
-        # Recalculate PRs for this exercise
-        recalculate_prs_for_exercise(current_user.id, workout.exercise)
         return jsonify({'message': 'Workout deleted successfully'})
     except Exception as e:
         db.session.rollback()
@@ -1559,7 +1379,15 @@ def delete_workout(workout_id):
 @fitness_bp.route('/api/personal_records')
 @login_required
 def get_personal_records():
-    prs = PersonalRecord.query.filter_by(user_id=current_user.id).all()
+    """Precomputed PRs for the user, optionally filtered with ?types=weight,e1rm,5rm"""
+    query = PersonalRecord.query.filter_by(user_id=current_user.id)
+    types = [t.strip() for t in request.args.get('types', '').split(',') if t.strip()]
+    if types:
+        unknown = [t for t in types if t not in PR_TYPES + ('milestone',)]
+        if unknown:
+            return jsonify({'error': f"Unknown PR types: {', '.join(unknown)}"}), 400
+        query = query.filter(PersonalRecord.pr_type.in_(types))
+    prs = query.order_by(PersonalRecord.exercise, PersonalRecord.pr_type).all()
     return jsonify([
         {
             'exercise': pr.exercise,
@@ -1570,6 +1398,16 @@ def get_personal_records():
         } for pr in prs
     ])
 
+PR_LABELS = {
+    'volume': 'Best Set Volume',
+    'e1rm': 'Estimated 1RM',
+    'e1rm_brzycki': 'Estimated 1RM (Brzycki)',
+    '1rm': '1 Rep Max',
+    '3rm': '3 Rep Max',
+    '5rm': '5 Rep Max',
+    '10rm': '10 Rep Max'
+}
+
 @fitness_bp.route('/api/personal_records/<exercise>')
 @login_required
 def get_exercise_prs(exercise):
@@ -1582,116 +1420,12 @@ def get_exercise_prs(exercise):
         {
             'pr_type': pr.pr_type,
             'value': pr.value,
-            'label': 'Total Weight' if is_barbell and pr.pr_type == 'weight' else pr.pr_type.capitalize(),
+            'label': 'Total Weight' if is_barbell and pr.pr_type == 'weight' else PR_LABELS.get(pr.pr_type, pr.pr_type.capitalize()),
             'date_achieved': pr.date_achieved.strftime('%Y-%m-%d'),
             'workout_id': pr.workout_id
         } for pr in prs
     ])
 
-# Utility function for PR detection
-
-def get_prs_achieved(user_id, exercise, weight, reps, sets, workout_id):
-    prs_achieved = []
-    for pr_type in ['weight', 'reps', 'volume']:
-        pr = PersonalRecord.query.filter_by(user_id=user_id, exercise=exercise, pr_type=pr_type).first()
-        if pr and pr.workout_id == workout_id:
-            prs_achieved.append(pr_type)
-    return prs_achieved
-
-# Minimal PR update function
-
-def update_prs_for_workout(user_id, exercise, weight, reps, sets, workout_id, date, total_weight):
-    from models import PersonalRecord
-    # Weight PR
-    pr_weight_value = total_weight if 'barbell' in exercise.lower() else weight
-    pr_weight = PersonalRecord.query.filter_by(user_id=user_id, exercise=exercise, pr_type='weight').first()
-    if not pr_weight or pr_weight_value > pr_weight.value:
-        if pr_weight:
-            db.session.delete(pr_weight)
-            db.session.flush()  # Ensure deletion is processed
-        new_pr = PersonalRecord(
-            user_id=user_id,
-            exercise=exercise,
-            pr_type='weight',
-            value=pr_weight_value,  # Store total_weight for barbell, weight for others
-            weight=weight,
-            reps=reps,
-            sets=sets,
-            date_achieved=date,
-            workout_id=workout_id
-        )
-        db.session.add(new_pr)
-    # Reps PR
-    pr_reps = PersonalRecord.query.filter_by(user_id=user_id, exercise=exercise, pr_type='reps').first()
-    if not pr_reps or reps > pr_reps.value:
-        if pr_reps:
-            db.session.delete(pr_reps)
-            db.session.flush()  # Ensure deletion is processed
-        new_pr = PersonalRecord(
-            user_id=user_id,
-            exercise=exercise,
-            pr_type='reps',
-            value=reps,
-            weight=weight,
-            reps=reps,
-            sets=sets,
-            date_achieved=date,
-            workout_id=workout_id
-        )
-        db.session.add(new_pr)
-    db.session.commit()
-
-def recalculate_prs_for_exercise(user_id, exercise):
-    """Recalculate PRs for an exercise after a workout is deleted or modified."""
-    from models import PersonalRecord, Workout
-    # Get all workouts for this user and exercise
-    workouts = Workout.query.filter_by(user_id=user_id, exercise=exercise).order_by(Workout.date.desc()).all()
-    # Delete existing PRs for this exercise
-    PersonalRecord.query.filter_by(user_id=user_id, exercise=exercise).delete()
-    db.session.flush()
-    # Find the best weight and reps
-    is_barbell = 'barbell' in exercise.lower()
-    best_weight = 0
-    best_reps = 0
-    best_weight_workout = None
-    best_reps_workout = None
-    for workout in workouts:
-        weight_value = workout.total_weight if is_barbell else workout.weight
-        if weight_value > best_weight:
-            best_weight = weight_value
-            best_weight_workout = workout
-        if workout.reps > best_reps:
-            best_reps = workout.reps
-            best_reps_workout = workout
-    # Create new PRs if we found better values
-    if best_weight_workout:
-        weight_pr = PersonalRecord(
-            user_id=user_id,
-            exercise=exercise,
-            pr_type='weight',
-            value=best_weight,
-            weight=best_weight_workout.weight,
-            reps=best_weight_workout.reps,
-            sets=best_weight_workout.sets,
-            date_achieved=best_weight_workout.date,
-            workout_id=best_weight_workout.id
-        )
-        db.session.add(weight_pr)
-    if best_reps_workout:
-        reps_pr = PersonalRecord(
-            user_id=user_id,
-            exercise=exercise,
-            pr_type='reps',
-            value=best_reps,
-            weight=best_reps_workout.weight,
-            reps=best_reps,
-            sets=best_reps_workout.sets,
-            date_achieved=best_reps_workout.date,
-            workout_id=best_reps_workout.id
-        )
-        db.session.add(reps_pr)
-    db.session.commit()
-
 # Fasting routes
 @fitness_bp.route('/start_fasting', methods=['POST'])
 @login_required
@@ -2057,7 +1791,7 @@ def leaderboard():
             return (
                 db.session.query(User.username, func.sum(Activity.miles).label('total_miles'))
                 .join(Activity, Activity.user_id == User.id)
-                .filter(Activity.type == activity_type)
+                .filter(Activity.activity_type == activity_type)
                 .group_by(User.id)
                 .order_by(db.desc('total_miles'))
                 .limit(10)
@@ -2163,6 +1897,7 @@ def delete_custom_exercise(id):
 
 @fitness_bp.route('/api/workout_templates', methods=['GET'])
 @login_required
+@conditional_get(WorkoutTemplate, WorkoutTemplateExercise)
 def get_workout_templates():
     """Get all workout templates for the current user"""
     try:
@@ -3030,25 +2765,10 @@ def log_set():
             total_weight=total_weight
         )
         db.session.add(workout)
+        db.session.flush()
+        # Update the PR index (total weight for barbell exercises) with the set
+        new_prs = record_set_prs(workout)
         db.session.commit()
-        current_weight_pr = PersonalRecord.query.filter_by(
-            user_id=current_user.id, 
-            exercise=exercise, 
-            pr_type='weight'
-        ).first()
-        current_reps_pr = PersonalRecord.query.filter_by(
-            user_id=current_user.id, 
-            exercise=exercise, 
-            pr_type='reps'
-        ).first()
-        # Update PRs (use total weight for barbell exercises)
-        update_prs_for_workout(current_user.id, exercise, weight, reps, 1, workout.id, session_date, total_weight)
-        new_prs = []
-        pr_weight = total_weight if is_barbell else weight
-        if (not current_weight_pr or pr_weight > current_weight_pr.value):
-            new_prs.append('weight')
-        if (not current_reps_pr or reps > current_reps_pr.value):
-            new_prs.append('reps')
         return jsonify({
             'id': workout.id,
             'set_number': workout.sets,
@@ -3071,21 +2791,10 @@ def delete_set(set_id):
         if not workout:
             return jsonify({'error': 'Set not found'}), 404
         
-        exercise_name = workout.exercise  # Save before deleting
-        db.session.delete(workout)
+        # Delete the set, rebuilding the exercise's PRs if it held one
+        delete_workout_set(workout)
         db.session.commit()
         
-        # Remove orphaned PRs (whose workout_id no longer exists)
-        from models import PersonalRecord, Workout
-        orphaned_prs = PersonalRecord.query.filter_by(user_id=current_user.id, exercise=exercise_name).all()
-        for pr in orphaned_prs:
-            if pr.workout_id is not None and not Workout.query.filter_by(id=pr.workout_id).first():
-                db.session.delete(pr)
-        db.session.commit()
-        
-        # Recalculate PRs for this exercise
-        recalculate_prs_for_exercise(current_user.id, exercise_name)
-        
         return jsonify({'message': 'Set deleted successfully'})
         
     except Exception as e:
@@ -3120,20 +2829,17 @@ def activity_miles_summary():
     except ValueError:
         return jsonify({'error': 'Invalid timeframe'}), 400
 
-    # Case-insensitive query for activity_type
-    activities = Activity.query.filter(
-        Activity.user_id == current_user.id,
-        Activity.date >= start_date,
-        Activity.miles != None,
-        func.lower(Activity.activity_type).in_(['walking', 'running', 'cycling'])
-    ).all()
-
-    summary = {'Walking': 0, 'Running': 0, 'Cycling': 0}
-    for a in activities:
-        key = a.activity_type.title()
-        if key in summary and a.miles:
-            summary[key] += a.miles
-
+    # Per-type miles are summed into the daily rollups
+    walking, running, cycling = db.session.query(
+        func.sum(DailyRollup.walking_miles),
+        func.sum(DailyRollup.running_miles),
+        func.sum(DailyRollup.cycling_miles)
+    ).filter(
+        DailyRollup.user_id == current_user.id,
+        DailyRollup.date >= start_date
+    ).one()
+
+    summary = {'Walking': walking or 0, 'Running': running or 0, 'Cycling': cycling or 0}
     summary = {k: round(v, 2) for k, v in summary.items()}
 
     return jsonify({'start_date': str(start_date), 'end_date': str(now), 'summary': summary})
@@ -3141,6 +2847,7 @@ def activity_miles_summary():
 @fitness_bp.route('/api/tdee/history')
 @login_required
 def get_tdee_history():
+    flush_dirty_tdee(current_user.id)
     tdee_records = TDEE.query.filter_by(user_id=current_user.id).order_by(TDEE.date.desc()).limit(30).all()
     return jsonify([
         {
@@ -3160,6 +2867,8 @@ def get_tdee_history():
 def get_tdee_summary():
     print(f"[TDEE API CALLED] Starting TDEE summary request")
     today = datetime.now().date()
+    # Rebuild any TDEE rows invalidated by writes since the last read
+    flush_dirty_tdee(current_user.id)
     # Get the existing TDEE record without recalculating
     tdee = TDEE.query.filter_by(user_id=current_user.id, date=today).first()
     if not tdee:
@@ -2,11 +2,63 @@ from flask import Blueprint, render_template, request, flash, redirect, url_for,
 from flask_login import login_required, current_user
 from models import db, FoodEntry, FoodReference, FoodCategory, FoodServingSize, FastingPeriod
 from datetime import datetime
-from sqlalchemy import or_
+from tdee_engine import mark_tdee_dirty
+from food_search import search_foods, food_detail_options
+from nutrition_cache import (get_nutrition_record, get_nutrition_records, nutrition_for_serving,
+                             serving_multiplier, nutrition_matrix, nutrition_cache_stats, NUTRIENT_FIELDS)
+from sqlalchemy import insert
+from daily_rollup import refresh_daily_rollups
+from conditional_get import conditional_get
+from routes.debug_routes import admin_required
 import json
 
 food_bp = Blueprint('food_bp', __name__)
 
+def _serialize_food(food):
+    """Serialize a FoodReference for search and barcode responses.
+
+    Expects category and serving_sizes to be loaded (food_detail_options) so
+    no per-food queries are issued.
+    """
+    common_servings = food.get_common_serving_sizes()
+    default_serving = food.get_default_serving_size()
+    
+    return {
+        'id': food.id,
+        'name': food.food_name,
+        'brand': food.brand or '',
+        'category': food.category.name if food.category else '',
+        'barcode': food.barcode or '',
+        'nutrition': {
+            'calories': food.calories,
+            'protein': food.protein or 0,
+            'carbs': food.carbs or 0,
+            'fat': food.fat or 0,
+            'fiber': food.fiber or 0,
+            'sugar': food.sugar or 0,
+            'sodium': food.sodium or 0
+        },
+        'serving_size': food.serving_size or '100g',
+        'is_verified': food.is_verified,
+        'common_serving_sizes': [
+            {
+                'id': serving.id,
+                'description': serving.description,
+                'amount': serving.amount,
+                'unit': serving.unit,
+                'grams_equivalent': serving.grams_equivalent,
+                'is_default': serving.is_default
+            } for serving in common_servings
+        ],
+        'default_serving_size': {
+            'id': default_serving.id,
+            'description': default_serving.description,
+            'amount': default_serving.amount,
+            'unit': default_serving.unit,
+            'grams_equivalent': default_serving.grams_equivalent
+        } if default_serving else None
+    }
+
 @food_bp.route('/food')
 def food_page():
     # Redirect to dashboard since we're consolidating to use dashboard food tab
@@ -19,63 +71,14 @@ def search_food():
         return jsonify({'error': 'A search query is required.'}), 400
 
     try:
-        # Search in food names and keywords
-        search_term = f"%{query}%"
-        
-        foods = FoodReference.query.filter(
-            or_(
-                FoodReference.food_name.ilike(search_term),
-                FoodReference.search_keywords.ilike(search_term)
-            )
-        ).limit(20).all()
+        # Ranked full-text search over food names, brands and keywords
+        foods = search_foods(query, limit=20)
         
         if not foods:
             # Try broader search
-            foods = FoodReference.query.filter(
-                FoodReference.food_name.ilike(f"%{query.split()[0]}%")
-            ).limit(10).all()
+            foods = search_foods(query, limit=10, match_any=True)
         
-        results = []
-        for food in foods:
-            # Get common serving sizes
-            common_servings = food.get_common_serving_sizes()
-            default_serving = food.get_default_serving_size()
-            
-            results.append({
-                'id': food.id,
-                'name': food.food_name,
-                'brand': food.brand or '',
-                'category': food.category.name if food.category else '',
-                'barcode': food.barcode or '',
-                'nutrition': {
-                    'calories': food.calories,
-                    'protein': food.protein or 0,
-                    'carbs': food.carbs or 0,
-                    'fat': food.fat or 0,
-                    'fiber': food.fiber or 0,
-                    'sugar': food.sugar or 0,
-                    'sodium': food.sodium or 0
-                },
-                'serving_size': food.serving_size or '100g',
-                'is_verified': food.is_verified,
-                'common_serving_sizes': [
-                    {
-                        'id': serving.id,
-                        'description': serving.description,
-                        'amount': serving.amount,
-                        'unit': serving.unit,
-                        'grams_equivalent': serving.grams_equivalent,
-                        'is_default': serving.is_default
-                    } for serving in common_servings
-                ],
-                'default_serving_size': {
-                    'id': default_serving.id,
-                    'description': default_serving.description,
-                    'amount': default_serving.amount,
-                    'unit': default_serving.unit,
-                    'grams_equivalent': default_serving.grams_equivalent
-                } if default_serving else None
-            })
+        results = [_serialize_food(food) for food in foods]
         
         return jsonify({
             'foods': results,
@@ -94,7 +97,7 @@ def search_by_barcode(barcode):
 
     try:
         # Search for exact barcode match
-        food = FoodReference.query.filter_by(barcode=barcode).first()
+        food = FoodReference.query.options(*food_detail_options()).filter_by(barcode=barcode).first()
         
         if not food:
             return jsonify({
@@ -102,45 +105,7 @@ def search_by_barcode(barcode):
                 'barcode': barcode
             }), 404
         
-        # Get common serving sizes
-        common_servings = food.get_common_serving_sizes()
-        default_serving = food.get_default_serving_size()
-        
-        result = {
-            'id': food.id,
-            'name': food.food_name,
-            'brand': food.brand or '',
-            'category': food.category.name if food.category else '',
-            'barcode': food.barcode or '',
-            'nutrition': {
-                'calories': food.calories,
-                'protein': food.protein or 0,
-                'carbs': food.carbs or 0,
-                'fat': food.fat or 0,
-                'fiber': food.fiber or 0,
-                'sugar': food.sugar or 0,
-                'sodium': food.sodium or 0
-            },
-            'serving_size': food.serving_size or '100g',
-            'is_verified': food.is_verified,
-            'common_serving_sizes': [
-                {
-                    'id': serving.id,
-                    'description': serving.description,
-                    'amount': serving.amount,
-                    'unit': serving.unit,
-                    'grams_equivalent': serving.grams_equivalent,
-                    'is_default': serving.is_default
-                } for serving in common_servings
-            ],
-            'default_serving_size': {
-                'id': default_serving.id,
-                'description': default_serving.description,
-                'amount': default_serving.amount,
-                'unit': default_serving.unit,
-                'grams_equivalent': default_serving.grams_equivalent
-            } if default_serving else None
-        }
+        result = _serialize_food(food)
         
         return jsonify({
             'food': result,
@@ -155,12 +120,13 @@ def search_by_barcode(barcode):
 def get_food_serving_sizes(food_id):
     """Get all serving sizes for a specific food"""
     try:
-        food = FoodReference.query.get_or_404(food_id)
-        serving_sizes = FoodServingSize.query.filter_by(food_id=food_id).order_by(FoodServingSize.amount).all()
+        record = get_nutrition_record(food_id)
+        if record is None:
+            return jsonify({'error': 'Food not found'}), 404
         
         return jsonify({
             'food_id': food_id,
-            'food_name': food.food_name,
+            'food_name': record.food_name,
             'serving_sizes': [
                 {
                     'id': serving.id,
@@ -170,7 +136,7 @@ def get_food_serving_sizes(food_id):
                     'grams_equivalent': serving.grams_equivalent,
                     'is_common': serving.is_common,
                     'is_default': serving.is_default
-                } for serving in serving_sizes
+                } for serving in record.serving_sizes
             ]
         })
         
@@ -182,16 +148,18 @@ def get_food_serving_sizes(food_id):
 def get_food_nutrition(food_id):
     """Get nutrition information for a food with specific serving size"""
     try:
-        food = FoodReference.query.get_or_404(food_id)
+        record = get_nutrition_record(food_id)
+        if record is None:
+            return jsonify({'error': 'Food not found'}), 404
         serving_size_id = request.args.get('serving_size_id', type=int)
         amount = request.args.get('amount', 100, type=float)
         unit = request.args.get('unit', 'g')
         
-        nutrition = food.get_nutrition_for_serving(serving_size_id, amount, unit)
+        nutrition = nutrition_for_serving(record, serving_size_id, amount, unit)
         
         return jsonify({
             'food_id': food_id,
-            'food_name': food.food_name,
+            'food_name': record.food_name,
             'amount': amount,
             'unit': unit,
             'serving_size_id': serving_size_id,
@@ -202,6 +170,12 @@ def get_food_nutrition(food_id):
         print(f"Nutrition calculation error: {e}")
         return jsonify({'error': 'Failed to calculate nutrition'}), 500
 
+@food_bp.route('/nutrition/cache_stats')
+@admin_required
+def get_nutrition_cache_stats():
+    """Hit/miss counters for the in-process nutrition cache"""
+    return jsonify(nutrition_cache_stats())
+
 @food_bp.route('/food_entry', methods=['POST'])
 @login_required
 def add_food_entry():
@@ -214,19 +188,25 @@ def add_food_entry():
         # Handle two different data formats
         if 'food_id' in data:
             # Frontend is sending food_id, quantity, serving_size_id, date
-            food_id = data.get('food_id')
+            try:
+                # Cached by int id; a JSON "12" must not get its own cache entry
+                food_id = int(data['food_id'])
+                serving_size_id = data.get('serving_size_id')
+                if serving_size_id is not None:
+                    serving_size_id = int(serving_size_id)
+            except (TypeError, ValueError):
+                return jsonify({'error': 'food_id and serving_size_id must be integers.'}), 400
             quantity = float(data.get('quantity', 100))
-            serving_size_id = data.get('serving_size_id')
             date_str = data.get('date', datetime.now().date().strftime('%Y-%m-%d'))
             date = datetime.strptime(date_str, '%Y-%m-%d').date()
             
             # Get food reference
-            food_ref = FoodReference.query.get(food_id)
+            food_ref = get_nutrition_record(food_id)
             if not food_ref:
                 return jsonify({'error': 'Food not found'}), 404
             
             # Calculate nutrition based on serving size and quantity
-            nutrition = food_ref.get_nutrition_for_serving(serving_size_id, quantity, 'g')
+            nutrition = nutrition_for_serving(food_ref, serving_size_id, quantity, 'g')
             
             # Create food entry
             food_entry = FoodEntry()
@@ -257,12 +237,10 @@ def add_food_entry():
             food_entry.unit = data.get('unit', 'g')
         
         db.session.add(food_entry)
+        # TDEE for the date is rebuilt lazily on the next read
+        mark_tdee_dirty(current_user.id, food_entry.date)
         db.session.commit()
         
-        # Update TDEE for the date
-        from routes.fitness_routes import update_tdee_for_date
-        update_tdee_for_date(current_user.id, food_entry.date)
-        
         return jsonify({
             'success': True,
             'message': f'Added {food_entry.food_name} to your food log'
@@ -273,7 +251,81 @@ def add_food_entry():
         print(f"Food entry error: {e}")
         return jsonify({'error': 'Failed to add food entry'}), 500
 
+MAX_MEAL_ITEMS = 100
+
+@food_bp.route('/meal', methods=['POST'])
+@login_required
+def add_meal():
+    """Log several foods at once.
+
+    Expects {date, items: [{food_id, quantity, serving_size_id}]}; each item is
+    scaled the same way as /food/food_entry.
+    """
+    try:
+        data = request.get_json()
+        if not data or not isinstance(data.get('items'), list) or not data['items']:
+            return jsonify({'error': 'At least one item is required.'}), 400
+        items = data['items']
+        if len(items) > MAX_MEAL_ITEMS:
+            return jsonify({'error': f'A meal can have at most {MAX_MEAL_ITEMS} items.'}), 400
+        
+        date_str = data.get('date', datetime.now().date().strftime('%Y-%m-%d'))
+        try:
+            date = datetime.strptime(date_str, '%Y-%m-%d').date()
+            food_ids = [int(item['food_id']) for item in items]
+            quantities = [float(item.get('quantity', 100)) for item in items]
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'error': 'Each item needs a food_id and a numeric quantity.'}), 400
+        
+        records = get_nutrition_records(food_ids)
+        missing = sorted(set(food_ids) - set(records))
+        if missing:
+            return jsonify({'error': 'Food not found', 'food_ids': missing}), 404
+        
+        meal_records = [records[food_id] for food_id in food_ids]
+        multipliers = [
+            serving_multiplier(record, item.get('serving_size_id'), quantity, 'g')
+            for record, item, quantity in zip(meal_records, items, quantities)
+        ]
+        nutrition = nutrition_matrix(meal_records, multipliers)
+        calories, protein, carbs, fat = (nutrition[:, NUTRIENT_FIELDS.index(field)]
+                                         for field in ('calories', 'protein', 'carbs', 'fat'))
+        
+        entries = [
+            {
+                'user_id': current_user.id,
+                'date': date,
+                'food_name': record.food_name,
+                'calories': int(calories[i]),
+                'protein': float(protein[i]),
+                'carbs': float(carbs[i]),
+                'fat': float(fat[i]),
+                'quantity': quantities[i],
+                'unit': 'g'
+            } for i, record in enumerate(meal_records)
+        ]
+        db.session.execute(insert(FoodEntry), entries)
+        # One dirty mark covers every entry; TDEE is rebuilt lazily on the next read
+        mark_tdee_dirty(current_user.id, date)
+        # Core inserts skip the ORM flush hooks, so refresh the day's rollup here
+        refresh_daily_rollups([(current_user.id, date)])
+        db.session.commit()
+        
+        totals = nutrition.sum(axis=0)
+        return jsonify({
+            'success': True,
+            'message': f'Added {len(entries)} foods to your food log',
+            'count': len(entries),
+            'totals': {field: round(float(value), 1) for field, value in zip(NUTRIENT_FIELDS, totals)}
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        print(f"Meal entry error: {e}")
+        return jsonify({'error': 'Failed to add meal'}), 500
+
 @food_bp.route('/categories')
+@conditional_get(FoodCategory)
 def get_categories():
     """Get all food categories"""
     try:
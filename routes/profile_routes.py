@@ -3,6 +3,8 @@ from flask_login import login_required, current_user
 from models import db, User, UserSettings
 from datetime import datetime
 import json
+from tdee_engine import mark_all_tdee_dirty
+from routes.dashboard_routes import DASHBOARD_SECTIONS, stored_dashboard_sections
 
 profile_bp = Blueprint('profile', __name__)
 
@@ -54,7 +56,8 @@ def get_profile():
                 'profile_visibility': settings.profile_visibility,
                 'share_progress': settings.share_progress,
                 'auto_backup': settings.auto_backup,
-                'data_retention_days': settings.data_retention_days
+                'data_retention_days': settings.data_retention_days,
+                'dashboard_sections': stored_dashboard_sections(settings)
             }
         })
     except Exception as e:
@@ -94,12 +97,11 @@ def update_profile():
         if 'birthdate' in data:
             user.birthdate = datetime.strptime(data['birthdate'], '%Y-%m-%d').date() if data['birthdate'] else None
         
-        db.session.commit()
-        
-        # If BMR-affecting data changed, update all TDEE records
+        # If BMR-affecting data changed, every TDEE record is stale
         if bmr_affecting_changed:
-            from routes.fitness_routes import update_all_tdee_records
-            update_all_tdee_records(current_user.id)
+            mark_all_tdee_dirty(current_user.id)
+        
+        db.session.commit()
         
         return jsonify({'message': 'Profile updated successfully'})
     except Exception as e:
@@ -118,6 +120,10 @@ def update_settings():
             settings = UserSettings(user_id=current_user.id)
             db.session.add(settings)
         
+        # Units and activity level feed into TDEE calculations
+        tdee_affecting_changed = ('units' in data and settings.units != data['units']) or \
+            ('activity_level' in data and settings.activity_level != data['activity_level'])
+        
         # Update settings fields
         if 'theme' in data:
             settings.theme = data['theme']
@@ -147,8 +153,19 @@ def update_settings():
             settings.auto_backup = bool(data['auto_backup'])
         if 'data_retention_days' in data:
             settings.data_retention_days = int(data['data_retention_days'])
+        if 'dashboard_sections' in data:
+            # null restores the default (every section)
+            sections = data['dashboard_sections']
+            if sections is not None:
+                unknown = [s for s in sections if s not in DASHBOARD_SECTIONS]
+                if unknown:
+                    return jsonify({'error': f"Unknown dashboard sections: {', '.join(unknown)}"}), 400
+                sections = json.dumps(sections)
+            settings.dashboard_sections = sections
         
         settings.updated_at = datetime.utcnow()
+        if tdee_affecting_changed:
+            mark_all_tdee_dirty(current_user.id)
         db.session.commit()
         
         return jsonify({'message': 'Settings updated successfully'})
@@ -4,6 +4,7 @@ from datetime import datetime
 from io import StringIO
 import csv
 from models import db, Trade, PnL, WeeklyReview
+from conditional_get import conditional_get
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -12,6 +13,7 @@ logger = logging.getLogger(__name__)
 trading_bp = Blueprint('trading', __name__)
 
 @trading_bp.route('/api/trades', methods=['GET'])
+@conditional_get(Trade)
 def get_trades():
     try:
         id = request.args.get('id')
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Script to audit the query plans of the hot per-user endpoints.
+
+Seeds a scratch database with the synthetic dataset (see
+seed_synthetic_data.py), runs EXPLAIN on the query each endpoint issues and
+flags full table scans and temporary sorts. Exits non-zero if any query
+does a full scan, so it can gate index regressions.
+
+Usage: python scripts/audit_query_plans.py [--database-url URL] [--users 50] [--days 365] [--json]
+
+Without --database-url a temporary SQLite database is created and removed.
+"""
+
+import sys
+import os
+import argparse
+import json
+import re
+import tempfile
+from datetime import date, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from seed_synthetic_data import seed_synthetic_data
+
+def hot_queries(user_id, today):
+    """(endpoint, query) pairs mirroring the queries the routes issue."""
+    from sqlalchemy import func
+    from models import db, Workout, FoodEntry, Activity, Stat, Mood, TDEE, PersonalRecord, TDEEDirtyDate, DailyRollup
+
+    week_ago = today - timedelta(days=7)
+    exercise = 'Barbell Squat'
+    return [
+        ('GET /api/tdee', TDEE.query.filter_by(user_id=user_id, date=today)),
+        ('GET /api/tdee (activities)', Activity.query.filter_by(user_id=user_id, date=today)),
+        ('GET /api/tdee (rollup)', DailyRollup.query.filter_by(user_id=user_id, date=today)),
+        ('GET /api/tdee (latest stat)', Stat.query.filter_by(user_id=user_id).order_by(Stat.date.desc()).limit(1)),
+        ('GET /api/tdee_history', TDEE.query.filter(TDEE.user_id == user_id, TDEE.date < today)
+            .order_by(TDEE.date.desc()).limit(90)),
+        ('GET /api/tdee_history (activity levels)', db.session.query(func.max(Activity.id)).filter(
+            Activity.user_id == user_id, Activity.date >= today - timedelta(days=90),
+            Activity.activity_level.isnot(None)).group_by(Activity.date)),
+        ('TDEE dirty ledger', TDEEDirtyDate.query.filter_by(user_id=user_id).order_by(TDEEDirtyDate.date)),
+        ('GET /fitness/api/data', Stat.query.filter_by(user_id=user_id)),
+        ('GET /fitness/api/latest_weight', DailyRollup.query.filter(
+            DailyRollup.user_id == user_id, DailyRollup.weight.isnot(None)).order_by(DailyRollup.date.desc()).limit(1)),
+        ('GET /fitness/api/food_entries', FoodEntry.query.filter_by(user_id=user_id).order_by(FoodEntry.date.desc())),
+        ('GET /fitness/api/daily_nutrition', DailyRollup.query.filter_by(user_id=user_id, date=today)),
+        ('GET /fitness/api/daily_nutrition (entries)', FoodEntry.query.filter_by(user_id=user_id, date=today)),
+        ('GET /fitness/api/activities', Activity.query.filter_by(user_id=user_id, date=today)),
+        ('GET /fitness/api/activity_miles_summary', db.session.query(func.sum(DailyRollup.walking_miles)).filter(
+            DailyRollup.user_id == user_id, DailyRollup.date >= today - timedelta(days=30))),
+        ('GET /fitness/api/recent_activity', DailyRollup.query.filter(
+            DailyRollup.user_id == user_id, DailyRollup.date >= week_ago, DailyRollup.date <= today)
+            .order_by(DailyRollup.date.desc())),
+        ('GET /fitness/api/weekly_workouts', db.session.query(func.sum(DailyRollup.workout_sets)).filter(
+            DailyRollup.user_id == user_id, DailyRollup.date >= week_ago, DailyRollup.date <= today)),
+        ('Daily rollup refresh (food)', db.session.query(FoodEntry.date, func.sum(FoodEntry.calories)).filter(
+            FoodEntry.user_id == user_id, FoodEntry.date.in_([today])).group_by(FoodEntry.date)),
+        ('GET /fitness/api/workouts', Workout.query.filter_by(user_id=user_id).order_by(Workout.date.desc())),
+        ('GET /fitness/api/workout_history', Workout.query.filter_by(user_id=user_id).order_by(Workout.date.desc()).limit(100)),
+        ('GET /fitness/api/workouts_by_date', Workout.query.filter_by(user_id=user_id, date=today).order_by(Workout.id)),
+        ('GET /fitness/api/todays_workout', Workout.query.filter_by(user_id=user_id, date=today).order_by(Workout.id.desc())),
+        ('GET /fitness/api/todays_sets', Workout.query.filter_by(
+            user_id=user_id, exercise=exercise, date=today).order_by(Workout.sets)),
+        ('GET /fitness/api/exercise_history', Workout.query.filter_by(
+            user_id=user_id, exercise=exercise).order_by(Workout.date.desc(), Workout.sets).limit(50)),
+        ('GET /fitness/api/last_workout', Workout.query.filter_by(
+            user_id=user_id, exercise=exercise).order_by(Workout.date.desc(), Workout.id.desc()).limit(1)),
+        ('POST /fitness/api/log_set (last set)', Workout.query.filter_by(
+            user_id=user_id, exercise=exercise, date=today).order_by(Workout.sets.desc()).limit(1)),
+        ('GET /fitness/api/personal_records', PersonalRecord.query.filter_by(user_id=user_id)),
+        ('GET /fitness/api/personal_records?types=', PersonalRecord.query.filter(
+            PersonalRecord.user_id == user_id, PersonalRecord.pr_type.in_(['e1rm', '5rm']))),
+        ('GET /fitness/api/personal_records/<exercise>', PersonalRecord.query.filter_by(user_id=user_id, exercise=exercise)),
+        ('PR rebuild (max per type)', db.session.query(func.max(Workout.weight)).filter(
+            Workout.user_id == user_id, Workout.exercise == exercise)),
+        ('GET /mood/api/mood', Mood.query.filter_by(user_id=user_id)),
+    ]
+
+def _statement(query):
+    return query.statement if hasattr(query, 'statement') else query
+
+def explain(query):
+    """Return the plan lines for a query on the current database."""
+    from models import db
+    dialect = db.engine.dialect
+    sql = str(_statement(query).compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+    connection = db.session.connection()
+    if dialect.name == 'sqlite':
+        return [row[3] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+    return [row[0] for row in connection.exec_driver_sql(f"EXPLAIN {sql}")]
+
+# SQLite: "SCAN workout" without an index; Postgres: "Seq Scan on workout"
+FULL_SCAN = re.compile(r'^(SCAN (?!.*USING (COVERING )?INDEX)\w+|.*Seq Scan on \w+)')
+TEMP_SORT = re.compile(r'USE TEMP B-TREE|Sort Method|^\s*->\s*Sort\b|^Sort\b')
+
+def audit(user_id, today):
+    results = []
+    for endpoint, query in hot_queries(user_id, today):
+        plan = explain(query)
+        results.append({
+            'endpoint': endpoint,
+            'plan': plan,
+            'full_scan': any(FULL_SCAN.search(line.strip()) for line in plan),
+            'temp_sort': any(TEMP_SORT.search(line) for line in plan)
+        })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='EXPLAIN the hot endpoint queries against a seeded database')
+    parser.add_argument('--database-url', help='Scratch database to seed (default: a temporary SQLite file)')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+    args = parser.parse_args()
+
+    temp_path = None
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        fd, temp_path = tempfile.mkstemp(suffix='.db', prefix='plan-audit-')
+        os.close(fd)
+        os.environ['DATABASE_URL'] = f'sqlite:///{temp_path}'
+
+    from app import app, db
+    from models import User
+
+    try:
+        with app.app_context():
+            db.create_all()
+            if not User.query.filter(User.google_id.like('synthetic-%')).first():
+                print(f"Seeding {args.users} users x {args.days} days...", file=sys.stderr)
+                seed_synthetic_data(args.users, args.days, args.seed)
+            db.session.execute(db.text('ANALYZE'))
+            user_id = User.query.filter(User.google_id.like('synthetic-%')).order_by(User.id).first().id
+            results = audit(user_id, date.today())
+            db.session.rollback()
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+
+    flagged = [r for r in results if r['full_scan']]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            status = 'FULL SCAN' if result['full_scan'] else ('temp sort' if result['temp_sort'] else 'ok')
+            print(f"{status:10} {result['endpoint']}")
+            for line in result['plan']:
+                print(f"           {line}")
+        print(f"\n{len(flagged)} of {len(results)} queries do a full table scan")
+    sys.exit(1 if flagged else 0)
+
+if __name__ == "__main__":
+    main()
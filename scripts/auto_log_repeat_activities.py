@@ -2,6 +2,7 @@ from datetime import date, datetime
 # OLD: from app import create_app, db
 from app import app, db
 from models import RepeatActivity, Activity
+from tdee_engine import mark_tdee_dirty
 
 def is_due_today(repeat, today):
     # Check if today is within start/end date and matches day of week
@@ -36,6 +37,7 @@ def auto_log_for_all_users():
                     miles=repeat.miles
                 )
                 db.session.add(activity)
+                mark_tdee_dirty(repeat.user_id, today)
     db.session.commit()
 
 if __name__ == '__main__':
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Script to OCR a folder of past InBody scans in one go.
+
+Images are fanned out over a process pool (one worker per CPU by default)
+and one JSON line per image is written as each finishes: path, SHA-256,
+scan date, metrics, timings and any error. A manifest (JSONL, by default
+.ocr_manifest.jsonl in the first folder given) records every image read
+successfully; images already in it are skipped, so an interrupted run
+picks up where it stopped.
+
+With --user (id or email) results also go through the OCR cache (scans
+already read skip the pool and new results are cached) and, with
+--create-stats, become that user's Stat rows: one per scan date,
+committed in batches. A day that already has a Stat only gets its empty
+fields filled, as with add_stat uploads.
+
+The scan date is taken from the photo's EXIF date, else a YYYYMMDD in the
+filename, else the file's modification time.
+
+Usage: python scripts/batch_ocr.py FOLDER_OR_IMAGE [...] [--workers N] [--output results.jsonl]
+       [--manifest PATH] [--user ID_OR_EMAIL [--create-stats]] [--batch-size 50]
+"""
+
+import sys
+import os
+import argparse
+import json
+import multiprocessing
+import re
+import time
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+_FILENAME_DATE = re.compile(r'(20\d{2})(\d{2})(\d{2})')
+
+def find_images(paths):
+    images = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _dirs, files in os.walk(path):
+                images.extend(os.path.join(root, name) for name in sorted(files)
+                              if name.lower().endswith(IMAGE_EXTENSIONS))
+        elif path.lower().endswith(IMAGE_EXTENSIONS):
+            images.append(path)
+    return sorted(set(os.path.abspath(image) for image in images))
+
+def scan_date(path):
+    """Date the scan was taken, as YYYY-MM-DD."""
+    from PIL import Image
+    try:
+        with Image.open(path) as image:
+            # DateTimeOriginal lives in the Exif IFD; DateTime is the fallback in the main IFD
+            exif = image.getexif()
+            taken = exif.get_ifd(0x8769).get(0x9003) or exif.get(0x0132)
+        if taken:
+            return datetime.strptime(taken.strip(), '%Y:%m:%d %H:%M:%S').date().isoformat()
+    except (OSError, ValueError):
+        pass
+    match = _FILENAME_DATE.search(os.path.basename(path))
+    if match:
+        try:
+            return datetime(*map(int, match.groups())).date().isoformat()
+        except ValueError:
+            pass
+    return datetime.fromtimestamp(os.path.getmtime(path)).date().isoformat()
+
+def ocr_image(path):
+    """Pool worker: hash, date and OCR one image."""
+    from ocr_processor import run_ocr_job
+    from ocr_cache import file_sha256, perceptual_hash
+    start = time.perf_counter()
+    result = {'path': path}
+    try:
+        result['sha256'] = file_sha256(path)
+        result['date'] = scan_date(path)
+        result['phash'] = perceptual_hash(path)
+        result.update(run_ocr_job(path))
+    except Exception as e:
+        result['error'] = str(e)
+    result['status'] = 'failed' if 'error' in result else 'ok'
+    result['total_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+def read_manifest(path):
+    done = set()
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    done.add(json.loads(line)['sha256'])
+    return done
+
+class StatWriter:
+    """Creates or fills the user's Stat rows for OCR results, a batch per commit.
+
+    The user's Stats on the scan dates are loaded up front in one query."""
+
+    def __init__(self, user_id, dates):
+        from models import Stat
+        self.user_id = user_id
+        days = [datetime.strptime(date, '%Y-%m-%d').date() for date in dates]
+        self.stats = {stat.date: stat for stat in Stat.query.filter(Stat.user_id == user_id, Stat.date.in_(days))}
+
+    def add(self, result):
+        """The Stat the result went into, or None; nothing is flushed."""
+        from models import Stat, db
+        from ocr_jobs import OCR_STAT_FIELDS, apply_metrics_to_stat
+        from tdee_engine import mark_tdee_dirty
+        metrics = {field: result['metrics'][field] for field in OCR_STAT_FIELDS if result['metrics'].get(field) is not None}
+        if not metrics:
+            return None
+        day = datetime.strptime(result['date'], '%Y-%m-%d').date()
+        stat = self.stats.get(day)
+        if stat is not None:
+            if stat.id is None:
+                # A second scan of a day created earlier in this batch
+                db.session.flush()
+            apply_metrics_to_stat(stat.id, metrics)
+        else:
+            stat = self.stats[day] = Stat(user_id=self.user_id, date=day, **metrics)
+            db.session.add(stat)
+            # A new BMR changes TDEE from this date on
+            if stat.bmr is not None:
+                mark_tdee_dirty(self.user_id, day, cascade_forward=True)
+        return stat
+
+def resolve_user(identifier):
+    from models import User
+    user = User.query.filter_by(id=int(identifier)).first() if identifier.isdigit() else \
+        User.query.filter_by(email=identifier.lower()).first()
+    if user is None:
+        raise SystemExit(f"No user {identifier}")
+    return user.id
+
+def run(args, images, out, manifest, user_id=None, db=None):
+    from ocr_cache import file_sha256, find_cached_scan, cached_metrics, store_scan_result
+    from ocr_processor import init_ocr_worker
+
+    writer = StatWriter(user_id, {scan_date(path) for path in images}) if args.create_stats else None
+    counts = {'ok': 0, 'failed': 0, 'cached': 0}
+    # Results are written out (and added to the manifest) only once their rows are committed,
+    # so an interrupted run redoes exactly the scans whose Stats were rolled back
+    pending = []
+
+    def commit():
+        stats = [result.pop('stat', None) for result in pending]
+        if db is not None:
+            db.session.flush()
+            stat_ids = [stat.id if stat is not None else None for stat in stats]
+            db.session.commit()
+            if writer:
+                for result, stat_id in zip(pending, stat_ids):
+                    result['stat_id'] = stat_id
+        for result in pending:
+            result.pop('text', None)
+            out.write(json.dumps(result) + '\n')
+            if result['status'] == 'ok':
+                manifest.write(json.dumps({'sha256': result['sha256'], 'path': result['path'],
+                                           'processed_at': datetime.utcnow().isoformat()}) + '\n')
+            counts['cached' if result.get('cache_hit') else result['status']] += 1
+        out.flush()
+        manifest.flush()
+        pending.clear()
+
+    def record(result):
+        if writer and result['status'] == 'ok':
+            result['stat'] = writer.add(result)
+        if user_id and result['status'] == 'ok' and not result.get('cache_hit'):
+            store_scan_result(user_id, result['sha256'], result['phash'], result['text'], result['metrics'])
+        pending.append(result)
+        if len(pending) >= (args.batch_size if db is not None else 1):
+            commit()
+
+    to_ocr = images
+    try:
+        if user_id:
+            # Scans already in the OCR cache need no worker
+            to_ocr = []
+            for path in images:
+                start = time.perf_counter()
+                sha256 = file_sha256(path)
+                entry = find_cached_scan(sha256)
+                if entry is None:
+                    to_ocr.append(path)
+                    continue
+                record({'path': path, 'sha256': sha256, 'date': scan_date(path), 'metrics': cached_metrics(entry),
+                        'cache_hit': 'exact', 'status': 'ok', 'total_ms': round((time.perf_counter() - start) * 1000, 1)})
+
+        if to_ocr:
+            workers = min(args.workers, len(to_ocr))
+            # spawn: OpenCV and any open DB connection do not survive fork safely
+            with multiprocessing.get_context('spawn').Pool(workers, initializer=init_ocr_worker) as pool:
+                for result in pool.imap_unordered(ocr_image, to_ocr):
+                    record(result)
+        commit()
+    except BaseException:
+        if db is not None:
+            db.session.rollback()
+        raise
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description='OCR a folder of InBody scans to JSONL, optionally creating Stats')
+    parser.add_argument('paths', nargs='+', help='Image files or folders (searched recursively)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--output', help='JSONL output file, appended to (default: stdout)')
+    parser.add_argument('--manifest', help='Manifest of processed images (default: FOLDER/.ocr_manifest.jsonl)')
+    parser.add_argument('--user', help='User id or email whose OCR cache and Stats to use')
+    parser.add_argument('--create-stats', action='store_true', help="Create the user's Stat rows from the metrics")
+    parser.add_argument('--batch-size', type=int, default=50, help='Scans per commit (with --user)')
+    args = parser.parse_args()
+    if args.create_stats and not args.user:
+        parser.error('--create-stats needs --user')
+
+    first = args.paths[0]
+    manifest_path = args.manifest or os.path.join(first if os.path.isdir(first) else os.path.dirname(first) or '.',
+                                                  '.ocr_manifest.jsonl')
+    from ocr_cache import file_sha256
+    done = read_manifest(manifest_path)
+    found = find_images(args.paths)
+    images = [path for path in found if not done or file_sha256(path) not in done]
+    skipped = len(found) - len(images)
+    print(f"{len(images)} images to process, {skipped} already in {manifest_path}", file=sys.stderr)
+
+    start = time.perf_counter()
+    out = open(args.output, 'a') if args.output else sys.stdout
+    try:
+        with open(manifest_path, 'a') as manifest:
+            if args.user:
+                from app import app, db
+                with app.app_context():
+                    counts = run(args, images, out, manifest, resolve_user(args.user), db)
+            else:
+                counts = run(args, images, out, manifest)
+    finally:
+        if args.output:
+            out.close()
+    print(f"Done in {time.perf_counter() - start:.1f}s: {counts['ok']} read, {counts['cached']} from cache, "
+          f"{counts['failed']} failed, {skipped} skipped", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
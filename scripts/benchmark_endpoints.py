@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Script to benchmark the dashboard endpoints against a large synthetic account base.
+
+Seeds a SQLite database (see seed_synthetic_data.py) with the requested
+volume, drives the Flask test client against each endpoint as rotating
+users and reports p50/p95 latency, SQL queries per request and peak RSS as
+JSON, so runs can be saved and compared over time.
+
+Usage: python scripts/benchmark_endpoints.py [--users 1000] [--days 1825] [--foods 500000]
+       [--requests 50] [--database-url URL] [--output results.json]
+
+Without --database-url a temporary SQLite database is seeded and removed.
+Reusing a seeded --database-url skips the (slow) seeding step.
+"""
+
+import sys
+import os
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, date, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from seed_synthetic_data import seed_synthetic_data, seed_food_references
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SEARCH_TERMS = ['chicken', 'rice', 'greek yogurt', 'peanut butter', 'pizza', 'oat', 'salmon grilled', 'tofu']
+
+def endpoint_urls(iteration):
+    """Endpoint name -> URL for one request; parameters rotate so caches do not flatter the numbers."""
+    day = date.today() - timedelta(days=iteration % 30)
+    return {
+        'GET /api/tdee': f'/api/tdee?date={day:%Y-%m-%d}',
+        'GET /fitness/api/data': '/fitness/api/data',
+        'GET /food/search': f'/food/search?q={SEARCH_TERMS[iteration % len(SEARCH_TERMS)]}',
+        'GET /fitness/api/recent_activity': '/fitness/api/recent_activity',
+        'GET /fitness/api/leaderboard': '/fitness/api/leaderboard',
+        'GET /api/dashboard/bootstrap': '/api/dashboard/bootstrap',
+    }
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def client_for(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+    return client
+
+def run_benchmark(app, engine, user_ids, requests, warmup):
+    """Time each endpoint; call outside an app context so every request gets a fresh session."""
+    from sqlalchemy import event
+
+    query_count = [0]
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        query_count[0] += 1
+    event.listen(engine, 'before_cursor_execute', count_query)
+
+    clients = [client_for(app, user_id) for user_id in user_ids]
+    results = {}
+    try:
+        for name in endpoint_urls(0):
+            for i in range(warmup):
+                clients[i % len(clients)].get(endpoint_urls(i)[name])
+
+            timings, queries, statuses = [], [], {}
+            for i in range(requests):
+                url = endpoint_urls(i)[name]
+                client = clients[i % len(clients)]
+                query_count[0] = 0
+                start = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - start) * 1000)
+                queries.append(query_count[0])
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            results[name] = {
+                'requests': requests,
+                'p50_ms': round(percentile(timings, 50), 2),
+                'p95_ms': round(percentile(timings, 95), 2),
+                'mean_ms': round(statistics.mean(timings), 2),
+                'max_ms': round(max(timings), 2),
+                'queries_p50': percentile(queries, 50),
+                'queries_max': max(queries),
+                'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+                'peak_rss_mb': peak_rss_mb()
+            }
+            print(f"{name}: p50 {results[name]['p50_ms']}ms, p95 {results[name]['p95_ms']}ms, "
+                  f"{results[name]['queries_p50']} queries", file=sys.stderr)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count_query)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dashboard endpoints on synthetic data')
+    parser.add_argument('--database-url', help='Scratch database to seed or reuse (default: a temporary SQLite file)')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=5 * 365)
+    parser.add_argument('--foods', type=int, default=500000, help='Number of FoodReference rows')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--requests', type=int, default=50, help='Timed requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per endpoint')
+    parser.add_argument('--bench-users', type=int, default=20, help='Number of users the requests rotate through')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    temp_path = None
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        fd, temp_path = tempfile.mkstemp(suffix='.db', prefix='benchmark-')
+        os.close(fd)
+        os.environ['DATABASE_URL'] = f'sqlite:///{temp_path}'
+
+    from app import app, db
+    from models import User, FoodReference
+    from food_search import create_food_search_index
+
+    app.config['TESTING'] = True
+    try:
+        with app.app_context():
+            db.create_all()
+            create_food_search_index()
+            seed_seconds = None
+            if not User.query.filter(User.google_id.like('synthetic-%')).first():
+                print(f"Seeding {args.users} users x {args.days} days and {args.foods} foods...", file=sys.stderr)
+                start = time.perf_counter()
+                seed_synthetic_data(args.users, args.days, args.seed)
+                seed_food_references(args.foods, args.seed)
+                seed_seconds = round(time.perf_counter() - start, 1)
+            db.session.execute(db.text('ANALYZE'))
+            db.session.commit()
+
+            user_ids = [user_id for (user_id,) in db.session.query(User.id).filter(
+                User.google_id.like('synthetic-%')).order_by(User.id).limit(args.bench_users)]
+            dataset = {
+                'users': User.query.count(),
+                'food_references': FoodReference.query.count(),
+                'seed_seconds': seed_seconds
+            }
+            engine = db.engine
+        results = run_benchmark(app, engine, user_ids, args.requests, args.warmup)
+        engine.dispose()  # release the file before removing a temporary database
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+
+    report = {
+        'generated_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'database': 'temporary sqlite' if temp_path else args.database_url,
+        'config': {'users': args.users, 'days': args.days, 'foods': args.foods, 'seed': args.seed,
+                   'requests': args.requests, 'warmup': args.warmup, 'bench_users': len(user_ids)},
+        'dataset': dataset,
+        'endpoints': results,
+        'peak_rss_mb': peak_rss_mb()
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
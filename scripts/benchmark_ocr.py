@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Script to benchmark the InBody OCR pipeline over sample scans.
+
+Runs each image through the same steps as a background OCR job (page
+detection and resolution normalization, panel OCR, metric parsing) and
+reports the time spent in each step and how many fields match the values
+recorded for that scan in ocr_samples.json (keyed by the image's SHA-256).
+Images without recorded values are timed only.
+
+Usage: python scripts/benchmark_ocr.py [IMAGE ...] [--runs 3] [--full-page] [--dpi 300]
+       [--samples scripts/ocr_samples.json] [--output results.json]
+
+Without images, every .jpg/.jpeg/.png in static/uploads is used; identical
+files are benchmarked once. --full-page also OCRs the whole page in one
+pass, for comparing against the panel pipeline.
+"""
+
+import sys
+import os
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import platform
+import statistics
+import time
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr_processor import InBodyOCRProcessor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SAMPLES = os.path.join(ROOT, 'scripts', 'ocr_samples.json')
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def sample_images(paths):
+    """(sha256, path) per distinct image."""
+    if not paths:
+        paths = sorted(path for pattern in ('*.jpg', '*.jpeg', '*.png')
+                       for path in glob.glob(os.path.join(ROOT, 'static', 'uploads', pattern)))
+    images = {}
+    for path in paths:
+        images.setdefault(file_sha256(path), path)
+    return list(images.items())
+
+def field_accuracy(metrics, expected):
+    """Per-field comparison against the recorded values."""
+    fields = {}
+    for field, value in expected.items():
+        found = metrics.get(field)
+        fields[field] = {
+            'expected': value,
+            'found': found,
+            'correct': found is not None and abs(found - value) < 0.01
+        }
+    correct = sum(1 for f in fields.values() if f['correct'])
+    return {'correct': correct, 'total': len(fields), 'accuracy': round(correct / len(fields), 3) if fields else None,
+            'fields': fields}
+
+def time_ms(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, round((time.perf_counter() - start) * 1000, 1)
+
+def benchmark_image(processor, path, expected, runs, full_page):
+    result = {'image': os.path.relpath(path, ROOT)}
+    timings = {'preprocess_ms': [], 'ocr_ms': [], 'parse_ms': []}
+    text = None
+    try:
+        for _ in range(runs):
+            page, ms = time_ms(processor.load_page, path)
+            timings['preprocess_ms'].append(ms)
+            text, ms = time_ms(processor.ocr_regions, page)
+            timings['ocr_ms'].append(ms)
+            metrics, ms = time_ms(processor.parse_inbody_metrics, text)
+            timings['parse_ms'].append(ms)
+    except Exception as e:
+        # e.g. Tesseract not installed: the preprocessing timings are still worth reporting
+        result['error'] = str(e)
+
+    result.update({name: statistics.median(values) if values else None for name, values in timings.items()})
+    if text is not None:
+        result['total_ms'] = round(result['preprocess_ms'] + result['ocr_ms'] + result['parse_ms'], 1)
+        result['metrics'] = metrics
+        if expected:
+            result['accuracy'] = field_accuracy(metrics, expected)
+
+        if full_page:
+            page = processor.load_page(path)
+            full_text, ocr_ms = time_ms(processor.ocr_full_page, page)
+            full_metrics = processor.parse_inbody_metrics(full_text)
+            result['full_page'] = {'ocr_ms': ocr_ms, 'metrics': full_metrics}
+            if expected:
+                result['full_page']['accuracy'] = field_accuracy(full_metrics, expected)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the InBody OCR pipeline and check extracted fields')
+    parser.add_argument('images', nargs='*', help='Scan images (default: static/uploads)')
+    parser.add_argument('--runs', type=int, default=3, help='Runs per image; the median is reported')
+    parser.add_argument('--dpi', type=int, default=None, help='Target DPI for resolution normalization')
+    parser.add_argument('--full-page', action='store_true', help='Also OCR the whole page in one pass for comparison')
+    parser.add_argument('--samples', default=DEFAULT_SAMPLES, help='Expected values keyed by image SHA-256')
+    parser.add_argument('--output', help='Write the JSON results to this file')
+    parser.add_argument('--verbose', action='store_true', help='Keep the OCR processor logging')
+    args = parser.parse_args()
+
+    if not args.verbose:
+        # The processor logs the raw OCR text of every run
+        logging.disable(logging.INFO)
+
+    with open(args.samples) as f:
+        samples = json.load(f)
+
+    processor = InBodyOCRProcessor(target_dpi=args.dpi) if args.dpi else InBodyOCRProcessor()
+    images = sample_images(args.images)
+    if not images:
+        print("No images to benchmark", file=sys.stderr)
+        sys.exit(1)
+
+    results = []
+    for sha256, path in images:
+        print(f"Benchmarking {os.path.relpath(path, ROOT)}...", file=sys.stderr)
+        result = benchmark_image(processor, path, samples.get(sha256, {}).get('expected'), args.runs, args.full_page)
+        result['sha256'] = sha256
+        results.append(result)
+
+    scored = [r['accuracy'] for r in results if r.get('accuracy')]
+    report = {
+        'run_at': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'target_dpi': processor.target_dpi,
+        'runs': args.runs,
+        'images': results,
+        'summary': {
+            'images': len(results),
+            'errors': sum(1 for r in results if 'error' in r),
+            'median_preprocess_ms': statistics.median([r['preprocess_ms'] for r in results if r['preprocess_ms'] is not None] or [0]),
+            'median_total_ms': statistics.median([r['total_ms'] for r in results if 'total_ms' in r] or [0]) or None,
+            'field_accuracy': round(sum(a['correct'] for a in scored) / sum(a['total'] for a in scored), 3) if scored else None
+        }
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+    sys.exit(1 if report['summary']['errors'] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Script to micro-benchmark the InBody metric parser over OCR texts.
+
+Times parse_inbody_metrics on each text (best of --repeat rounds of
+--number calls) with the processor's INFO logging left enabled but sent
+nowhere, as in production. With --baseline REV the parser from
+ocr_processor.py at that git revision is timed as well, and the report
+gives the speedup and every field the two parsers disagree on.
+
+Texts come from scripts/ocr_texts/*.txt, plus the OCR text of every
+scan in the OCR cache with --from-cache.
+
+Usage: python scripts/benchmark_ocr_parser.py [TEXT_FILE ...] [--baseline REV] [--from-cache]
+       [--number 200] [--repeat 5] [--output results.json]
+"""
+
+import sys
+import os
+import argparse
+import glob
+import json
+import logging
+import platform
+import subprocess
+import timeit
+import types
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load_texts(paths, from_cache):
+    """(name, text) pairs to parse."""
+    if not paths:
+        paths = sorted(glob.glob(os.path.join(ROOT, 'scripts', 'ocr_texts', '*.txt')))
+    texts = []
+    for path in paths:
+        with open(path) as f:
+            texts.append((os.path.basename(path), f.read()))
+    if from_cache:
+        from app import app
+        from models import OCRCache
+        with app.app_context():
+            texts.extend((f"ocr_cache:{entry.sha256[:12]}", entry.text) for entry in OCRCache.query.order_by(OCRCache.id))
+    return texts
+
+def load_baseline_parser(revision):
+    """parse_inbody_metrics of ocr_processor.py as of a git revision."""
+    source = subprocess.run(['git', 'show', f'{revision}:ocr_processor.py'], cwd=ROOT, capture_output=True,
+                            text=True, check=True).stdout
+    module = types.ModuleType('baseline_ocr_processor')
+    module.__file__ = os.path.join(ROOT, 'ocr_processor.py')
+    exec(compile(source, f'{revision}:ocr_processor.py', 'exec'), module.__dict__)
+    return module.InBodyOCRProcessor().parse_inbody_metrics
+
+def best_us(parse, text, number, repeat):
+    """Fastest per-call time in microseconds."""
+    return round(min(timeit.repeat(lambda: parse(text), number=number, repeat=repeat)) / number * 1e6, 1)
+
+def main():
+    parser = argparse.ArgumentParser(description='Time parse_inbody_metrics over captured OCR texts')
+    parser.add_argument('texts', nargs='*', help='OCR text files (default: scripts/ocr_texts/*.txt)')
+    parser.add_argument('--baseline', help='Git revision whose parser to compare against')
+    parser.add_argument('--from-cache', action='store_true', help="Also parse the OCR cache's texts")
+    parser.add_argument('--number', type=int, default=200, help='Calls per timing round')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing rounds; the fastest is reported')
+    parser.add_argument('--output', help='Write the JSON results to this file')
+    args = parser.parse_args()
+
+    from ocr_processor import ocr_processor
+    # Keep INFO records flowing (their formatting is part of the cost) without printing them
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.NullHandler())
+    root.setLevel(logging.INFO)
+
+    baseline = load_baseline_parser(args.baseline) if args.baseline else None
+    texts = load_texts(args.texts, args.from_cache)
+    if not texts:
+        print("No OCR texts to parse", file=sys.stderr)
+        sys.exit(1)
+
+    results = []
+    for name, text in texts:
+        metrics = ocr_processor.parse_inbody_metrics(text)
+        result = {
+            'text': name,
+            'chars': len(text),
+            'metrics_found': len(metrics),
+            'parse_us': best_us(ocr_processor.parse_inbody_metrics, text, args.number, args.repeat)
+        }
+        if baseline:
+            baseline_metrics = baseline(text)
+            result['baseline_us'] = best_us(baseline, text, args.number, args.repeat)
+            result['speedup'] = round(result['baseline_us'] / result['parse_us'], 1)
+            result['differences'] = {
+                field: {'baseline': baseline_metrics.get(field), 'current': metrics.get(field)}
+                for field in sorted(set(metrics) | set(baseline_metrics))
+                if metrics.get(field) != baseline_metrics.get(field)
+            }
+        results.append(result)
+
+    report = {
+        'run_at': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'baseline': args.baseline,
+        'texts': results,
+        'summary': {
+            'texts': len(results),
+            'total_parse_us': round(sum(r['parse_us'] for r in results), 1)
+        }
+    }
+    if baseline:
+        report['summary']['total_baseline_us'] = round(sum(r['baseline_us'] for r in results), 1)
+        report['summary']['speedup'] = round(report['summary']['total_baseline_us'] / report['summary']['total_parse_us'], 1)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Script to generate thumbnail and medium variants for progress pictures
+uploaded before the resize pipeline (or whose variants failed). Also
+strips EXIF metadata from the originals.
+
+Usage: python scripts/generate_progress_pic_variants.py [--all]
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models import ProgressPic
+from image_variants import process_progress_pic
+
+def generate_progress_pic_variants(everything=False):
+    """Process pictures without ready variants (or every picture)"""
+    with app.app_context():
+        query = ProgressPic.query.order_by(ProgressPic.id)
+        if not everything:
+            query = query.filter(ProgressPic.variants_status != 'ready')
+        pic_ids = [pic.id for pic in query]
+        print(f"Generating variants for {len(pic_ids)} progress pictures")
+
+        for pic_id in pic_ids:
+            process_progress_pic(app, pic_id)
+        failed = ProgressPic.query.filter(ProgressPic.id.in_(pic_ids), ProgressPic.variants_status == 'failed').count()
+        print(f"Progress picture variants done: {len(pic_ids) - failed} ready, {failed} failed")
+
+if __name__ == "__main__":
+    generate_progress_pic_variants('--all' in sys.argv[1:])
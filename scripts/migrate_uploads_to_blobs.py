@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Script to move files uploaded before content-addressed storage into it.
+Run once after upgrading the database. Progress pictures (and their
+variants), Stat body scans and OCR job scans that still point at
+timestamp-named files under UPLOAD_FOLDER are stored as blobs, and the
+rows are re-pointed at the blob keys. Identical files end up as one blob.
+The old files are deleted afterwards unless --keep is given.
+
+Usage: python scripts/migrate_uploads_to_blobs.py [--keep]
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, db
+from models import Blob, ProgressPic, Stat, OCRJob
+from upload_storage import store_file, upload_root
+from image_variants import VARIANT_SIZES, VARIANT_FORMATS, variant_columns
+from routes.fitness_routes import bodyscan_path
+
+def migrate_uploads_to_blobs(keep=False):
+    with app.app_context(), app.test_request_context():
+        known = {key for key, in db.session.query(Blob.key)}
+        migrated = {}  # legacy path -> blob key
+        missing = 0
+
+        def migrate(path):
+            nonlocal missing
+            if path not in migrated:
+                if not os.path.isfile(path):
+                    missing += 1
+                    return None
+                migrated[path] = store_file(app, path)
+            return migrated[path]
+
+        pic_dir = os.path.join(upload_root(app), 'progress_pics')
+        columns = ['filename'] + [variant_columns(variant, ext) for variant in VARIANT_SIZES for ext in VARIANT_FORMATS]
+        for pic in ProgressPic.query.order_by(ProgressPic.id):
+            for column in columns:
+                name = getattr(pic, column)
+                if name and name not in known:
+                    key = migrate(os.path.join(pic_dir, name))
+                    if key:
+                        setattr(pic, column, key)
+
+        for stat in Stat.query.filter(Stat.bodyscan_image_path.isnot(None), Stat.bodyscan_blob.is_(None)):
+            key = migrate(os.path.join(app.root_path, stat.bodyscan_image_path))
+            if key:
+                stat.bodyscan_blob = key
+                stat.bodyscan_image_path = bodyscan_path(key)
+
+        for job in OCRJob.query.order_by(OCRJob.id):
+            if job.filename not in known:
+                key = migrate(os.path.join(upload_root(app), job.filename))
+                if key:
+                    job.filename = key
+
+        db.session.commit()
+        print(f"Stored {len(migrated)} files as {len(set(migrated.values()))} blobs; {missing} referenced files were missing")
+
+        if not keep:
+            for path in migrated:
+                os.remove(path)
+            print(f"Deleted {len(migrated)} old files")
+
+if __name__ == "__main__":
+    migrate_uploads_to_blobs('--keep' in sys.argv[1:])
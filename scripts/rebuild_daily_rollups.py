@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Script to rebuild the dashboard's daily rollup rows from the raw logs.
+Run once after upgrading to backfill history; afterwards rows are kept
+current on every write.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, db
+from models import User
+from daily_rollup import rebuild_daily_rollups
+
+def rebuild_all_daily_rollups():
+    """Rebuild rollups for every user"""
+    with app.app_context():
+        user_ids = [user_id for (user_id,) in db.session.query(User.id).order_by(User.id)]
+        print(f"Rebuilding daily rollups for {len(user_ids)} users")
+        
+        total = 0
+        for user_id in user_ids:
+            total += rebuild_daily_rollups(user_id)
+            db.session.commit()
+        print(f"Daily rollups rebuilt: {total} days")
+
+if __name__ == "__main__":
+    rebuild_all_daily_rollups()
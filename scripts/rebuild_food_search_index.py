@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+Script to (re)build the full-text search index used by /food/search.
+Creates the index if it is missing and reindexes every FoodReference row.
+Run it after bulk imports that bypass the ORM or after restoring a database.
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, db
+from models import FoodReference
+from food_search import rebuild_food_search_index
+
+def main():
+    with app.app_context():
+        started = time.perf_counter()
+        if not rebuild_food_search_index():
+            print(f"Full-text search is not supported on {db.engine.dialect.name}; /food/search will use ILIKE")
+            return
+        count = FoodReference.query.count()
+        print(f"Rebuilt food search index for {count} foods in {time.perf_counter() - started:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Script to rebuild the personal-record index from workout history.
+Run after upgrading so existing exercises get every PR type (volume,
+estimated 1RM, rep-range maxes) alongside weight and reps, and so volume
+PRs count every set of the rows logged with a set count.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, db
+from models import Workout
+from pr_index import save_user_prs
+
+def rebuild_personal_records():
+    """Recompute PRs for every user that has workouts"""
+    with app.app_context():
+        user_ids = [user_id for (user_id,) in db.session.query(Workout.user_id).distinct().order_by(Workout.user_id)]
+        print(f"Rebuilding personal records for {len(user_ids)} users")
+        
+        total = 0
+        for user_id in user_ids:
+            total += save_user_prs(user_id)
+            db.session.commit()
+        print(f"Personal records rebuilt: {total} records")
+
+if __name__ == "__main__":
+    rebuild_personal_records()
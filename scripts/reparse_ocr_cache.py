@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Script to re-parse cached body scan OCR text with the current parser.
+Run after changing parse_inbody_metrics (and bumping OCR_PARSER_VERSION);
+no scan is OCR'd again. Entries left stale are otherwise re-parsed the
+next time they are used.
+
+Usage: python scripts/reparse_ocr_cache.py [--all]
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, db
+from models import OCRCache
+from ocr_cache import reparse_entry
+from ocr_processor import OCR_PARSER_VERSION
+
+def reparse_ocr_cache(everything=False):
+    """Re-parse entries from older parser versions (or every entry)"""
+    with app.app_context():
+        query = OCRCache.query.order_by(OCRCache.id)
+        if not everything:
+            query = query.filter(OCRCache.parser_version != OCR_PARSER_VERSION)
+        entries = query.all()
+        print(f"Re-parsing {len(entries)} cached scans with parser version {OCR_PARSER_VERSION}")
+
+        changed = sum(1 for entry in entries if reparse_entry(entry))
+        db.session.commit()
+        print(f"OCR cache re-parsed: {changed} entries changed metrics")
+
+if __name__ == "__main__":
+    reparse_ocr_cache('--all' in sys.argv[1:])
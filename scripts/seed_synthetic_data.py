@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Script to fill a scratch database with a large, reproducible synthetic dataset
+(users with a year of stats, workouts, food entries, activities, moods and
+TDEE rows, plus optional FoodReference rows) for query-plan audits and
+benchmarks.
+
+Usage: python scripts/seed_synthetic_data.py --database-url sqlite:////tmp/synthetic.db
+       [--users 50] [--days 365] [--foods 0] [--seed 42]
+
+The same seed always produces the same rows. Never point this at a real database.
+"""
+
+import sys
+import os
+import argparse
+import random
+from datetime import date, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+INSERT_BATCH_SIZE = 5000
+
+EXERCISES = [
+    ('Barbell Squat', 'Legs'), ('Barbell Bench Press', 'Chest'), ('Barbell Deadlift', 'Back'),
+    ('Overhead Press', 'Shoulders'), ('Pull Up', 'Back'), ('Dumbbell Curl', 'Arms'),
+    ('Leg Press', 'Legs'), ('Lat Pulldown', 'Back'), ('Dips', 'Chest'), ('Plank', 'Core')
+]
+FOODS = [
+    ('Oatmeal', 150), ('Chicken Breast', 280), ('Rice', 200), ('Greek Yogurt', 120), ('Banana', 105),
+    ('Salmon', 350), ('Eggs', 210), ('Protein Shake', 160), ('Salad', 90), ('Manual Entry', 600)
+]
+ACTIVITIES = [('Walking', 'Low'), ('Running', 'High'), ('Cycling', 'Moderate'), ('Swimming', 'Moderate')]
+ACTIVITY_LEVELS = ['sedentary', 'light', 'moderate', 'active', 'very_active']
+
+FOOD_WORDS = ['Apple', 'Almonds', 'Bagel', 'Bean', 'Beef', 'Bread', 'Broccoli', 'Burrito', 'Butter', 'Carrot',
+              'Cereal', 'Cheese', 'Chicken', 'Chips', 'Chocolate', 'Cookie', 'Corn', 'Cracker', 'Egg', 'Granola',
+              'Ham', 'Hummus', 'Juice', 'Lentil', 'Milk', 'Muffin', 'Noodle', 'Oat', 'Pasta', 'Peanut',
+              'Pizza', 'Pork', 'Potato', 'Quinoa', 'Rice', 'Salmon', 'Sausage', 'Soup', 'Spinach', 'Steak',
+              'Tofu', 'Tomato', 'Tortilla', 'Tuna', 'Turkey', 'Waffle', 'Yogurt', 'Zucchini']
+FOOD_STYLES = ['Raw', 'Cooked', 'Grilled', 'Baked', 'Fried', 'Roasted', 'Steamed', 'Frozen', 'Canned', 'Dried',
+               'Organic', 'Low Fat', 'Whole Grain', 'Unsweetened', 'Spicy', 'Smoked']
+FOOD_BRANDS = [None, None, 'Acme', 'Good Farms', 'Daily Harvest', 'Northside', 'Green Valley', 'Sunrise']
+
+def synthetic_user_rows(rng, index):
+    return {
+        'google_id': f'synthetic-{index}',
+        'email': f'synthetic{index}@example.com',
+        'username': f'synthetic{index}',
+        'weight': rng.uniform(130, 240),
+        'height': rng.uniform(60, 76),
+        'age': rng.randint(20, 65),
+        'sex': rng.choice(['Male', 'Female'])
+    }
+
+def synthetic_day_rows(rng, user_id, day, body_weight):
+    """Rows for one user-day, keyed by model name."""
+    rows = {'Workout': [], 'FoodEntry': [], 'Activity': [], 'Stat': [], 'Mood': [], 'TDEE': []}
+
+    if rng.random() < 0.55:
+        for exercise, category in rng.sample(EXERCISES, rng.randint(2, 4)):
+            weight = 0.0 if exercise in ('Pull Up', 'Dips', 'Plank') else float(rng.randrange(20, 320, 5))
+            for set_number in range(1, rng.randint(2, 5) + 1):
+                rows['Workout'].append({
+                    'user_id': user_id, 'date': day, 'exercise': exercise, 'category': category,
+                    'weight': weight, 'reps': rng.randint(1, 15), 'sets': set_number,
+                    'total_weight': weight + 45 if exercise.startswith('Barbell') else None
+                })
+
+    calorie_intake = 0
+    for food_name, calories in rng.sample(FOODS, rng.randint(2, 6)):
+        quantity = rng.choice([0.5, 1, 1.5, 2])
+        calorie_intake += int(calories * quantity)
+        rows['FoodEntry'].append({
+            'user_id': user_id, 'date': day, 'food_name': food_name, 'calories': int(calories * quantity),
+            'protein': rng.uniform(0, 40), 'carbs': rng.uniform(0, 60), 'fat': rng.uniform(0, 25),
+            'quantity': quantity, 'unit': 'serving'
+        })
+
+    activity_calories = 0
+    for activity_type, intensity in rng.sample(ACTIVITIES, rng.choice([0, 0, 1, 1, 2])):
+        calories_burned = rng.randint(80, 600)
+        activity_calories += calories_burned
+        rows['Activity'].append({
+            'user_id': user_id, 'date': day, 'activity_type': activity_type, 'duration': rng.randint(15, 90),
+            'intensity': intensity, 'calories_burned': calories_burned, 'miles': round(rng.uniform(0.5, 10), 2),
+            'activity_level': rng.choice([None, None, None] + ACTIVITY_LEVELS)
+        })
+
+    bmr = int(10 * body_weight * 0.4536 + 6.25 * 175 - 5 * 35 + 5)
+    if day.weekday() == 0:
+        rows['Stat'].append({
+            'user_id': user_id, 'date': day, 'weight': body_weight,
+            'body_fat_percentage': rng.uniform(10, 30), 'bmr': bmr
+        })
+    rows['Mood'].append({'user_id': user_id, 'date': day, 'rating': rng.randint(1, 10), 'notes': None})
+    base_tdee = int(bmr * 1.55)
+    rows['TDEE'].append({
+        'user_id': user_id, 'date': day, 'bmr': bmr, 'activity_calories': activity_calories,
+        'tdee': base_tdee + activity_calories, 'calorie_intake': calorie_intake,
+        'activity_level': 'moderate', 'activity_multiplier': 1.55, 'base_tdee': base_tdee
+    })
+    return rows
+
+def seed_synthetic_data(users=50, days=365, seed=42, end_date=None):
+    """Insert the synthetic dataset; call inside an app context. Returns row counts per table.
+
+    Data ends at end_date (default today) so "recent" endpoints find rows.
+    Personal records and daily rollups are computed from the generated rows.
+    """
+    from sqlalchemy import insert
+    from models import db, User, UserSettings, Workout, FoodEntry, Activity, Stat, Mood, TDEE
+    from pr_index import save_user_prs
+    from daily_rollup import rebuild_daily_rollups
+
+    models = {'Workout': Workout, 'FoodEntry': FoodEntry, 'Activity': Activity,
+              'Stat': Stat, 'Mood': Mood, 'TDEE': TDEE}
+    rng = random.Random(seed)
+    end_date = end_date or date.today()
+    start_date = end_date - timedelta(days=days - 1)
+
+    if User.query.filter(User.google_id.like('synthetic-%')).first():
+        raise RuntimeError("Database already contains synthetic users; seed a fresh database")
+
+    user_rows = [synthetic_user_rows(rng, i) for i in range(users)]
+    db.session.execute(insert(User), user_rows)
+    user_ids = [user_id for (user_id,) in db.session.query(User.id).filter(
+        User.google_id.like('synthetic-%')).order_by(User.id)]
+    db.session.execute(insert(UserSettings), [
+        {'user_id': user_id, 'activity_level': rng.choice(ACTIVITY_LEVELS), 'units': 'imperial'}
+        for user_id in user_ids
+    ])
+
+    counts = {name: 0 for name in models}
+    pending = {name: [] for name in models}
+
+    def flush_pending(force=False):
+        for name, rows in pending.items():
+            if rows and (force or len(rows) >= INSERT_BATCH_SIZE):
+                db.session.execute(insert(models[name]), rows)
+                counts[name] += len(rows)
+                rows.clear()
+
+    for user_id, user_row in zip(user_ids, user_rows):
+        body_weight = user_row['weight']
+        for offset in range(days):
+            body_weight += rng.uniform(-0.4, 0.35)
+            day_rows = synthetic_day_rows(rng, user_id, start_date + timedelta(days=offset), round(body_weight, 1))
+            for name, rows in day_rows.items():
+                pending[name].extend(rows)
+            flush_pending()
+    flush_pending(force=True)
+
+    counts['PersonalRecord'] = sum(save_user_prs(user_id) for user_id in user_ids)
+    counts['DailyRollup'] = sum(rebuild_daily_rollups(user_id) for user_id in user_ids)
+    counts['User'] = len(user_ids)
+    db.session.commit()
+    return counts
+
+def seed_food_references(count, seed=42):
+    """Insert `count` synthetic FoodReference rows; call inside an app context. Returns the row count.
+
+    Names combine food words and styles so searches match realistic subsets;
+    duplicates get a numeric suffix to satisfy the unique constraint.
+    """
+    from sqlalchemy import insert
+    from models import db, FoodReference
+
+    rng = random.Random(seed)
+    seen = {}
+    rows = []
+    inserted = 0
+    for _ in range(count):
+        base = f"{rng.choice(FOOD_WORDS)} {rng.choice(FOOD_WORDS).lower()}, {rng.choice(FOOD_STYLES).lower()}"
+        seen[base] = seen.get(base, 0) + 1
+        name = base if seen[base] == 1 else f"{base} {seen[base]}"
+        protein, carbs, fat = rng.uniform(0, 35), rng.uniform(0, 80), rng.uniform(0, 40)
+        rows.append({
+            'food_name': name[:100], 'brand': rng.choice(FOOD_BRANDS),
+            'calories': round(protein * 4 + carbs * 4 + fat * 9, 1),
+            'protein': protein, 'carbs': carbs, 'fat': fat, 'fiber': rng.uniform(0, 10),
+            'sugar': rng.uniform(0, 30), 'sodium': rng.uniform(0, 900),
+            'search_keywords': name.lower().replace(',', ''), 'is_verified': False
+        })
+        if len(rows) >= INSERT_BATCH_SIZE:
+            db.session.execute(insert(FoodReference), rows)
+            inserted += len(rows)
+            rows = []
+    if rows:
+        db.session.execute(insert(FoodReference), rows)
+        inserted += len(rows)
+    db.session.commit()
+    return inserted
+
+def main():
+    parser = argparse.ArgumentParser(description='Seed a scratch database with synthetic data')
+    parser.add_argument('--database-url', required=True, help='Scratch database to fill, e.g. sqlite:////tmp/synthetic.db')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--foods', type=int, default=0, help='Number of FoodReference rows to add')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url
+    from app import app, db
+
+    with app.app_context():
+        db.create_all()
+        counts = seed_synthetic_data(args.users, args.days, args.seed)
+        if args.foods:
+            from food_search import create_food_search_index
+            create_food_search_index()
+            counts['FoodReference'] = seed_food_references(args.foods, args.seed)
+        for table, count in counts.items():
+            print(f"{table}: {count} rows")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Script to delete uploaded files nothing references any more: blobs
+unreferenced for longer than --max-age hours (default UPLOAD_ORPHAN_TTL),
+abandoned temp files and, with --full, stored files without a Blob row.
+The app runs the same sweep hourly (and a full one nightly).
+
+Usage: python scripts/sweep_uploads.py [--max-age HOURS] [--full]
+"""
+
+import sys
+import os
+import argparse
+from datetime import timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from upload_storage import sweep_uploads
+
+def main():
+    parser = argparse.ArgumentParser(description='Delete unreferenced uploads and abandoned temp files')
+    parser.add_argument('--max-age', type=float, help='Hours an upload may stay unreferenced (default: UPLOAD_ORPHAN_TTL)')
+    parser.add_argument('--full', action='store_true', help='Also delete stored files that have no Blob row')
+    args = parser.parse_args()
+
+    with app.app_context():
+        counts = sweep_uploads(app, timedelta(hours=args.max_age) if args.max_age is not None else None, full=args.full)
+    print(f"Uploads swept: {counts['blobs']} unreferenced blobs, {counts['temp_files']} temp files, "
+          f"{counts['untracked']} untracked files")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Shared session hooks for data kept current on writes.
+
+Daily rollups, the DataVersion ledger, blob refcounts and the nutrition
+cache all follow the same pattern: collect what the rows flushed in a
+transaction touched, act on it once when the transaction commits, and
+forget it when it rolls back. Each registers a change hook here instead of
+its own Session listeners:
+
+- collect(obj, deleted, pending) runs for every object added, changed or
+  deleted by a flush and records what it needs in `pending` (a fresh
+  set, or whatever the hook's pending factory returns, per transaction)
+- before_commit(pending) writes derived rows in the same transaction
+- after_commit(pending) reacts once the transaction is committed
+
+Just before commit the session is flushed once, then the before_commit
+callbacks run in registration order and their writes are flushed. Writes
+made by one callback that another hook collects are applied in a further
+round. Callbacks write through db.session and do not commit.
+"""
+from collections import namedtuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+ChangeHook = namedtuple('ChangeHook', 'name collect before_commit after_commit pending')
+
+# Rounds of before_commit callbacks per commit; their own writes settle in one or two
+MAX_ROUNDS = 5
+INFO_KEY = 'session_changes'
+
+_hooks = []
+
+def register_change_hook(name, collect, before_commit=None, after_commit=None, pending=set):
+    """Register a hook under a unique name; see the module docstring."""
+    if any(hook.name == name for hook in _hooks):
+        raise ValueError(f"Change hook {name!r} is already registered")
+    _hooks.append(ChangeHook(name, collect, before_commit, after_commit, pending))
+
+def _load_previous_value(target, value, oldvalue, initiator):
+    pass
+
+def track_previous_values(*attributes):
+    """Load an attribute's old value when it is set, so collect() sees it in the history.
+
+    Without this, setting a column of an expired object (e.g. after a commit)
+    leaves the history with no deleted value.
+    """
+    for attribute in attributes:
+        event.listen(attribute, 'set', _load_previous_value, active_history=True)
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    changes = [(obj, False) for obj in list(session.new) + list(session.dirty)]
+    changes += [(obj, True) for obj in session.deleted]
+    if not changes:
+        return
+    pending = session.info.setdefault(INFO_KEY, {})
+    for hook in _hooks:
+        bucket = pending.get(hook.name)
+        if bucket is None:
+            bucket = pending[hook.name] = hook.pending()
+        for obj, deleted in changes:
+            hook.collect(obj, deleted, bucket)
+
+@event.listens_for(Session, 'before_commit')
+def _apply_before_commit(session):
+    session.flush()
+    for _ in range(MAX_ROUNDS):
+        pending = session.info.get(INFO_KEY, {})
+        due = [(hook, pending.pop(hook.name, None)) for hook in _hooks if hook.before_commit]
+        due = [(hook, bucket) for hook, bucket in due if bucket]
+        if not due:
+            return
+        for hook, bucket in due:
+            hook.before_commit(bucket)
+        session.flush()
+    raise RuntimeError('Change hooks kept writing tracked rows before commit')
+
+@event.listens_for(Session, 'after_commit')
+def _apply_after_commit(session):
+    pending = session.info.pop(INFO_KEY, None)
+    if not pending:
+        return
+    for hook in _hooks:
+        if hook.after_commit and pending.get(hook.name):
+            hook.after_commit(pending[hook.name])
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_changes(session, previous_transaction):
+    session.info.pop(INFO_KEY, None)
@@ -2,7 +2,7 @@
 class APICache {
     constructor() {
         this.cache = new Map();
-        this.defaultTTL = 5 * 60 * 1000; // 5 minutes
+        this.defaultTTL = 5 * 60 * 1000; // 5 minutes, for responses without an ETag
     }
 
     // Generate cache key from URL and options
@@ -10,22 +10,29 @@ class APICache {
         return url + JSON.stringify(options);
     }
 
-    // Get cached data if valid
+    // Get cached data if valid (entries with an ETag are revalidated instead)
     get(key) {
         const cached = this.cache.get(key);
-        if (cached && Date.now() - cached.timestamp < cached.ttl) {
+        if (cached && !cached.etag && Date.now() - cached.timestamp < cached.ttl) {
             return cached.data;
         }
-        if (cached) {
+        if (cached && !cached.etag) {
             this.cache.delete(key); // Remove expired entry
         }
         return null;
     }
 
+    // Get the entry kept for revalidation with If-None-Match
+    getRevalidatable(key) {
+        const cached = this.cache.get(key);
+        return cached && cached.etag ? cached : null;
+    }
+
     // Set cache entry
-    set(key, data, ttl = this.defaultTTL) {
+    set(key, data, ttl = this.defaultTTL, etag = null) {
         this.cache.set(key, {
             data,
+            etag,
             timestamp: Date.now(),
             ttl
         });
@@ -52,7 +59,7 @@ class APICache {
         let expired = 0;
         
         for (const [key, value] of this.cache) {
-            if (now - value.timestamp < value.ttl) {
+            if (value.etag || now - value.timestamp < value.ttl) {
                 valid++;
             } else {
                 expired++;
@@ -76,9 +83,21 @@ async function cachedFetch(url, options = {}) {
         return cached;
     }
     
+    // Responses with an ETag are revalidated; the server answers 304 if nothing changed
+    const revalidatable = apiCache.getRevalidatable(key);
+    const requestOptions = { ...options };
+    if (revalidatable) {
+        requestOptions.headers = { ...(options.headers || {}), 'If-None-Match': revalidatable.etag };
+    }
+    
     try {
-        console.log(`Cache miss for ${url}, fetching...`);
-        const response = await fetch(url, options);
+        console.log(revalidatable ? `Revalidating ${url}...` : `Cache miss for ${url}, fetching...`);
+        const response = await fetch(url, requestOptions);
+        
+        if (response.status === 304 && revalidatable) {
+            console.log(`Not modified: ${url}`);
+            return revalidatable.data;
+        }
         
         if (!response.ok) {
             throw new Error(`HTTP ${response.status}: ${response.statusText}`);
@@ -87,7 +106,7 @@ async function cachedFetch(url, options = {}) {
         const data = await response.json();
         
         // Cache successful responses
-        apiCache.set(key, data);
+        apiCache.set(key, data, apiCache.defaultTTL, response.headers.get('ETag'));
         
         return data;
     } catch (error) {
@@ -4,66 +4,73 @@
 async function loadDashboardStats() {
     console.log('loadDashboardStats: Starting to load dashboard stats...');
     try {
-        // Load current weight
-        console.log('loadDashboardStats: Fetching latest weight...');
-        const weightResponse = await fetch('/fitness/api/latest_weight');
-        console.log('loadDashboardStats: Weight response status:', weightResponse.status);
+        // Every widget comes from one bootstrap request
+        const response = await fetch('/api/dashboard/bootstrap');
+        console.log('loadDashboardStats: Bootstrap response status:', response.status);
+        if (!response.ok) {
+            console.error('loadDashboardStats: Bootstrap response not ok:', response.status);
+            return;
+        }
+        const { sections } = await response.json();
         
-        if (weightResponse.ok) {
-            const weightData = await weightResponse.json();
-            console.log('loadDashboardStats: Weight data received:', weightData);
-            
-            const currentWeightElement = document.getElementById('current-weight');
-            const weightChangeElement = document.getElementById('weight-change');
-            
-            console.log('loadDashboardStats: Current weight element found:', !!currentWeightElement);
-            console.log('loadDashboardStats: Weight change element found:', !!weightChangeElement);
-            
-            if (currentWeightElement) {
-                if (weightData.weight) {
-                    currentWeightElement.textContent = `${weightData.weight} lbs`;
-                    console.log('loadDashboardStats: Set current weight to:', `${weightData.weight} lbs`);
-                    
-                    if (weightData.date) {
-                        const date = new Date(weightData.date);
-                        const daysAgo = Math.floor((new Date() - date) / (1000 * 60 * 60 * 24));
-                        if (daysAgo === 0) {
-                            weightChangeElement.textContent = 'Today';
-                        } else if (daysAgo === 1) {
-                            weightChangeElement.textContent = 'Yesterday';
-                        } else {
-                            weightChangeElement.textContent = `${daysAgo} days ago`;
-                        }
-                        console.log('loadDashboardStats: Set weight change to:', weightChangeElement.textContent);
-                    } else if (weightData.source === 'profile') {
-                        weightChangeElement.textContent = 'From Profile';
-                        console.log('loadDashboardStats: Weight from profile, set change to "From Profile"');
+        const currentWeightElement = document.getElementById('current-weight');
+        const weightChangeElement = document.getElementById('weight-change');
+        const weightData = sections.weight;
+        if (currentWeightElement && weightData) {
+            if (weightData.weight) {
+                currentWeightElement.textContent = `${weightData.weight} lbs`;
+                
+                if (weightData.date) {
+                    const date = new Date(weightData.date);
+                    const daysAgo = Math.floor((new Date() - date) / (1000 * 60 * 60 * 24));
+                    if (daysAgo === 0) {
+                        weightChangeElement.textContent = 'Today';
+                    } else if (daysAgo === 1) {
+                        weightChangeElement.textContent = 'Yesterday';
                     } else {
-                        weightChangeElement.textContent = 'No date';
-                        console.log('loadDashboardStats: Weight has no date, set change to "No date"');
+                        weightChangeElement.textContent = `${daysAgo} days ago`;
                     }
+                } else if (weightData.source === 'profile') {
+                    weightChangeElement.textContent = 'From Profile';
                 } else {
-                    currentWeightElement.textContent = '--';
-                    weightChangeElement.textContent = 'No data';
-                    console.log('loadDashboardStats: No weight data available, set to --');
+                    weightChangeElement.textContent = 'No date';
                 }
             } else {
-                console.error('loadDashboardStats: Current weight element not found!');
+                currentWeightElement.textContent = '--';
+                weightChangeElement.textContent = 'No data';
             }
-        } else {
-            console.error('loadDashboardStats: Weight response not ok:', weightResponse.status);
         }
         
-        // Load other dashboard stats (calories, workouts, goals)
-        // TODO: Add API endpoints for these stats
         const todayCaloriesElement = document.getElementById('today-calories');
+        const calorieTargetElement = document.getElementById('calorie-target');
         const weeklyWorkoutsElement = document.getElementById('weekly-workouts');
         const activeGoalsElement = document.getElementById('active-goals');
         
-        if (todayCaloriesElement) todayCaloriesElement.textContent = '--';
-        if (weeklyWorkoutsElement) weeklyWorkoutsElement.textContent = '--';
+        if (todayCaloriesElement) {
+            todayCaloriesElement.textContent = sections.nutrition ? Math.round(sections.nutrition.calories).toLocaleString() : '--';
+        }
+        if (calorieTargetElement && sections.tdee && sections.tdee.tdee) {
+            calorieTargetElement.textContent = `Target: ${sections.tdee.tdee.toLocaleString()}`;
+        }
+        if (weeklyWorkoutsElement) {
+            weeklyWorkoutsElement.textContent = sections.workouts ? sections.workouts.count : '--';
+        }
         if (activeGoalsElement) activeGoalsElement.textContent = '--';
         
+        const timelineElement = document.getElementById('activity-timeline');
+        if (timelineElement && sections.recent_activity) {
+            timelineElement.innerHTML = sections.recent_activity.length
+                ? sections.recent_activity.map(item => `
+              <div class="timeline-item">
+                <div class="timeline-icon">${item.icon}</div>
+                <div class="timeline-content">
+                  <h4>${item.title}</h4>
+                  <p>${item.description} - ${item.time_ago}</p>
+                </div>
+              </div>`).join('')
+                : '<p>No recent activity</p>';
+        }
+        
         console.log('loadDashboardStats: Dashboard stats loading completed');
     } catch (error) {
         console.error('Error loading dashboard stats:', error);
@@ -257,6 +264,98 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
+    // Upload a body scan for OCR; the review page waits for the background job
+    const ocrButton = document.getElementById('process-ocr-btn');
+    if (ocrButton) {
+        ocrButton.addEventListener('click', async () => {
+            const fileInput = document.getElementById('bodyscan_image');
+            if (!fileInput || !fileInput.files[0]) {
+                showSnack('Please select an image file first', 'error');
+                return;
+            }
+            const formData = new FormData();
+            formData.append('bodyscan_image', fileInput.files[0]);
+            try {
+                const response = await fetch('/fitness/process_ocr', { method: 'POST', body: formData });
+                const result = await response.json();
+                if (response.ok) {
+                    window.location.href = result.review_url;
+                } else {
+                    showSnack(result.error || 'OCR processing failed', 'error');
+                }
+            } catch (error) {
+                showSnack('OCR processing failed: ' + error.message, 'error');
+            }
+        });
+    }
+
+    // Progress pictures: the gallery shows the small thumbnails (WebP with a JPEG fallback)
+    const progressGallery = document.getElementById('progress-pic-gallery');
+    async function loadProgressPics() {
+        try {
+            const response = await fetch('/fitness/api/progress_pics');
+            const pics = await response.json();
+            if (!response.ok) return;
+            progressGallery.innerHTML = '';
+            let pending = false;
+            pics.forEach(pic => {
+                const link = document.createElement('a');
+                link.href = pic.medium.jpeg || pic.url;
+                link.target = '_blank';
+                link.title = pic.upload_date;
+                const picture = document.createElement('picture');
+                if (pic.thumb.webp) {
+                    const source = document.createElement('source');
+                    source.type = 'image/webp';
+                    source.srcset = pic.thumb.webp;
+                    picture.appendChild(source);
+                }
+                const img = document.createElement('img');
+                img.src = pic.thumb.jpeg || pic.url;
+                img.alt = pic.description || `Progress picture ${pic.upload_date}`;
+                img.loading = 'lazy';
+                img.style.cssText = 'width: 120px; height: 160px; object-fit: cover; border-radius: 4px;';
+                picture.appendChild(img);
+                link.appendChild(picture);
+                progressGallery.appendChild(link);
+                pending = pending || pic.variants_status === 'pending';
+            });
+            // Thumbnails are generated after upload; check back shortly for any still being resized
+            if (pending) setTimeout(loadProgressPics, 2000);
+        } catch (error) {
+            console.error('Error loading progress pictures:', error);
+        }
+    }
+    if (progressGallery) {
+        loadProgressPics();
+    }
+
+    const progressPicButton = document.getElementById('progress-pic-upload-btn');
+    if (progressPicButton) {
+        progressPicButton.addEventListener('click', async () => {
+            const fileInput = document.getElementById('progress-pic-input');
+            if (!fileInput || !fileInput.files[0]) {
+                showSnack('Please select an image file first', 'error');
+                return;
+            }
+            const formData = new FormData();
+            formData.append('progress_pic', fileInput.files[0]);
+            try {
+                const response = await fetch('/fitness/upload_progress_pic', { method: 'POST', body: formData });
+                const result = await response.json();
+                if (response.ok) {
+                    fileInput.value = '';
+                    showSnack('Progress picture uploaded', 'success');
+                    if (progressGallery) loadProgressPics();
+                } else {
+                    showSnack(result.error || 'Upload failed', 'error');
+                }
+            } catch (error) {
+                showSnack('Upload failed: ' + error.message, 'error');
+            }
+        });
+    }
+
     // Handle edit stat form submission
     const editStatForm = document.getElementById('edit-stat-form');
     if (editStatForm) {
@@ -0,0 +1,389 @@
+"""Range-based TDEE engine.
+
+Loads every input needed for a user and a set of dates with a handful of
+set-based queries, computes each day in memory and writes the TDEE rows
+back in a single transaction.
+
+Writes do not recompute TDEE themselves; they mark the affected dates in
+the TDEEDirtyDate ledger and the rows are rebuilt lazily when read, or in
+bulk by the background flusher.
+"""
+import time
+from datetime import date as date_type, datetime
+from sqlalchemy import func, case
+from models import db, dialect_insert, User, Stat, Activity, TDEE, UserSettings, FoodEntry, TDEEDirtyDate
+from conditional_get import bump_table_versions
+
+# Activity level multipliers
+ACTIVITY_MULTIPLIERS = {
+    'sedentary': 1.2,
+    'light': 1.375,
+    'moderate': 1.55,
+    'active': 1.725,
+    'very_active': 1.9
+}
+
+DEFAULT_ACTIVITY_LEVEL = 'light'
+
+def calculate_bmr(weight, height, age, sex, units='imperial'):
+    """Mifflin-St Jeor BMR from profile data, or None if the profile is incomplete."""
+    if weight is None or height is None or age is None or sex is None:
+        return None
+    if units == 'imperial':
+        # Use imperial formula
+        if str(sex).lower() == 'male':
+            return 4.536 * weight + 15.88 * height - 5 * age + 5
+        return 4.536 * weight + 15.88 * height - 5 * age - 161
+    # Use metric formula
+    weight_kg = weight / 2.20462
+    height_cm = height * 2.54
+    if str(sex).lower() == 'male':
+        return 10 * weight_kg + 6.25 * height_cm - 5 * age + 5
+    return 10 * weight_kg + 6.25 * height_cm - 5 * age - 161
+
+def compute_tdee_day(user_id, date, bmr, activity_calories, activity_level, logged_calories=None, manual_calories=None):
+    """Build the TDEE values for one day from already-loaded inputs."""
+    activity_multiplier = ACTIVITY_MULTIPLIERS.get(activity_level, 1.375)  # default to light multiplier
+    base_tdee = bmr * activity_multiplier
+
+    # Logged food takes priority over manual input
+    if logged_calories is not None:
+        calorie_intake = logged_calories
+    elif manual_calories is not None:
+        calorie_intake = manual_calories
+    else:
+        calorie_intake = 0
+
+    return {
+        'user_id': user_id,
+        'date': date,
+        'bmr': round(bmr),
+        'activity_calories': activity_calories,
+        # Final TDEE = base TDEE (with activity level) + additional workout calories
+        'tdee': round(base_tdee + activity_calories),
+        'calorie_intake': calorie_intake,
+        'activity_level': activity_level,
+        'activity_multiplier': activity_multiplier,
+        'base_tdee': round(base_tdee)
+    }
+
+def tdee_balance_status(balance):
+    """'Deficit', 'Surplus' or 'Maintenance' for an intake minus TDEE balance."""
+    if balance < -100:
+        return 'Deficit'
+    if balance > 100:
+        return 'Surplus'
+    return 'Maintenance'
+
+def _load_inputs(user_id, start, end):
+    """Load every TDEE input for a user between start and end (inclusive)."""
+    user = db.session.get(User, user_id)
+    settings = UserSettings.query.filter_by(user_id=user_id).first()
+
+    # BMR-bearing stats up to the end of the range; the latest one on or before
+    # each date wins, so earlier scans are needed too.
+    bmr_stats = db.session.query(Stat.date, Stat.bmr).filter(
+        Stat.user_id == user_id,
+        Stat.date <= end,
+        Stat.bmr != None
+    ).order_by(Stat.date, Stat.id).all()
+
+    activities = db.session.query(
+        Activity.date, Activity.calories_burned, Activity.activity_level
+    ).filter(
+        Activity.user_id == user_id,
+        Activity.date >= start,
+        Activity.date <= end
+    ).order_by(Activity.id.desc()).all()
+
+    is_manual = case((FoodEntry.food_name == 'Manual Entry', True), else_=False)
+    food_totals = db.session.query(
+        FoodEntry.date, is_manual, func.coalesce(func.sum(FoodEntry.calories), 0)
+    ).filter(
+        FoodEntry.user_id == user_id,
+        FoodEntry.date >= start,
+        FoodEntry.date <= end
+    ).group_by(FoodEntry.date, is_manual).all()
+
+    existing = TDEE.query.filter(
+        TDEE.user_id == user_id,
+        TDEE.date >= start,
+        TDEE.date <= end
+    ).all()
+
+    return user, settings, bmr_stats, activities, food_totals, existing
+
+def _compute(user_id, dates, activity_level, inputs):
+    user, settings, bmr_stats, activities, food_totals, existing = inputs
+    units = settings.units if settings and settings.units else 'imperial'
+    settings_level = settings.activity_level if settings and settings.activity_level else None
+    profile_bmr = calculate_bmr(
+        user.weight if user else None,
+        user.height if user else None,
+        user.age if user else None,
+        user.sex if user else None,
+        units
+    )
+
+    activity_calories = {}
+    activity_levels = {}
+    for day, calories_burned, level in activities:
+        if calories_burned:
+            activity_calories[day] = activity_calories.get(day, 0) + calories_burned
+        # Activities are ordered newest first, so the first level seen wins
+        if level and day not in activity_levels:
+            activity_levels[day] = level
+
+    logged_calories = {}
+    manual_calories = {}
+    for day, manual, total in food_totals:
+        (manual_calories if manual else logged_calories)[day] = total
+
+    existing_by_date = {t.date: t for t in existing}
+
+    results = {}
+    stat_index = 0
+    current_stat_bmr = None
+    for day in sorted(dates):
+        # Advance to the most recent BMR stat on or before this day
+        while stat_index < len(bmr_stats) and bmr_stats[stat_index][0] <= day:
+            current_stat_bmr = bmr_stats[stat_index][1]
+            stat_index += 1
+
+        bmr = current_stat_bmr if current_stat_bmr is not None else profile_bmr
+        if bmr is None:
+            continue  # Skip if profile incomplete and no BMR available
+
+        record = existing_by_date.get(day)
+        if activity_level:
+            daily_activity_level = activity_level
+        elif record and record.activity_level:
+            daily_activity_level = record.activity_level
+        else:
+            daily_activity_level = activity_levels.get(day) or settings_level or DEFAULT_ACTIVITY_LEVEL
+
+        results[day] = compute_tdee_day(
+            user_id, day, bmr,
+            activity_calories.get(day, 0),
+            daily_activity_level,
+            logged_calories.get(day),
+            manual_calories.get(day)
+        )
+    return results
+
+def calculate_tdee_range(user_id, dates, activity_level=None):
+    """Calculate TDEE for every date in `dates` without touching the database.
+
+    Returns a dict mapping each date to its TDEE values; dates that cannot be
+    calculated (no BMR and incomplete profile) are omitted.
+    """
+    dates = set(dates)
+    if not dates:
+        return {}
+    inputs = _load_inputs(user_id, min(dates), max(dates))
+    results = _compute(user_id, dates, activity_level, inputs)
+    return results
+
+TDEE_FIELDS = ('bmr', 'activity_calories', 'tdee', 'calorie_intake', 'activity_level', 'activity_multiplier', 'base_tdee')
+
+def upsert_tdee_rows(rows):
+    """Insert or update many TDEE rows with a single multi-row statement.
+
+    Uses the (user_id, date) unique constraint for INSERT ... ON CONFLICT on
+    SQLite and PostgreSQL; other databases fall back to ORM merges.
+    """
+    if not rows:
+        return
+    insert = dialect_insert()
+    if insert is not None:
+        stmt = insert(TDEE)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'date'],
+            set_={field: stmt.excluded[field] for field in TDEE_FIELDS}
+        )
+        # Executed with a parameter list, so the driver batches the VALUES
+        db.session.execute(stmt, list(rows))
+        bump_table_versions(TDEE, {row['user_id'] for row in rows})
+    else:
+        existing = {
+            (t.user_id, t.date): t
+            for t in TDEE.query.filter(TDEE.user_id.in_({row['user_id'] for row in rows}),
+                                       TDEE.date.in_({row['date'] for row in rows})).all()
+        }
+        for row in rows:
+            tdee = existing.get((row['user_id'], row['date']))
+            if tdee:
+                for field in TDEE_FIELDS:
+                    setattr(tdee, field, row[field])
+            else:
+                db.session.add(TDEE(**row))
+
+def save_tdee_range(user_id, dates, activity_level=None):
+    """Recalculate and upsert TDEE rows for every date in `dates` in one transaction.
+
+    Returns a dict mapping each saved date to its TDEE record.
+    """
+    dates = set(dates)
+    if not dates:
+        return {}
+    start, end = min(dates), max(dates)
+    inputs = _load_inputs(user_id, start, end)
+    results = _compute(user_id, dates, activity_level, inputs)
+    upsert_tdee_rows(list(results.values()))
+    db.session.commit()
+    if not results:
+        return {}
+
+    # Re-read so callers get records reflecting the upserted values
+    saved = TDEE.query.filter(
+        TDEE.user_id == user_id,
+        TDEE.date >= start,
+        TDEE.date <= end
+    ).all()
+    return {t.date: t for t in saved if t.date in results}
+
+def tdee_dates_for_user(user_id, since=None):
+    """All dates with activities, food entries or TDEE records for a user, optionally from `since` on."""
+    queries = []
+    for model in (Activity, FoodEntry, TDEE):
+        query = db.session.query(model.date).filter(model.user_id == user_id)
+        if since is not None:
+            query = query.filter(model.date >= since)
+        queries.append(query)
+    return {date for (date,) in queries[0].union(*queries[1:]).all()}
+
+def mark_tdee_dirty(user_id, date, cascade_forward=False):
+    """Mark the TDEE for `date` as stale, and every later date too when cascade_forward.
+
+    The ledger row is written in the caller's session, so it commits (or rolls
+    back) together with the write that invalidated it.
+    """
+    insert = dialect_insert()
+    if insert is not None:
+        stmt = insert(TDEEDirtyDate).values(
+            user_id=user_id,
+            date=date,
+            cascade_forward=cascade_forward,
+            marked_at=datetime.utcnow()
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'date'],
+            set_={'cascade_forward': TDEEDirtyDate.cascade_forward | stmt.excluded.cascade_forward}
+        )
+        db.session.execute(stmt)
+        return
+    entry = TDEEDirtyDate.query.filter_by(user_id=user_id, date=date).first()
+    if entry:
+        entry.cascade_forward = entry.cascade_forward or cascade_forward
+    else:
+        db.session.add(TDEEDirtyDate(user_id=user_id, date=date, cascade_forward=cascade_forward))
+
+def mark_all_tdee_dirty(user_id):
+    """Mark every TDEE date of a user as stale (profile or settings changes)."""
+    mark_tdee_dirty(user_id, date_type.min, cascade_forward=True)
+
+def flush_dirty_tdee(user_id):
+    """Rebuild every stale TDEE row of a user in one pass.
+
+    Returns the number of dates rebuilt; when nothing is stale this costs a
+    single indexed query.
+    """
+    entries = TDEEDirtyDate.query.filter_by(user_id=user_id).all()
+    if not entries:
+        return 0
+
+    dates = {e.date for e in entries if not e.cascade_forward}
+    forward = [e.date for e in entries if e.cascade_forward]
+    if forward:
+        dates.update(tdee_dates_for_user(user_id, since=min(forward)))
+
+    TDEEDirtyDate.query.filter(TDEEDirtyDate.id.in_([e.id for e in entries])).delete(synchronize_session=False)
+    if dates:
+        save_tdee_range(user_id, dates)
+    else:
+        db.session.commit()
+    return len(dates)
+
+def flush_all_dirty_tdee():
+    """Rebuild stale TDEE rows for every user with pending ledger entries. Returns the user count."""
+    user_ids = [user_id for (user_id,) in db.session.query(TDEEDirtyDate.user_id).distinct().all()]
+    for user_id in user_ids:
+        flush_dirty_tdee(user_id)
+    return len(user_ids)
+
+def record_tdee_for_all_users(date):
+    """Compute and upsert the TDEE for `date` for every user with set-based queries.
+
+    Runs a fixed number of grouped queries plus one upsert regardless of the
+    user count. Returns the number of rows written and per-phase timings in
+    milliseconds.
+    """
+    timings = {}
+    started = time.perf_counter()
+
+    users = db.session.query(User.id, User.weight, User.height, User.age, User.sex).all()
+    settings = {
+        user_id: (units, activity_level)
+        for user_id, units, activity_level in db.session.query(
+            UserSettings.user_id, UserSettings.units, UserSettings.activity_level
+        ).all()
+    }
+
+    # Latest BMR stat on or before the date, per user
+    latest_stat = db.session.query(
+        Stat.user_id.label('user_id'), func.max(Stat.date).label('date')
+    ).filter(Stat.date <= date, Stat.bmr != None).group_by(Stat.user_id).subquery()
+    stat_bmrs = dict(db.session.query(Stat.user_id, Stat.bmr).join(
+        latest_stat, (Stat.user_id == latest_stat.c.user_id) & (Stat.date == latest_stat.c.date)
+    ).filter(Stat.bmr != None).order_by(Stat.id).all())
+
+    activity_calories = dict(db.session.query(
+        Activity.user_id, func.coalesce(func.sum(Activity.calories_burned), 0)
+    ).filter(Activity.date == date).group_by(Activity.user_id).all())
+
+    # Activity level from the most recently logged activity that has one, per user
+    latest_level = db.session.query(func.max(Activity.id)).filter(
+        Activity.date == date, Activity.activity_level != None
+    ).group_by(Activity.user_id)
+    activity_levels = dict(db.session.query(Activity.user_id, Activity.activity_level).filter(
+        Activity.id.in_(latest_level)
+    ).all())
+
+    is_manual = case((FoodEntry.food_name == 'Manual Entry', True), else_=False)
+    logged_calories = {}
+    manual_calories = {}
+    for user_id, manual, total in db.session.query(
+        FoodEntry.user_id, is_manual, func.coalesce(func.sum(FoodEntry.calories), 0)
+    ).filter(FoodEntry.date == date).group_by(FoodEntry.user_id, is_manual).all():
+        (manual_calories if manual else logged_calories)[user_id] = total
+
+    existing_levels = dict(db.session.query(TDEE.user_id, TDEE.activity_level).filter(TDEE.date == date).all())
+    timings['load_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+    phase_started = time.perf_counter()
+    rows = []
+    for user_id, weight, height, age, sex in users:
+        units, settings_level = settings.get(user_id, (None, None))
+        bmr = stat_bmrs.get(user_id)
+        if bmr is None:
+            bmr = calculate_bmr(weight, height, age, sex, units or 'imperial')
+        if bmr is None:
+            continue  # Skip if profile incomplete and no BMR available
+        activity_level = (existing_levels.get(user_id) or activity_levels.get(user_id)
+                          or settings_level or DEFAULT_ACTIVITY_LEVEL)
+        rows.append(compute_tdee_day(
+            user_id, date, bmr,
+            activity_calories.get(user_id, 0),
+            activity_level,
+            logged_calories.get(user_id),
+            manual_calories.get(user_id)
+        ))
+    timings['compute_ms'] = round((time.perf_counter() - phase_started) * 1000, 1)
+
+    phase_started = time.perf_counter()
+    upsert_tdee_rows(rows)
+    db.session.commit()
+    timings['write_ms'] = round((time.perf_counter() - phase_started) * 1000, 1)
+    timings['total_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+    return {'users': len(users), 'rows': len(rows), 'timings': timings}
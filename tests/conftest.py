@@ -0,0 +1,40 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# config.py reads DATABASE_URL when app is imported, so point it at a scratch database first
+_db_fd, _db_path = tempfile.mkstemp(suffix='.db')
+os.close(_db_fd)
+os.environ['DATABASE_URL'] = f'sqlite:///{_db_path}'
+
+from app import app as flask_app
+from models import db, User
+
+
+@pytest.fixture
+def app(tmp_path):
+    flask_app.config.update(TESTING=True, UPLOAD_FOLDER=str(tmp_path / 'uploads'))
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def user(app):
+    user = User(email='test@example.com', username='test', google_id='test-google-id',
+                weight=180, height=70, age=30, sex='Male')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if os.path.exists(_db_path):
+        os.remove(_db_path)
@@ -0,0 +1,89 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from models import db, User, FoodEntry, Workout, Activity, Stat, Mood, DailyRollup
+from daily_rollup import ROLLUP_FIELDS, compute_daily_rollups, rebuild_daily_rollups
+
+START = date(2026, 2, 1)
+
+
+def rollup_state(user_id):
+    return {
+        r.date: {field: getattr(r, field) for field in ROLLUP_FIELDS}
+        for r in DailyRollup.query.filter_by(user_id=user_id)
+    }
+
+
+def new_row(rng, user_ids):
+    user_id = rng.choice(user_ids)
+    day = START + timedelta(days=rng.randrange(10))
+    kind = rng.randrange(5)
+    if kind == 0:
+        return FoodEntry(user_id=user_id, date=day, food_name=rng.choice(('Rice', 'Manual Entry')),
+                         calories=rng.randrange(100, 900), protein=10, carbs=20, fat=5, quantity=1, unit='serving')
+    if kind == 1:
+        return Workout(user_id=user_id, date=day, exercise=rng.choice(('Bench Press', 'Row')),
+                       weight=rng.choice((50, 100)), reps=rng.randrange(1, 10), sets=1)
+    if kind == 2:
+        return Activity(user_id=user_id, date=day, activity_type=rng.choice(('Walking', 'Running', 'Yoga')),
+                        duration=30, intensity='Low', calories_burned=rng.randrange(50, 400), miles=rng.choice((None, 2.5)))
+    if kind == 3:
+        return Stat(user_id=user_id, date=day, weight=rng.choice((None, 180, 182)))
+    return Mood(user_id=user_id, date=day, rating=rng.randrange(1, 11))
+
+
+def change_row(rng, row, user_ids):
+    choice = rng.randrange(3)
+    if choice == 0:
+        row.date = START + timedelta(days=rng.randrange(10))
+    elif choice == 1:
+        row.user_id = rng.choice(user_ids)
+    elif isinstance(row, FoodEntry):
+        row.calories = rng.randrange(100, 900)
+    elif isinstance(row, Workout):
+        row.reps = rng.randrange(1, 10)
+    elif isinstance(row, Activity):
+        row.duration = rng.randrange(10, 90)
+    elif isinstance(row, Stat):
+        row.weight = rng.choice((None, 179, 185))
+    else:
+        row.rating = rng.randrange(1, 11)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_refreshed_rollups_match_rebuild(user, seed):
+    other = User(email='other@example.com', username='other', google_id='other-google-id')
+    db.session.add(other)
+    db.session.commit()
+    user_ids = [user.id, other.id]
+    rng = random.Random(seed)
+    rows = []
+
+    for _ in range(80):
+        # A few writes per transaction, some of them rolled back
+        for _ in range(rng.randrange(1, 4)):
+            action = rng.random()
+            if action < 0.5 or not rows:
+                rows.append(new_row(rng, user_ids))
+                db.session.add(rows[-1])
+            elif action < 0.8:
+                change_row(rng, rng.choice(rows), user_ids)
+            else:
+                row = rows.pop(rng.randrange(len(rows)))
+                db.session.delete(row)
+            db.session.flush()
+        if rng.random() < 0.1:
+            db.session.rollback()
+            rows = [row for row in rows if row in db.session and row.id is not None]
+        else:
+            db.session.commit()
+
+    for user_id in user_ids:
+        assert rollup_state(user_id) == compute_daily_rollups(user_id)
+        refreshed = rollup_state(user_id)
+        rebuild_daily_rollups(user_id)
+        db.session.commit()
+        db.session.expire_all()
+        assert rollup_state(user_id) == refreshed
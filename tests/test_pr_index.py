@@ -0,0 +1,74 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from models import db, Workout, PersonalRecord
+from pr_index import (PR_TYPES, record_set_prs, refresh_set_prs, delete_workout_set, compute_user_prs,
+                      save_user_prs)
+
+EXERCISES = ('Barbell Squat', 'Dumbbell Curl', 'Pull Up')
+START = date(2026, 1, 1)
+
+
+def pr_state(user_id):
+    return {
+        (pr.exercise, pr.pr_type): (pr.value, pr.workout_id)
+        for pr in PersonalRecord.query.filter(PersonalRecord.user_id == user_id, PersonalRecord.pr_type.in_(PR_TYPES))
+    }
+
+
+def log_set(rng, user_id):
+    exercise = rng.choice(EXERCISES)
+    # Pull ups are bodyweight; a few rows stand for several identical sets as add_workout logs them
+    weight = 0 if exercise == 'Pull Up' else rng.choice((20, 25, 30, 135, 185))
+    set_count = rng.choice((1, 1, 1, 3))
+    workout = Workout(user_id=user_id, date=START + timedelta(days=rng.randrange(30)), exercise=exercise,
+                      weight=weight, reps=rng.randrange(1, 13), sets=set_count, set_count=set_count,
+                      total_weight=weight + 45 if exercise.startswith('Barbell') else None)
+    db.session.add(workout)
+    db.session.flush()
+    record_set_prs(workout)
+    db.session.commit()
+    return workout
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_incremental_prs_match_full_recompute(user, seed):
+    rng = random.Random(seed)
+    workouts = [log_set(rng, user.id) for _ in range(60)]
+
+    for _ in range(40):
+        workout = rng.choice(workouts)
+        if rng.random() < 0.5:
+            workouts.remove(workout)
+            delete_workout_set(workout)
+        else:
+            workout.weight = workout.weight and rng.choice((20, 25, 30, 135, 185, 225))
+            workout.total_weight = workout.weight + 45 if workout.total_weight is not None else None
+            workout.reps = rng.randrange(1, 13)
+            db.session.flush()
+            refresh_set_prs(workout)
+        db.session.commit()
+        if rng.random() < 0.3:
+            workouts.append(log_set(rng, user.id))
+
+    incremental = pr_state(user.id)
+    expected = {key: (value, workout.id) for key, (value, workout) in compute_user_prs(user.id).items()}
+    assert incremental.keys() == expected.keys()
+    for key, (value, workout_id) in expected.items():
+        assert incremental[key] == (pytest.approx(value), workout_id), key
+
+    save_user_prs(user.id)
+    db.session.commit()
+    db.session.expire_all()
+    assert pr_state(user.id) == incremental
+
+
+def test_deleting_every_set_removes_the_prs(user):
+    rng = random.Random(0)
+    workouts = [log_set(rng, user.id) for _ in range(10)]
+    for workout in workouts:
+        delete_workout_set(workout)
+        db.session.commit()
+    assert pr_state(user.id) == {}
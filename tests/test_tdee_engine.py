@@ -0,0 +1,125 @@
+from datetime import date, timedelta
+
+import pytest
+
+from models import db, Stat, Activity, FoodEntry, TDEE, UserSettings
+from tdee_engine import ACTIVITY_MULTIPLIERS, calculate_bmr, calculate_tdee_range, save_tdee_range
+
+START = date(2026, 3, 1)
+DAYS = [START + timedelta(days=i) for i in range(14)]
+
+
+def per_day_tdee(user, day, activity_level=None):
+    """The per-day calculation calculate_tdee_for_date did before the range engine."""
+    stat = Stat.query.filter(Stat.user_id == user.id, Stat.date <= day, Stat.bmr != None).order_by(
+        Stat.date.desc()).first()
+    settings = UserSettings.query.filter_by(user_id=user.id).first()
+    units = settings.units if settings and settings.units else 'imperial'
+    bmr = stat.bmr if stat else calculate_bmr(user.weight, user.height, user.age, user.sex, units)
+    if bmr is None:
+        return None
+
+    activities = Activity.query.filter_by(user_id=user.id, date=day).order_by(Activity.id.desc()).all()
+    activity_calories = sum(a.calories_burned for a in activities if a.calories_burned)
+    record = TDEE.query.filter_by(user_id=user.id, date=day).first()
+    if activity_level:
+        level = activity_level
+    elif record and record.activity_level:
+        level = record.activity_level
+    else:
+        level = next((a.activity_level for a in activities if a.activity_level), None)
+        level = level or (settings.activity_level if settings and settings.activity_level else 'light')
+    multiplier = ACTIVITY_MULTIPLIERS.get(level, 1.375)
+
+    entries = FoodEntry.query.filter_by(user_id=user.id, date=day).all()
+    logged = [e for e in entries if e.food_name != 'Manual Entry']
+    manual = [e for e in entries if e.food_name == 'Manual Entry']
+    intake = sum(e.calories for e in (logged or manual) if e.calories)
+
+    return {
+        'user_id': user.id,
+        'date': day,
+        'bmr': round(bmr),
+        'activity_calories': activity_calories,
+        'tdee': round(bmr * multiplier + activity_calories),
+        'calorie_intake': intake,
+        'activity_level': level,
+        'activity_multiplier': multiplier,
+        'base_tdee': round(bmr * multiplier)
+    }
+
+
+def food(user, day, calories, name='Oats'):
+    return FoodEntry(user_id=user.id, date=day, food_name=name, calories=calories,
+                     protein=1, carbs=1, fat=1, quantity=1, unit='serving')
+
+
+def activity(user, day, calories, level=None):
+    return Activity(user_id=user.id, date=day, activity_type='running', duration=30, intensity='Moderate',
+                    calories_burned=calories, activity_level=level)
+
+
+@pytest.fixture
+def history(user):
+    db.session.add(UserSettings(user_id=user.id, activity_level='moderate'))
+    # BMR scans start on day 4 and change on day 9; earlier days fall back to the profile
+    db.session.add_all([
+        Stat(user_id=user.id, date=DAYS[4], bmr=1800),
+        Stat(user_id=user.id, date=DAYS[6], weight=181),
+        Stat(user_id=user.id, date=DAYS[9], bmr=1750),
+    ])
+    # Activity on some days only, with a day-level override on one of them
+    db.session.add_all([
+        activity(user, DAYS[1], 300),
+        activity(user, DAYS[5], 200, level='active'),
+        activity(user, DAYS[5], 150),
+        activity(user, DAYS[10], None, level='sedentary'),
+    ])
+    # Logged food, manual entries, both on one day, and days without intake
+    db.session.add_all([
+        food(user, DAYS[0], 2100),
+        food(user, DAYS[2], 1900, name='Manual Entry'),
+        food(user, DAYS[5], 800),
+        food(user, DAYS[5], 700),
+        food(user, DAYS[5], 2500, name='Manual Entry'),
+        food(user, DAYS[11], 0),
+    ])
+    # A stored row whose activity level sticks on recalculation
+    db.session.add(TDEE(user_id=user.id, date=DAYS[7], bmr=1, tdee=1, activity_level='very_active'))
+    db.session.commit()
+    return user
+
+
+def test_range_matches_per_day_calculation(history):
+    expected = {day: per_day_tdee(history, day) for day in DAYS}
+    assert calculate_tdee_range(history.id, DAYS) == expected
+
+
+def test_range_matches_per_day_calculation_with_activity_level(history):
+    expected = {day: per_day_tdee(history, day, activity_level='light') for day in DAYS}
+    assert calculate_tdee_range(history.id, DAYS, activity_level='light') == expected
+
+
+def test_sparse_dates_match_single_day_calls(history):
+    dates = [DAYS[0], DAYS[5], DAYS[13]]
+    combined = calculate_tdee_range(history.id, dates)
+    assert combined == {day: calculate_tdee_range(history.id, [day])[day] for day in dates}
+
+
+def test_incomplete_profile_skips_days_before_first_scan(history):
+    history.sex = None
+    db.session.commit()
+    results = calculate_tdee_range(history.id, DAYS)
+    assert sorted(results) == DAYS[4:]
+    assert all(results[day] == per_day_tdee(history, day) for day in DAYS[4:])
+
+
+def test_save_range_stores_calculated_rows(history):
+    expected = {day: per_day_tdee(history, day) for day in DAYS}
+    save_tdee_range(history.id, DAYS)
+    db.session.commit()
+    db.session.expire_all()
+    stored = {t.date: t for t in TDEE.query.filter_by(user_id=history.id)}
+    assert sorted(stored) == DAYS
+    for day, values in expected.items():
+        assert {field: getattr(stored[day], field) for field in values} == values
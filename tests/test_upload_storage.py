@@ -0,0 +1,62 @@
+from datetime import date
+
+from models import db, Blob, ProgressPic, Stat
+from upload_storage import store_bytes
+
+
+def refcounts():
+    db.session.expire_all()
+    return {blob.key: blob.refcount for blob in Blob.query}
+
+
+def test_progress_pic_references_return_to_zero(app, user):
+    picture = store_bytes(app, b'picture', 'jpg')
+    thumb = store_bytes(app, b'thumb', 'webp')
+    pic = ProgressPic(user_id=user.id, filename=picture, upload_date=date(2026, 4, 1))
+    db.session.add(pic)
+    db.session.commit()
+    assert refcounts() == {picture: 1, thumb: 0}
+
+    # Variants written later, one of them sharing the original's bytes
+    pic.thumb_webp = thumb
+    pic.thumb_jpeg = picture
+    db.session.commit()
+    assert refcounts() == {picture: 2, thumb: 1}
+
+    db.session.delete(pic)
+    db.session.commit()
+    assert refcounts() == {picture: 0, thumb: 0}
+
+
+def test_stat_bodyscan_references_return_to_zero(app, user):
+    scan = store_bytes(app, b'scan', 'png')
+    first = Stat(user_id=user.id, date=date(2026, 4, 1), bodyscan_blob=scan)
+    second = Stat(user_id=user.id, date=date(2026, 4, 2), bodyscan_blob=scan)
+    db.session.add_all([first, second])
+    db.session.commit()
+    assert refcounts() == {scan: 2}
+
+    db.session.delete(first)
+    db.session.commit()
+    assert refcounts() == {scan: 1}
+
+    # Replacing the scan of an expired row releases the old blob
+    rescan = store_bytes(app, b'rescan', 'png')
+    db.session.commit()
+    second.bodyscan_blob = rescan
+    db.session.commit()
+    assert refcounts() == {scan: 0, rescan: 1}
+
+    db.session.delete(second)
+    db.session.commit()
+    assert refcounts() == {scan: 0, rescan: 0}
+
+
+def test_rolled_back_references_are_not_counted(app, user):
+    picture = store_bytes(app, b'picture', 'jpg')
+    db.session.commit()
+    db.session.add(ProgressPic(user_id=user.id, filename=picture, upload_date=date(2026, 4, 1)))
+    db.session.flush()
+    db.session.rollback()
+    db.session.commit()
+    assert refcounts() == {picture: 0}
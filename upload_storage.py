@@ -0,0 +1,257 @@
+"""
+Content-addressed storage for uploaded files.
+
+Uploads are streamed in CHUNK_SIZE pieces to a temp file while being
+hashed, then stored once under their key, the SHA-256 hex digest plus the
+file extension. Uploading bytes that are already stored only refreshes the
+existing Blob row, so a picture or scan uploaded twice takes disk space once.
+
+Blob.refcount counts the ProgressPic and Stat columns (BLOB_COLUMNS) that
+hold the key. A session_changes hook collects reference changes from rows
+added, edited or deleted in the session, and they are applied just before
+the transaction commits. Nothing is deleted when a count drops to zero:
+sweep_uploads removes blobs left unreferenced for UPLOAD_ORPHAN_TTL hours.
+That also covers scans uploaded for OCR review and never saved. The sweep
+removes abandoned temp files and, with full=True, files that have no Blob
+row at all. The app runs it hourly; scripts/sweep_uploads.py runs it by hand.
+
+Where blobs live is up to a StorageBackend. LocalStorage keeps them under
+UPLOAD_FOLDER/blobs. A backend for an S3-compatible store subclasses
+StorageBackend, is added with register_backend, and is selected with
+UPLOAD_STORAGE. Temp files are always local; put() receives a finished
+temp file.
+"""
+import hashlib
+import os
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import inspect
+from models import db, dialect_insert, Blob, ProgressPic, Stat
+from session_changes import register_change_hook, track_previous_values
+
+CHUNK_SIZE = 64 * 1024
+TEMP_PREFIX = 'upload_'
+EXTENSION_ALIASES = {'jpeg': 'jpg'}
+
+# Columns holding blob keys; each non-empty value is one reference
+BLOB_COLUMNS = {
+    ProgressPic: ('filename', 'thumb_webp', 'thumb_jpeg', 'medium_webp', 'medium_jpeg'),
+    Stat: ('bodyscan_blob',)
+}
+
+class StorageBackend:
+    """Where blobs are kept. Keys are '<sha256>.<ext>'."""
+
+    def put(self, key, temp_path):
+        """Store a finished temp file under key, consuming it."""
+        raise NotImplementedError
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def local_path(self, key):
+        """A readable local path of the blob (a remote backend would download it to a cache)."""
+        raise NotImplementedError
+
+    def keys(self):
+        """Every stored key with its modification time, for full sweeps."""
+        raise NotImplementedError
+
+class LocalStorage(StorageBackend):
+    """Blobs on local disk under root/blobs, fanned out by the first two hex digits."""
+
+    def __init__(self, root):
+        self.root = os.path.join(root, 'blobs')
+
+    def local_path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def put(self, key, temp_path):
+        path = self.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Atomic on one filesystem; a concurrent upload of the same bytes writes identical content
+        os.replace(temp_path, path)
+
+    def exists(self, key):
+        return os.path.exists(self.local_path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+    def keys(self):
+        for directory, _dirs, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(directory, name)
+                if path == self.local_path(name):
+                    yield name, datetime.utcfromtimestamp(os.path.getmtime(path))
+
+STORAGE_BACKENDS = {'local': LocalStorage}
+
+def register_backend(name, backend_class):
+    """Make a StorageBackend subclass selectable with UPLOAD_STORAGE=name.
+
+    It is constructed with the absolute UPLOAD_FOLDER."""
+    STORAGE_BACKENDS[name] = backend_class
+
+def upload_root(app):
+    upload_folder = app.config['UPLOAD_FOLDER']
+    if not os.path.isabs(upload_folder):
+        upload_folder = os.path.join(app.root_path, upload_folder)
+    return upload_folder
+
+def get_storage(app):
+    """The app's storage backend, created on first use."""
+    storage = app.extensions.get('upload_storage')
+    if storage is None:
+        backend_class = STORAGE_BACKENDS[app.config.get('UPLOAD_STORAGE', 'local')]
+        storage = app.extensions['upload_storage'] = backend_class(upload_root(app))
+    return storage
+
+def temp_dir(app):
+    path = os.path.join(upload_root(app), 'tmp')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def blob_sha256(key):
+    return key.split('.', 1)[0]
+
+def normalize_extension(filename):
+    ext = os.path.splitext(filename)[1].lstrip('.').lower()
+    return EXTENSION_ALIASES.get(ext, ext)
+
+def _record_blob(key, size):
+    """Create the Blob row, or mark an existing one as just uploaded so the sweep leaves it alone."""
+    now = datetime.utcnow()
+    insert = dialect_insert()
+    if insert is not None:
+        stmt = insert(Blob).values(key=key, size=size, refcount=0, created_at=now, stored_at=now)
+        db.session.execute(stmt.on_conflict_do_update(index_elements=['key'], set_={'stored_at': now}))
+        return
+    blob = Blob.query.filter_by(key=key).first()
+    if blob is None:
+        db.session.add(Blob(key=key, size=size, refcount=0, created_at=now, stored_at=now))
+    else:
+        blob.stored_at = now
+
+def store_stream(app, stream, extension):
+    """Stream a file object into storage; returns its key. Adds the Blob row to the session without committing."""
+    digest = hashlib.sha256()
+    size = 0
+    temp_path = os.path.join(temp_dir(app), f"{TEMP_PREFIX}{uuid.uuid4().hex}")
+    try:
+        with open(temp_path, 'wb') as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+        key = f"{digest.hexdigest()}.{extension}"
+        _record_blob(key, size)
+        storage = get_storage(app)
+        if storage.exists(key):
+            os.remove(temp_path)
+        else:
+            storage.put(key, temp_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return key
+
+def store_upload(app, file):
+    """Store a werkzeug FileStorage; returns its key."""
+    return store_stream(app, file.stream, normalize_extension(file.filename))
+
+def store_file(app, path):
+    """Store a local file (left in place); returns its key."""
+    with open(path, 'rb') as f:
+        return store_stream(app, f, normalize_extension(path))
+
+def store_bytes(app, data, extension):
+    """Store in-memory content; returns its key."""
+    key = f"{hashlib.sha256(data).hexdigest()}.{extension}"
+    _record_blob(key, len(data))
+    storage = get_storage(app)
+    if not storage.exists(key):
+        temp_path = os.path.join(temp_dir(app), f"{TEMP_PREFIX}{uuid.uuid4().hex}")
+        with open(temp_path, 'wb') as out:
+            out.write(data)
+        storage.put(key, temp_path)
+    return key
+
+def sweep_uploads(app, max_age=None, full=False):
+    """Delete blobs unreferenced for max_age (default UPLOAD_ORPHAN_TTL hours) and abandoned temp files.
+
+    With full, also delete stored files that have no Blob row (e.g. from a rolled back upload).
+    Commits; returns counts of what was removed.
+    """
+    if max_age is None:
+        max_age = timedelta(hours=app.config.get('UPLOAD_ORPHAN_TTL', 24))
+    cutoff = datetime.utcnow() - max_age
+    storage = get_storage(app)
+    counts = {'blobs': 0, 'temp_files': 0, 'untracked': 0}
+
+    for blob in Blob.query.filter(Blob.refcount <= 0, Blob.stored_at < cutoff).all():
+        # Re-check in the DELETE so a blob re-uploaded or referenced meanwhile survives. The file goes
+        # before the commit: an upload of the same bytes waits on the row and then writes a new copy.
+        deleted = Blob.query.filter(Blob.id == blob.id, Blob.refcount <= 0, Blob.stored_at < cutoff).delete(
+            synchronize_session=False)
+        if deleted:
+            storage.delete(blob.key)
+            counts['blobs'] += 1
+        db.session.commit()
+
+    # Interrupted uploads, and temp_* scans left by the OCR review flow before blobs existed
+    for directory, prefix in ((temp_dir(app), TEMP_PREFIX), (upload_root(app), 'temp_')):
+        for entry in os.scandir(directory):
+            if entry.is_file() and entry.name.startswith(prefix) and \
+                    datetime.utcfromtimestamp(entry.stat().st_mtime) < cutoff:
+                os.remove(entry.path)
+                counts['temp_files'] += 1
+
+    if full:
+        known = {key for key, in db.session.query(Blob.key)}
+        for key, modified in list(storage.keys()):
+            if key not in known and modified < cutoff:
+                storage.delete(key)
+                counts['untracked'] += 1
+    return counts
+
+def _column_changes(obj, deltas, deleted=False):
+    state = inspect(obj)
+    for column in BLOB_COLUMNS[type(obj)]:
+        history = state.attrs[column].history
+        if deleted:
+            removed, added = history.deleted or history.unchanged, ()
+        elif history.has_changes():
+            removed, added = history.deleted, history.added
+        else:
+            continue
+        for key in removed:
+            if key:
+                deltas[key] = deltas.get(key, 0) - 1
+        for key in added:
+            if key:
+                deltas[key] = deltas.get(key, 0) + 1
+
+def _collect_blob_references(obj, deleted, deltas):
+    if type(obj) in BLOB_COLUMNS:
+        _column_changes(obj, deltas, deleted)
+
+def _apply_blob_references(deltas):
+    for key, delta in deltas.items():
+        if delta:
+            Blob.query.filter(Blob.key == key).update(
+                {Blob.refcount: Blob.refcount + delta}, synchronize_session=False)
+
+register_change_hook('blob_refcounts', _collect_blob_references, before_commit=_apply_blob_references,
+                     pending=dict)
+track_previous_values(*(getattr(model, column) for model, columns in BLOB_COLUMNS.items() for column in columns))